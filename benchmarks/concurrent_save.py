@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Compares name allocation strategies when many threads save files with the same name:
+
+* probing - default `get_available_name` check followed by meta-backend object creation;
+* probing with retries - the same with `TransactionalSaveProxyStorageMixin`;
+* optimistic - `OptimisticNameAllocationProxyStorageMixin`.
+
+    $ python -m benchmarks.concurrent_save --threads 32 --saves 100
+
+Use real database (see `benchmarks.utils`), sqlite serializes writers and hides the race.
+"""
+from __future__ import print_function
+
+import argparse
+import threading
+import time
+
+from benchmarks.utils import setup_django, recreate_tables, Timer
+
+
+def get_proxy_storage_classes():
+    from django.core.files.storage import Storage
+
+    from proxy_storage.meta_backends.orm import ORMMetaBackend
+    from proxy_storage.storages.base import ProxyStorageBase
+    from proxy_storage.storages.name_allocation import OptimisticNameAllocationProxyStorageMixin
+    from proxy_storage.storages.transactional import TransactionalSaveProxyStorageMixin
+    from benchmarks.models import BenchmarkProxyStorageModel
+
+    class OverwritingOriginalStorage(Storage):
+        """
+        Original storage like S3 with overwriting enabled: it never renames files and has no local paths,
+        so every save of the same name competes for the same meta-backend path.
+        """
+        def _save(self, name, content):
+            return name
+
+        def get_available_name(self, name, max_length=None):
+            return name
+
+        def delete(self, name):
+            pass
+
+        def path(self, name):
+            raise NotImplementedError
+
+    meta_backend = ORMMetaBackend(model=BenchmarkProxyStorageModel)
+
+    class ProbingProxyStorage(ProxyStorageBase):
+        pass
+
+    class ProbingWithRetriesProxyStorage(TransactionalSaveProxyStorageMixin, ProxyStorageBase):
+        save_attempts = 100
+
+    class OptimisticProxyStorage(OptimisticNameAllocationProxyStorageMixin, ProxyStorageBase):
+        pass
+
+    proxy_storage_classes = [
+        ('probing', ProbingProxyStorage),
+        ('probing with retries', ProbingWithRetriesProxyStorage),
+        ('optimistic', OptimisticProxyStorage),
+    ]
+    for name, proxy_storage_class in proxy_storage_classes:
+        proxy_storage_class.original_storage = OverwritingOriginalStorage()
+        proxy_storage_class.meta_backend = meta_backend
+    return proxy_storage_classes
+
+
+def benchmark(title, proxy_storage_class, threads_count, saves):
+    from django.core.files.base import ContentFile
+    from django.db import connection
+    from proxy_storage.settings import proxy_storage_settings
+    from benchmarks.models import BenchmarkProxyStorageModel
+
+    recreate_tables(BenchmarkProxyStorageModel)
+    proxy_storage_settings.PROXY_STORAGE_CLASSES = {'benchmark': proxy_storage_class}
+    proxy_storage_settings.PROXY_STORAGE_CLASSES_INVERTED = {proxy_storage_class: 'benchmark'}
+
+    timer = Timer()
+    errors = []
+    start_event = threading.Event()
+
+    def worker():
+        proxy_storage = proxy_storage_class()
+        start_event.wait()
+        try:
+            for _ in range(saves):
+                try:
+                    timer.measure(proxy_storage.save, 'same_name.txt', ContentFile('content'))
+                except Exception as exc:
+                    errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    started_at = time.time()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    duration = time.time() - started_at
+
+    print(title)
+    print('  ' + timer.report('save'))
+    print('  throughput: {0:.1f} saves/s'.format(len(timer.durations) / duration))
+    print('  failed saves: {0} ({1})'.format(
+        len(errors),
+        ', '.join(sorted(set(type(exc).__name__ for exc in errors))) or '-'
+    ))
+    print('  rows: {0}'.format(BenchmarkProxyStorageModel.objects.count()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--saves', type=int, default=100, help='Number of saves per thread.')
+    args = parser.parse_args()
+
+    setup_django()
+    for title, proxy_storage_class in get_proxy_storage_classes():
+        benchmark(title, proxy_storage_class, threads_count=args.threads, saves=args.saves)
+
+
+if __name__ == '__main__':
+    main()
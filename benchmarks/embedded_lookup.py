@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Measures lookup latency of `SQLiteMetaBackend`, which is what `open` and `exists`
+of proxy-storage cost on edge nodes:
+
+    $ python -m benchmarks.embedded_lookup --rows 1000000 --lookups 100000
+
+Database file is created in temporary directory unless `--database-path` is passed.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.utils import Timer, format_size
+
+
+def fill(meta_backend, rows, batch_size=10000):
+    for start in range(0, rows, batch_size):
+        meta_backend.create_many([
+            {
+                'path': '/files/{0:010d}.txt'.format(i),
+                'proxy_storage_name': 'benchmark',
+                'original_storage_path': 'files/{0:010d}.txt'.format(i),
+                'size': i,
+            }
+            for i in range(start, min(start + batch_size, rows))
+        ], batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--database-path', default=None)
+    args = parser.parse_args()
+
+    from proxy_storage.meta_backends.sqlite import SQLiteMetaBackend
+
+    database_path = args.database_path or os.path.join(tempfile.mkdtemp(), 'embedded_lookup.sqlite3')
+    meta_backend = SQLiteMetaBackend(database_path=database_path)
+    if not meta_backend.exists('/files/{0:010d}.txt'.format(args.rows - 1)):
+        fill(meta_backend, args.rows)
+    print('database: {0} ({1})'.format(database_path, format_size(os.path.getsize(database_path))))
+
+    paths = ['/files/{0:010d}.txt'.format(random.randrange(args.rows)) for _ in range(args.lookups)]
+    missing_paths = ['/missing/{0}.txt'.format(i) for i in range(args.lookups)]
+    fields = ['original_storage_path']
+    for title, func, lookup_paths in [
+        ('get', lambda path: meta_backend.get(path), paths),
+        ('get with fields', lambda path: meta_backend.get(path, fields=fields), paths),
+        ('exists', meta_backend.exists, paths),
+        ('exists of missing path', meta_backend.exists, missing_paths),
+    ]:
+        timer = Timer()
+        for path in lookup_paths:
+            timer.measure(func, path)
+        print(timer.report(title))
+
+
+if __name__ == '__main__':
+    main()
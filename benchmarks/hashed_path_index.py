@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Compares lookup latency and index size of `ProxyStorageModelBase` (unique index on
+255 chars "path") and `HashedPathProxyStorageModelBase` (unique index on 40 chars "path_hash").
+
+    $ python -m benchmarks.hashed_path_index --rows 10000000 --lookups 100000
+"""
+from __future__ import print_function
+
+import argparse
+import random
+
+from benchmarks.utils import setup_django, recreate_tables, Timer, format_size
+
+
+def get_path(i):
+    return '/var/files/{0:03d}/{1:03d}/{2}/user_upload_{3}.txt'.format(i % 997, i % 991, 'a' * 60, i)
+
+
+def fill(model, rows, batch_size):
+    from proxy_storage.meta_backends.orm import HashedPathProxyStorageModelBase
+    from proxy_storage.utils import get_path_hash
+
+    is_hashed = issubclass(model, HashedPathProxyStorageModelBase)
+    for offset in range(0, rows, batch_size):
+        objs = []
+        for i in range(offset, min(offset + batch_size, rows)):
+            path = get_path(i)
+            obj = model(path=path, proxy_storage_name='benchmark', original_storage_path=path[1:])
+            if is_hashed:
+                # bulk_create doesn't call save()
+                obj.path_hash = get_path_hash(path)
+            objs.append(obj)
+        model.objects.bulk_create(objs)
+
+
+def get_indexes_size(model):
+    from django.db import connection
+
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_indexes_size(%s)', [table])
+            return cursor.fetchone()[0]
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT index_length FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table]
+            )
+            return cursor.fetchone()[0]
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                    '(SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+                    ['index', table]
+                )
+            except Exception:
+                return None  # sqlite is compiled without dbstat virtual table
+            return cursor.fetchone()[0]
+
+
+def benchmark(model, rows, lookups, batch_size):
+    from proxy_storage.meta_backends.orm import ORMMetaBackend
+
+    recreate_tables(model)
+    fill(model, rows, batch_size)
+    meta_backend = ORMMetaBackend(model=model)
+
+    hit_timer, miss_timer = Timer(), Timer()
+    for _ in range(lookups):
+        hit_timer.measure(meta_backend.get, get_path(random.randrange(rows)))
+        miss_timer.measure(meta_backend.exists, get_path(rows + random.randrange(rows)))
+
+    print(model.__name__)
+    print('  ' + hit_timer.report('get (hit)'))
+    print('  ' + miss_timer.report('exists (miss)'))
+    print('  indexes size: {0}'.format(format_size(get_indexes_size(model))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    from benchmarks.models import BenchmarkProxyStorageModel, BenchmarkHashedPathProxyStorageModel
+
+    for model in (BenchmarkProxyStorageModel, BenchmarkHashedPathProxyStorageModel):
+        benchmark(model, rows=args.rows, lookups=args.lookups, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
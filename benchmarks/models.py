@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from proxy_storage.meta_backends.orm import ProxyStorageModelBase, HashedPathProxyStorageModelBase
+
+
+class BenchmarkProxyStorageModel(ProxyStorageModelBase):
+    class Meta:
+        app_label = 'benchmarks'
+
+
+class BenchmarkHashedPathProxyStorageModel(HashedPathProxyStorageModelBase):
+    class Meta:
+        app_label = 'benchmarks'
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Compares throughput of per-document and bulk operations of `MongoMetaBackend`:
+
+* create vs create_many;
+* get vs get_many;
+* update vs update_many;
+* delete vs delete_many.
+
+    $ python -m benchmarks.mongo_bulk --documents 100000 --batch-size 1000
+
+MongoDB is configured with `BENCHMARK_MONGO_URI` (see `benchmarks.utils`).
+"""
+from __future__ import print_function
+
+import argparse
+import time
+
+from benchmarks.utils import setup_django, get_mongo_database
+
+COLLECTION_NAME = 'mongo_bulk_benchmark'
+
+
+def get_data_list(documents):
+    return [
+        {
+            'path': '/benchmark/{0:010d}.txt'.format(i),
+            'proxy_storage_name': 'benchmark',
+            'original_storage_path': 'benchmark/{0:010d}.txt'.format(i),
+        }
+        for i in range(documents)
+    ]
+
+
+def measure(title, func, documents):
+    started_at = time.time()
+    func()
+    duration = time.time() - started_at
+    print('  {0}: {1:.2f}s, {2:.0f} documents/s'.format(title, duration, documents / duration))
+
+
+def benchmark(meta_backend, documents, batch_size):
+    data_list = get_data_list(documents)
+    paths = [data['path'] for data in data_list]
+    update_data_by_path = dict((path, {'size': 1}) for path in paths)
+
+    def run_single_creates():
+        for data in data_list:
+            meta_backend.create(data)
+
+    def run_single_gets():
+        for path in paths:
+            meta_backend.get(path)
+
+    def run_single_updates():
+        for path, update_data in update_data_by_path.items():
+            meta_backend.update(path, update_data)
+
+    def run_single_deletes():
+        for path in paths:
+            meta_backend.delete(path)
+
+    print('one document per request')
+    measure('create', run_single_creates, documents)
+    measure('get', run_single_gets, documents)
+    measure('update', run_single_updates, documents)
+    measure('delete', run_single_deletes, documents)
+
+    print('bulk, batch size {0}'.format(batch_size))
+    measure('create_many', lambda: meta_backend.create_many(data_list, batch_size=batch_size), documents)
+    measure('get_many', lambda: meta_backend.get_many(paths, batch_size=batch_size), documents)
+    measure('update_many', lambda: meta_backend.update_many(update_data_by_path, batch_size=batch_size), documents)
+    measure('delete_many', lambda: meta_backend.delete_many(paths, batch_size=batch_size), documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from proxy_storage.meta_backends.mongo import MongoMetaBackend
+
+    database = get_mongo_database()
+    database.drop_collection(COLLECTION_NAME)
+    try:
+        benchmark(
+            MongoMetaBackend(database=database, collection=COLLECTION_NAME),
+            documents=args.documents,
+            batch_size=args.batch_size
+        )
+    finally:
+        database.drop_collection(COLLECTION_NAME)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Measures overhead of `ProxyStorageBase` itself: meta-backend and original storage are kept
+in memory, so timings don't include database or disk. `--latency` adds sleep (in milliseconds)
+to every backend call to simulate remote stores.
+
+    $ python -m benchmarks.proxy_storage_overhead --files 10000
+    $ python -m cProfile -s cumtime -m benchmarks.proxy_storage_overhead --files 10000
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup_django, Timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.files.base import ContentFile
+
+    from proxy_storage.meta_backends.memory import MemoryMetaBackend
+    from proxy_storage.settings import proxy_storage_settings
+    from proxy_storage.storages.base import ProxyStorageBase
+    from proxy_storage.storages.memory import MemoryStorage
+
+    class MemoryProxyStorage(ProxyStorageBase):
+        original_storage = MemoryStorage(latency=args.latency / 1000.0)
+        meta_backend = MemoryMetaBackend(latency=args.latency / 1000.0)
+
+    proxy_storage_settings.PROXY_STORAGE_CLASSES = {'benchmark': MemoryProxyStorage}
+    proxy_storage_settings.PROXY_STORAGE_CLASSES_INVERTED = {MemoryProxyStorage: 'benchmark'}
+    proxy_storage = MemoryProxyStorage()
+
+    names = []
+    timer = Timer()
+    for i in range(args.files):
+        names.append(timer.measure(proxy_storage.save, 'files/{0}.txt'.format(i), ContentFile('content')))
+    print(timer.report('save'))
+
+    for title, method in [
+        ('exists', proxy_storage.exists),
+        ('open', proxy_storage.open),
+        ('size', proxy_storage.size),
+        ('delete', proxy_storage.delete),
+    ]:
+        timer = Timer()
+        for name in names:
+            timer.measure(method, name)
+        print(timer.report(title))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by benchmark scripts.
+
+Benchmarks are standalone scripts, run them from repository root:
+
+    $ python -m benchmarks.hashed_path_index --rows 10000000
+
+Database is configured with environment variables:
+
+    BENCHMARK_DATABASE_ENGINE (default: django.db.backends.sqlite3)
+    BENCHMARK_DATABASE_NAME (default: benchmarks.sqlite3 in temporary directory)
+    BENCHMARK_DATABASE_USER
+    BENCHMARK_DATABASE_PASSWORD
+    BENCHMARK_DATABASE_HOST
+    BENCHMARK_DATABASE_PORT
+    BENCHMARK_MONGO_URI (default: mongodb://localhost:27017/)
+"""
+import os
+import tempfile
+import time
+
+
+def setup_django():
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            DATABASES={
+                'default': {
+                    'ENGINE': os.environ.get('BENCHMARK_DATABASE_ENGINE', 'django.db.backends.sqlite3'),
+                    'NAME': os.environ.get(
+                        'BENCHMARK_DATABASE_NAME',
+                        os.path.join(tempfile.gettempdir(), 'benchmarks.sqlite3')
+                    ),
+                    'USER': os.environ.get('BENCHMARK_DATABASE_USER', ''),
+                    'PASSWORD': os.environ.get('BENCHMARK_DATABASE_PASSWORD', ''),
+                    'HOST': os.environ.get('BENCHMARK_DATABASE_HOST', ''),
+                    'PORT': os.environ.get('BENCHMARK_DATABASE_PORT', ''),
+                },
+            },
+            INSTALLED_APPS=(
+                'django.contrib.contenttypes',
+                'proxy_storage',
+                'benchmarks',
+            ),
+            PROXY_STORAGE={
+                'PROXY_STORAGE_CLASSES': {},
+            },
+        )
+        django.setup()
+
+
+def recreate_tables(*models):
+    from django.db import connection
+
+    with connection.schema_editor() as schema_editor:
+        for model in models:
+            if model._meta.db_table in connection.introspection.table_names():
+                schema_editor.delete_model(model)
+            schema_editor.create_model(model)
+
+
+def get_mongo_database(name='proxy_storage_benchmarks'):
+    from pymongo import MongoClient
+
+    return MongoClient(os.environ.get('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017/'))[name]
+
+
+class Timer(object):
+    def __init__(self):
+        self.durations = []
+
+    def measure(self, func, *args, **kwargs):
+        started_at = time.time()
+        result = func(*args, **kwargs)
+        self.durations.append(time.time() - started_at)
+        return result
+
+    def get_percentile(self, percentile):
+        durations = sorted(self.durations)
+        index = min(len(durations) - 1, int(len(durations) * percentile / 100.0))
+        return durations[index]
+
+    def report(self, title):
+        if not self.durations:
+            return '{0}: no measurements'.format(title)
+        return '{0}: count={1} mean={2:.1f}us p50={3:.1f}us p99={4:.1f}us'.format(
+            title,
+            len(self.durations),
+            sum(self.durations) / len(self.durations) * 1e6,
+            self.get_percentile(50) * 1e6,
+            self.get_percentile(99) * 1e6,
+        )
+
+
+def format_size(size):
+    if size is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return '{0:.1f}{1}'.format(size, unit)
+        size /= 1024.0
+    return '{0:.1f}TB'.format(size)
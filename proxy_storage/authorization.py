@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Authorization policies of `proxy_storage.views.ServeView`. Policy decides by meta-backend object
+(and content object it is attached to) whether request could read the file.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+
+
+class AuthorizationPolicyBase(object):
+    # files of public policies are served to anybody, so their resolution is cached
+    public = False
+
+    def has_access(self, request, meta_backend_obj):
+        raise NotImplementedError
+
+    def get_content_object(self, meta_backend_obj):
+        try:
+            content_type = ContentType.objects.get_for_id(meta_backend_obj['content_type_id'])
+            return content_type.get_object_for_this_type(pk=meta_backend_obj['object_id'])
+        except ObjectDoesNotExist:
+            return None
+
+
+class AllowAny(AuthorizationPolicyBase):
+    public = True
+
+    def has_access(self, request, meta_backend_obj):
+        return True
+
+
+class IsStaff(AuthorizationPolicyBase):
+    def has_access(self, request, meta_backend_obj):
+        return bool(getattr(request.user, 'is_staff', False))
+
+
+class ContentObjectPolicy(AuthorizationPolicyBase):
+    """
+    Calls `check(request, content_object)` with model instance the file is attached to. Access is
+    denied if instance doesn't exist anymore.
+    """
+
+    def __init__(self, check):
+        self.check = check
+
+    def has_access(self, request, meta_backend_obj):
+        content_object = self.get_content_object(meta_backend_obj)
+        if content_object is None:
+            return False
+        return bool(self.check(request, content_object))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+from django.utils.encoding import force_bytes
+
+
+class BloomFilter(object):
+    """
+    Space-efficient probabilistic set of paths. It never reports false negatives:
+    if path is not in filter then path was never added.
+
+    Filter could be persisted to file and loaded back memory-mapped, so
+    every process on host shares the same pages and loading is instant.
+
+    `capacity` and number of added keys are persisted too: false positive rate
+    grows quickly when filter holds more keys than it was sized for.
+    """
+    magic = b'PSB2'
+    header_format = '>4sQBQQ'
+    header_size = struct.calcsize(header_format)
+
+    def __init__(self, bits_count, hashes_count, bits=None, offset=0, capacity=None, count=0):
+        self.bits_count = bits_count
+        self.hashes_count = hashes_count
+        self.bits = bits if bits is not None else bytearray((bits_count + 7) // 8)
+        self.offset = offset
+        self.capacity = capacity
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        bits_count = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hashes_count = max(1, int(round(float(bits_count) / capacity * math.log(2))))
+        return cls(bits_count=bits_count, hashes_count=hashes_count, capacity=capacity)
+
+    @property
+    def is_over_capacity(self):
+        return self.capacity is not None and self.count > self.capacity
+
+    def _get_positions(self, key):
+        # double hashing: k positions from two independent 64-bit halves of one digest
+        first_hash, second_hash = struct.unpack('>QQ', hashlib.md5(force_bytes(key)).digest())
+        for i in range(self.hashes_count):
+            yield (first_hash + i * second_hash) % self.bits_count
+
+    def add(self, key):
+        for position in self._get_positions(key):
+            self.bits[self.offset + position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, key):
+        for position in self._get_positions(key):
+            byte = struct.unpack_from('B', self.bits, self.offset + position // 8)[0]
+            if not byte & (1 << (position % 8)):
+                return False
+        return True
+
+    def save(self, file_path):
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, temp_file_path = tempfile.mkstemp(dir=directory, prefix='.bloom-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(struct.pack(
+                    self.header_format,
+                    self.magic,
+                    self.bits_count,
+                    self.hashes_count,
+                    self.capacity or 0,
+                    self.count
+                ))
+                f.write(bytes(self.bits))
+            # readers should never see partially written filter
+            getattr(os, 'replace', os.rename)(temp_file_path, file_path)
+        except Exception:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as f:
+            bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(bits) < cls.header_size or bits[:len(cls.magic)] != cls.magic:
+            bits.close()
+            raise ValueError('File "{0}" is not a bloom filter'.format(file_path))
+        magic, bits_count, hashes_count, capacity, count = struct.unpack_from(cls.header_format, bits, 0)
+        return cls(
+            bits_count=bits_count,
+            hashes_count=hashes_count,
+            bits=bits,
+            offset=cls.header_size,
+            capacity=capacity or None,
+            count=count
+        )
+
+    def close(self):
+        # releases mapping of loaded filter, lookups raise ValueError after it
+        if isinstance(self.bits, mmap.mmap):
+            self.bits.close()
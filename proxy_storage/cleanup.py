@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Queues of original storage files which should be deleted later. Every task is dict with
+"id", "proxy_storage_name", "original_storage_name", "original_storage_path" and "attempts" keys.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class CleanupQueueBase(object):
+    def put(self, proxy_storage_name, original_storage_name, original_storage_path):
+        raise NotImplementedError
+
+    def iterate(self, batch_size=100):
+        raise NotImplementedError
+
+    def remove(self, task_id):
+        raise NotImplementedError
+
+    def mark_failed(self, task_id):
+        raise NotImplementedError
+
+    def process(self, batch_size=100, max_attempts=None):
+        """
+        Deletes files of queued tasks. Generator of `(task, exception)` pairs, where exception
+        is `None` if file was deleted. Failed tasks are kept in queue for the next run. Files
+        which are referenced by meta-backend objects are not deleted and their tasks are removed.
+        """
+        for task in self.iterate(batch_size=batch_size):
+            if max_attempts is not None and task['attempts'] >= max_attempts:
+                continue
+            try:
+                if self.is_referenced(task):
+                    # failed save could have created meta-backend object after all
+                    self.remove(task['id'])
+                    continue
+                self.get_original_storage(task).delete(task['original_storage_path'])
+            except Exception as exc:
+                self.mark_failed(task['id'])
+                yield task, exc
+            else:
+                self.remove(task['id'])
+                yield task, None
+
+    def get_proxy_storage(self, task):
+        from proxy_storage.settings import proxy_storage_settings
+
+        return proxy_storage_settings.PROXY_STORAGE_CLASSES[task['proxy_storage_name']]()
+
+    def is_referenced(self, task):
+        filters = {}
+        if task.get('original_storage_name') is not None:
+            filters['original_storage_name'] = task['original_storage_name']
+        return bool(self.get_proxy_storage(task).meta_backend.filter_by_original_storage_path(
+            task['original_storage_path'],
+            filters=filters
+        ))
+
+    def get_original_storage(self, task):
+        proxy_storage = self.get_proxy_storage(task)
+        if task['original_storage_name']:
+            return proxy_storage.get_original_storage(
+                meta_backend_obj={'original_storage_name': task['original_storage_name']}
+            )
+        else:
+            return proxy_storage.get_original_storage()
+
+
+class CleanupTaskModelBase(models.Model):
+    proxy_storage_name = models.CharField(max_length=50)
+    original_storage_name = models.CharField(max_length=50, blank=True, null=True)
+    original_storage_path = models.TextField()
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+
+
+class ORMCleanupQueue(CleanupQueueBase):
+    """
+    `using` is database alias for queue writes. Tasks are put when save fails, so if requests
+    are wrapped in transactions then it should be an alias which is not rolled back with them.
+    """
+
+    def __init__(self, model, using=None):
+        self.model = model
+        self.using = using
+
+    def get_queryset(self):
+        if self.using:
+            return self.model.objects.using(self.using)
+        return self.model.objects.all()
+
+    def put(self, proxy_storage_name, original_storage_name, original_storage_path):
+        self.get_queryset().create(
+            proxy_storage_name=proxy_storage_name,
+            original_storage_name=original_storage_name,
+            original_storage_path=original_storage_path
+        )
+
+    def iterate(self, batch_size=100):
+        fields = ['pk', 'proxy_storage_name', 'original_storage_name', 'original_storage_path', 'attempts']
+        last_pk = None
+        while True:
+            queryset = self.get_queryset().order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset.values_list(*fields)[:batch_size])
+            for row in batch:
+                task = dict(zip(fields, row))
+                task['id'] = task.pop('pk')
+                yield task
+            if len(batch) < batch_size:
+                break
+            last_pk = batch[-1][0]
+
+    def remove(self, task_id):
+        self.get_queryset().filter(pk=task_id).delete()
+
+    def mark_failed(self, task_id):
+        self.get_queryset().filter(pk=task_id).update(attempts=models.F('attempts') + 1)
+
+
+class MongoCleanupQueue(CleanupQueueBase):
+    def __init__(self, database, collection):
+        self.database = database
+        self.collection = collection
+
+    def get_collection(self):
+        from pymongo.database import Database
+
+        if isinstance(self.database, Database):
+            database = self.database
+        else:
+            database = self.database()
+        return getattr(database, self.collection)
+
+    def put(self, proxy_storage_name, original_storage_name, original_storage_path):
+        self.get_collection().insert_one({
+            'proxy_storage_name': proxy_storage_name,
+            'original_storage_name': original_storage_name,
+            'original_storage_path': original_storage_path,
+            'attempts': 0,
+            'created_at': timezone.now(),
+        })
+
+    def iterate(self, batch_size=100):
+        for document in self.get_collection().find().sort('_id', 1).batch_size(batch_size):
+            document['id'] = document.pop('_id')
+            yield document
+
+    def remove(self, task_id):
+        self.get_collection().delete_one({'_id': task_id})
+
+    def mark_failed(self, task_id):
+        self.get_collection().update_one({'_id': task_id}, {'$inc': {'attempts': 1}})
@@ -148,6 +148,13 @@ else:
             return [m.upper() for m in self.http_method_names if hasattr(self, m)]
 
 
+# New-style middleware appeared in 1.10
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    MiddlewareMixin = object
+
+
 # PATCH method is not implemented by Django
 if 'patch' not in View.http_method_names:
     View.http_method_names = View.http_method_names + ['patch']
@@ -2,6 +2,7 @@
 from django.utils.encoding import force_text
 from django.db import models
 from django.db.models import signals
+from django.db.models.fields.files import FieldFile
 from django.contrib.contenttypes.models import ContentType
 
 # http://south.readthedocs.org/en/latest/customfields.html#extending-introspection
@@ -22,22 +23,81 @@ class ProxyStorageContentObjectFieldMixin(object):
         path = force_text(getattr(instance, self.name))
         if path:
             proxy_storage = self.storage
-            meta_backend_obj = proxy_storage.meta_backend.get(path=path)
-            content_type = ContentType.objects.get_for_model(type(instance))
-            object_id = instance.id
-            field = self.name
-            if (meta_backend_obj.get('content_type_id') != content_type or
-                meta_backend_obj.get('object_id') != object_id or
-                meta_backend_obj.get('field') != field):
+            update_data = {
+                'content_type_id': ContentType.objects.get_for_model(type(instance)).id,
+                'object_id': instance.id,
+                'field': self.name,
+            }
+            update_buffer = getattr(proxy_storage, 'content_object_update_buffer', None)
+            if update_buffer is not None:
+                update_buffer.put(proxy_storage.meta_backend, path, update_data, using=kwargs.get('using'))
+                return
+            meta_backend_obj = proxy_storage.meta_backend.get(path=path, fields=list(update_data.keys()))
+            if any(meta_backend_obj.get(key) != value for key, value in update_data.items()):
                 proxy_storage.meta_backend.update(
                     path=path,
-                    update_data={
-                        'content_type_id': content_type.id,
-                        'object_id': object_id,
-                        'field': field,
-                    }
+                    update_data=update_data
                 )
 
 
+class ProxyStorageFieldFile(FieldFile):
+    """
+    Uses meta-backend object attached by `prefetch_meta_backend_objs` for `size` and `url` instead of
+    querying meta-backend for every file.
+    """
+    prefetched_meta_backend_obj = None
+
+    def get_prefetched_meta_backend_obj(self):
+        meta_backend_obj = self.prefetched_meta_backend_obj
+        # file could be replaced after prefetch
+        if meta_backend_obj is not None and self._committed and meta_backend_obj['path'] == force_text(self.name):
+            return meta_backend_obj
+        return None
+
+    @property
+    def url(self):
+        meta_backend_obj = self.get_prefetched_meta_backend_obj()
+        if meta_backend_obj is None:
+            return super(ProxyStorageFieldFile, self).url
+        return self.storage.url_for_meta_backend_obj(meta_backend_obj)
+
+    @property
+    def size(self):
+        meta_backend_obj = self.get_prefetched_meta_backend_obj()
+        if meta_backend_obj is None:
+            return super(ProxyStorageFieldFile, self).size
+        return self.storage.size_for_meta_backend_obj(meta_backend_obj)
+
+
 class ProxyStorageFileField(ProxyStorageContentObjectFieldMixin, models.FileField):
-    pass
\ No newline at end of file
+    attr_class = ProxyStorageFieldFile
+
+
+def prefetch_meta_backend_objs(instances, field_names=None, batch_size=1000):
+    """
+    Loads meta-backend objects of files of `instances` by one `get_many` call per meta-backend and
+    attaches them to `ProxyStorageFieldFile` values. All `ProxyStorageFileField` fields are used if
+    `field_names` is not passed. Returns list of instances, so it could be applied to queryset page:
+
+        answers = prefetch_meta_backend_objs(SurveyAnswer.objects.all()[:500])
+    """
+    instances = list(instances)
+    files_by_meta_backend = {}
+    for instance in instances:
+        for field in instance._meta.fields:
+            if not isinstance(field, ProxyStorageFileField):
+                continue
+            if field_names is not None and field.name not in field_names:
+                continue
+            field_file = getattr(instance, field.name)
+            meta_backend = getattr(field_file.storage, 'meta_backend', None)
+            if field_file and meta_backend is not None:
+                files_by_meta_backend.setdefault(meta_backend, []).append(field_file)
+    for meta_backend, field_files in files_by_meta_backend.items():
+        meta_backend_objs = meta_backend.get_many(
+            sorted(set(force_text(field_file.name) for field_file in field_files)),
+            batch_size=batch_size
+        )
+        for field_file in field_files:
+            field_file.prefetched_meta_backend_obj = meta_backend_objs.get(force_text(field_file.name))
+    return instances
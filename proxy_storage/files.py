@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import io
+import mmap
+import os
+
+from django.core.files.base import File
+
+from proxy_storage.compat import six
+
+
+class RangeFile(File):
+    """
+    Read-only view of `length` bytes (till the end if `None`) of file object from `offset`.
+    Underlying file is seeked to `offset` (GridFS skips whole chunks on seek), files which
+    can't seek are read and the head is discarded.
+    """
+    skip_chunk_size = 64 * 1024
+
+    def __init__(self, file, offset=0, length=None, name=None):
+        super(RangeFile, self).__init__(file, name=name or getattr(file, 'name', None))
+        self.offset = offset
+        self.length = length
+        self._remaining = length
+        self._seek_to_offset()
+
+    def _seek_to_offset(self):
+        if not self.offset:
+            return
+        try:
+            self.file.seek(self.offset)
+            return
+        except (AttributeError, IOError, OSError, io.UnsupportedOperation):
+            pass
+        to_skip = self.offset
+        while to_skip > 0:
+            skipped = len(self.file.read(min(to_skip, self.skip_chunk_size)))
+            if not skipped:
+                break
+            to_skip -= skipped
+
+    def read(self, size=-1):
+        if self._remaining is None:
+            return self.file.read(size)
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        if not size:
+            return b''
+        data = self.file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def chunks(self, chunk_size=None):
+        # unlike File.chunks range is not rewound to the start of underlying file
+        chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def seek(self, offset, whence=0):
+        raise io.UnsupportedOperation('RangeFile is not seekable')
+
+    def _get_size(self):
+        if self.length is not None:
+            return self.length
+        # underlying file is not seeked to the end to find size, because reading position would be lost
+        if hasattr(self.file, 'size'):
+            return self.file.size - self.offset
+        raise AttributeError("Unable to determine the file's size.")
+
+    size = property(_get_size)
+
+    @property
+    def is_partial(self):
+        # size of underlying file is not known, so any limited range is treated as partial
+        return bool(self.offset) or self.length is not None
+
+
+class MmapFile(File):
+    """
+    Read-only file which content is memory-mapped, so `memoryview` slices and `chunks` don't copy
+    data to python objects. `offset` and `length` limit it to a range of underlying file. File
+    descriptor is kept at reading position, so code which uses it directly reads the same bytes.
+    """
+
+    def __init__(self, file, offset=0, length=None, name=None):
+        super(MmapFile, self).__init__(file, name=name or getattr(file, 'name', None))
+        self.file_size = os.fstat(file.fileno()).st_size
+        self.offset = min(offset, self.file_size)
+        if length is None:
+            self.length = self.file_size - self.offset
+        else:
+            self.length = min(length, self.file_size - self.offset)
+        # empty files can't be mapped
+        self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.file_size else None
+        self._position = 0
+        self._sync_file_position()
+
+    def _sync_file_position(self):
+        # descriptor is moved directly: python 2 file object seeks its stdio buffer only
+        os.lseek(self.fileno(), self.offset + self._position, os.SEEK_SET)
+
+    def _get_bounds(self, offset, length):
+        start = min(max(offset, 0), self.length)
+        if length is None or length < 0:
+            return start, self.length
+        return start, min(start + length, self.length)
+
+    def memoryview(self, offset=0, length=None):
+        """
+        Returns `length` bytes (till the end if `None`) from `offset` of the range without copying.
+        It is `buffer` in python 2, because mmap doesn't support new buffer protocol there.
+        """
+        start, end = self._get_bounds(offset, length)
+        if six.PY2:
+            if self._mmap is None or start == end:
+                return buffer(b'')  # noqa
+            return buffer(self._mmap, self.offset + start, end - start)  # noqa
+        if self._mmap is None or start == end:
+            return memoryview(b'')
+        return memoryview(self._mmap)[self.offset + start:self.offset + end]
+
+    def read(self, size=-1):
+        start, end = self._get_bounds(self._position, size)
+        if self._mmap is None or start == end:
+            return b''
+        self._position = end
+        self._sync_file_position()
+        return self._mmap[self.offset + start:self.offset + end]
+
+    def readline(self, size=-1):
+        start, end = self._get_bounds(self._position, size)
+        if self._mmap is not None:
+            newline = self._mmap.find(b'\n', self.offset + start, self.offset + end)
+            if newline != -1:
+                end = newline - self.offset + 1
+        return self.read(end - start)
+
+    def __iter__(self):
+        # File.__iter__ splits chunks, which are memoryviews here
+        return iter(self.readline, b'')
+
+    def chunks(self, chunk_size=None):
+        """
+        Yields `memoryview` slices of the range from its start.
+        """
+        chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.seek(0)
+        while self._position < self.length:
+            chunk = self.memoryview(self._position, chunk_size)
+            self.seek(self._position + len(chunk))
+            yield chunk
+
+    def seek(self, offset, whence=0):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self._position = max(offset, 0)
+        self._sync_file_position()
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # memoryview slices are still referenced, mapping is released with the last of them
+                pass
+            self._mmap = None
+        self.file.close()
+
+    def _get_size(self):
+        return self.length
+
+    size = property(_get_size)
+
+    @property
+    def is_partial(self):
+        return self.length < self.file_size
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from proxy_storage.settings import proxy_storage_settings
+
+
+class Command(BaseCommand):
+    help = 'Deletes original storage files which were put to cleanup queues of proxy-storages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'proxy_storage_names',
+            nargs='*',
+            help='Names of proxy-storages from PROXY_STORAGE_CLASSES setting. All by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of tasks fetched from queue at once.'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=None,
+            help='Skip tasks which failed this number of times.'
+        )
+
+    def handle(self, *args, **options):
+        proxy_storage_classes = proxy_storage_settings.PROXY_STORAGE_CLASSES
+        names = options['proxy_storage_names'] or sorted(proxy_storage_classes.keys())
+        processed_queues = []
+        for name in names:
+            try:
+                proxy_storage_class = proxy_storage_classes[name]
+            except KeyError:
+                raise CommandError('Unknown proxy-storage "{0}"'.format(name))
+            cleanup_queue = getattr(proxy_storage_class, 'cleanup_queue', None)
+            # queue could be shared by many proxy-storages
+            if cleanup_queue is None or any(cleanup_queue is queue for queue in processed_queues):
+                continue
+            processed_queues.append(cleanup_queue)
+            deleted_count = 0
+            results = cleanup_queue.process(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            for task, error in results:
+                if error is None:
+                    deleted_count += 1
+                else:
+                    self.stderr.write('Could not delete "{0}" of "{1}": {2}'.format(
+                        task['original_storage_path'],
+                        task['proxy_storage_name'],
+                        error
+                    ))
+            self.stdout.write('Deleted {0} files from cleanup queue of "{1}"'.format(deleted_count, name))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from proxy_storage.settings import proxy_storage_settings
+from proxy_storage.storages.soft_delete import SoftDeleteProxyStorageMixin
+
+
+class Command(BaseCommand):
+    help = 'Physically deletes soft deleted files of proxy-storages with soft delete.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'proxy_storage_names',
+            nargs='*',
+            help='Names of proxy-storages from PROXY_STORAGE_CLASSES setting. All by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of files deleted at once.'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches.'
+        )
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=None,
+            help='Purge files deleted more than this number of seconds ago. '
+                 'Proxy-storage "soft_delete_purge_delay" by default.'
+        )
+
+    def handle(self, *args, **options):
+        proxy_storage_classes = proxy_storage_settings.PROXY_STORAGE_CLASSES
+        names = options['proxy_storage_names'] or sorted(proxy_storage_classes.keys())
+        for name in names:
+            try:
+                proxy_storage_class = proxy_storage_classes[name]
+            except KeyError:
+                raise CommandError('Unknown proxy-storage "{0}"'.format(name))
+            if not issubclass(proxy_storage_class, SoftDeleteProxyStorageMixin):
+                continue
+            proxy_storage = proxy_storage_class()
+            deleted_before = None
+            if options['older_than'] is not None:
+                deleted_before = time.time() - options['older_than']
+            errors = proxy_storage.purge_deleted(
+                deleted_before=deleted_before,
+                batch_size=options['batch_size'],
+                pause=options['pause']
+            )
+            for path, error in sorted(errors.items()):
+                self.stderr.write('Could not purge "{0}" from "{1}": {2}'.format(path, name, error))
+            self.stdout.write('Purged deleted files of "{0}"'.format(name))
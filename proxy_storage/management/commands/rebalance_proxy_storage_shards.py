@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from proxy_storage.meta_backends.sharded import ShardedMetaBackend
+from proxy_storage.settings import proxy_storage_settings
+
+
+class Command(BaseCommand):
+    help = 'Moves meta-backend objects of proxy-storages with sharded meta-backend to shards which own their paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'proxy_storage_names',
+            nargs='*',
+            help='Names of proxy-storages from PROXY_STORAGE_CLASSES setting. All by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of objects moved at once.'
+        )
+
+    def handle(self, *args, **options):
+        proxy_storage_classes = proxy_storage_settings.PROXY_STORAGE_CLASSES
+        names = options['proxy_storage_names'] or sorted(proxy_storage_classes.keys())
+        for name in names:
+            try:
+                proxy_storage_class = proxy_storage_classes[name]
+            except KeyError:
+                raise CommandError('Unknown proxy-storage "{0}"'.format(name))
+            meta_backend = proxy_storage_class().meta_backend
+            if not isinstance(meta_backend, ShardedMetaBackend):
+                continue
+            moved_counts = {}
+            for path, source_shard_name, target_shard_name in meta_backend.rebalance(batch_size=options['batch_size']):
+                key = (source_shard_name, target_shard_name)
+                moved_counts[key] = moved_counts.get(key, 0) + 1
+            for (source_shard_name, target_shard_name), count in sorted(moved_counts.items()):
+                self.stdout.write('Moved {0} objects of "{1}" from "{2}" to "{3}"'.format(
+                    count,
+                    name,
+                    source_shard_name,
+                    target_shard_name
+                ))
+            self.stdout.write('Rebalanced "{0}"'.format(name))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from proxy_storage.settings import proxy_storage_settings
+from proxy_storage.storages.negative_lookup import BloomFilterLookupGuardMixin
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds bloom filters over meta-backend paths for proxy-storages with bloom filter lookup guard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'proxy_storage_names',
+            nargs='*',
+            help='Names of proxy-storages from PROXY_STORAGE_CLASSES setting. All by default.'
+        )
+
+    def handle(self, *args, **options):
+        proxy_storage_classes = proxy_storage_settings.PROXY_STORAGE_CLASSES
+        names = options['proxy_storage_names'] or sorted(proxy_storage_classes.keys())
+        for name in names:
+            try:
+                proxy_storage_class = proxy_storage_classes[name]
+            except KeyError:
+                raise CommandError('Unknown proxy-storage "{0}"'.format(name))
+            if not issubclass(proxy_storage_class, BloomFilterLookupGuardMixin):
+                continue
+            proxy_storage = proxy_storage_class()
+            if not proxy_storage.bloom_filter_file_path:
+                continue
+            proxy_storage.rebuild_bloom_filter()
+            self.stdout.write('Rebuilt bloom filter for "{0}" at {1}'.format(
+                name,
+                proxy_storage.bloom_filter_file_path
+            ))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from proxy_storage.reconcile import Reconciler, FAILED
+from proxy_storage.settings import proxy_storage_settings
+
+
+class Command(BaseCommand):
+    help = ('Finds files of original storages which are not referenced by meta-backend and meta-backend objects '
+            'which reference not existing files. Nothing is deleted without --delete-* options.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'proxy_storage_names',
+            nargs='*',
+            help='Names of proxy-storages from PROXY_STORAGE_CLASSES setting. All by default.'
+        )
+        parser.add_argument(
+            '--workers',
+            default=None,
+            help='Number of threads per original storage, or JSON object with numbers by original storage name. '
+                 'Proxy-storage "reconcile_workers" by default.'
+        )
+        parser.add_argument(
+            '--delete-orphaned-files',
+            action='store_true',
+            default=False,
+            help='Delete files which are not referenced by meta-backend.'
+        )
+        parser.add_argument(
+            '--delete-dangling-records',
+            action='store_true',
+            default=False,
+            help='Delete meta-backend objects which reference not existing files.'
+        )
+        parser.add_argument(
+            '--grace-period',
+            type=int,
+            default=60 * 60,
+            help='Orphaned files modified less than this number of seconds ago are not deleted.'
+        )
+
+    def get_workers(self, proxy_storage, workers_option):
+        if workers_option is None:
+            return proxy_storage.reconcile_workers
+        try:
+            return json.loads(workers_option)
+        except ValueError:
+            raise CommandError('--workers must be a number or JSON object')
+
+    def handle(self, *args, **options):
+        proxy_storage_classes = proxy_storage_settings.PROXY_STORAGE_CLASSES
+        names = options['proxy_storage_names'] or sorted(proxy_storage_classes.keys())
+        for name in names:
+            try:
+                proxy_storage = proxy_storage_classes[name]()
+            except KeyError:
+                raise CommandError('Unknown proxy-storage "{0}"'.format(name))
+            reconciler = Reconciler(
+                proxy_storage=proxy_storage,
+                workers=self.get_workers(proxy_storage, options['workers']),
+                delete_orphaned_files=options['delete_orphaned_files'],
+                delete_dangling_records=options['delete_dangling_records'],
+                grace_period=options['grace_period']
+            )
+            for result in reconciler.reconcile():
+                difference = result.difference
+                line = u'{0} {1} {2} {3} {4}'.format(
+                    name,
+                    difference.original_storage_name or '-',
+                    difference.kind,
+                    difference.original_storage_path,
+                    result.action
+                )
+                if result.action == FAILED:
+                    self.stderr.write(u'{0}: {1}'.format(line, result.error))
+                else:
+                    self.stdout.write(line)
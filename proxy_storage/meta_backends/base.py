@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from proxy_storage import request_cache, utils
 
 
 class MetaBackendObjectException(Exception):
@@ -9,6 +10,10 @@ class MetaBackendObjectDoesNotExist(MetaBackendObjectException):
     pass
 
 
+class MetaBackendObjectAlreadyExists(MetaBackendObjectException):
+    pass
+
+
 class MetaBackendObject(dict):
     def get_original_storage(self):
         return self.get_proxy_storage().get_original_storage(
@@ -28,8 +33,14 @@ class MetaBackendObject(dict):
 
 
 class MetaBackendBase(object):
+    # backends which support projections accept `fields` argument in `_get`, `_get_many` and `_iterate`
+    supports_projections = False
+
     def create(self, data):
-        return self.get_meta_backend_obj(obj=self._create(data=data))
+        try:
+            return self.get_meta_backend_obj(obj=self._create(data=data))
+        finally:
+            request_cache.invalidate(data.get('path'))
 
     def get_meta_backend_obj(self, obj):
         return MetaBackendObject(
@@ -42,17 +53,307 @@ class MetaBackendBase(object):
     def _create(self, data):
         raise NotImplementedError
 
-    def get(self, path):
-        return self.get_meta_backend_obj(self._get(path=path))
+    def create_many(self, data_list, batch_size=1000):
+        """
+        Creates meta-backend objects in batches and returns list of them. Backends which
+        support bulk writes could create objects of batch in any order and continue after
+        failed ones, so on error some of objects could be already created.
+        """
+        meta_backend_objs = []
+        for data_batch in utils.chunks(data_list, batch_size):
+            try:
+                for obj in self._create_many(data_list=data_batch):
+                    meta_backend_objs.append(self.get_meta_backend_obj(obj=obj))
+            finally:
+                request_cache.invalidate(*[data.get('path') for data in data_batch])
+        return meta_backend_objs
+
+    def _create_many(self, data_list):
+        return [self._create(data=data) for data in data_list]
+
+    def get_unique_violation_exceptions(self):
+        """
+        Returns tuple of exceptions which `create` raises if object with the same path already exists.
+        """
+        return (MetaBackendObjectAlreadyExists,)
 
-    def _get(self, path):
+    def get_not_written_exceptions(self):
+        """
+        Returns tuple of exceptions which prove that `create` wrote nothing. Other errors (timeouts,
+        lost connections) could be raised after object was written.
+        """
+        from django.core.exceptions import ValidationError
+
+        return self.get_unique_violation_exceptions() + (ValidationError, ValueError, TypeError)
+
+    def get_projection_fields(self, fields):
+        """
+        Returns sorted list of fields to fetch or `None` if whole object should be fetched.
+        "path" is always fetched, so projected objects could be matched with paths.
+        """
+        if fields is None or not self.supports_projections:
+            return None
+        return sorted(set(fields) | set(['path']))
+
+    def get_request_cache_key(self, fields):
+        if fields is None:
+            return 'get'
+        return 'get', tuple(fields)
+
+    def get(self, path, fields=None):
+        """
+        If `fields` is passed then returned object contains only those keys (and "path")
+        and other fields are not loaded from meta-backend. Backends without projections
+        support return whole object.
+        """
+        fields = self.get_projection_fields(fields)
+        if fields is None:
+            getter = lambda: self.get_meta_backend_obj(self._get(path=path))
+        else:
+            getter = lambda: self.get_meta_backend_obj(self._get(path=path, fields=fields))
+        meta_backend_obj = request_cache.get_or_set(
+            namespace=id(self),
+            key=self.get_request_cache_key(fields),
+            path=path,
+            getter=getter
+        )
+        # callers are free to modify returned object, so cached one should not be shared
+        return MetaBackendObject(meta_backend_obj)
+
+    def _get(self, path, fields=None):
         raise NotImplementedError
 
+    def get_many(self, paths, batch_size=1000, fields=None):
+        """
+        Returns dict of meta-backend objects by path. Not existing paths are skipped.
+        """
+        fields = self.get_projection_fields(fields)
+        cache_key = self.get_request_cache_key(fields)
+        result = {}
+        for paths_batch in utils.chunks(paths, batch_size):
+            if fields is None:
+                objs = self._get_many(paths=paths_batch)
+            else:
+                objs = self._get_many(paths=paths_batch, fields=fields)
+            for obj in objs:
+                meta_backend_obj = self.get_meta_backend_obj(obj)
+                request_cache.set_value(
+                    namespace=id(self),
+                    key=cache_key,
+                    path=meta_backend_obj['path'],
+                    value=meta_backend_obj
+                )
+                result[meta_backend_obj['path']] = MetaBackendObject(meta_backend_obj)
+        return result
+
+    def _get_many(self, paths, fields=None):
+        objs = []
+        for path in paths:
+            try:
+                if fields is None:
+                    objs.append(self._get(path=path))
+                else:
+                    objs.append(self._get(path=path, fields=fields))
+            except MetaBackendObjectDoesNotExist:
+                pass
+        return objs
+
     def delete(self, path):
+        try:
+            return self._delete(path=path)
+        finally:
+            request_cache.invalidate(path)
+
+    def _delete(self, path):
         raise NotImplementedError
 
+    def delete_many(self, paths, batch_size=1000):
+        for paths_batch in utils.chunks(paths, batch_size):
+            try:
+                self._delete_many(paths=paths_batch)
+            finally:
+                request_cache.invalidate(*paths_batch)
+
+    def _delete_many(self, paths):
+        for path in paths:
+            self._delete(path=path)
+
     def update(self, path, update_data):
+        try:
+            return self._update(path=path, update_data=update_data)
+        finally:
+            request_cache.invalidate(path, update_data.get('path'))
+
+    def _update(self, path, update_data):
         raise NotImplementedError
 
+    def update_many(self, update_data_by_path, batch_size=1000):
+        """
+        Applies `update_data` dicts by path in batches.
+        """
+        for items_batch in utils.chunks(update_data_by_path.items(), batch_size):
+            try:
+                self._update_many(update_data_by_path=dict(items_batch))
+            finally:
+                paths = []
+                for path, update_data in items_batch:
+                    paths.extend([path, update_data.get('path')])
+                request_cache.invalidate(*paths)
+
+    def _update_many(self, update_data_by_path):
+        for path, update_data in update_data_by_path.items():
+            self._update(path=path, update_data=update_data)
+
     def exists(self, path):
-        raise NotImplementedError
\ No newline at end of file
+        return request_cache.get_or_set(
+            namespace=id(self),
+            key='exists',
+            path=path,
+            getter=lambda: self._exists(path=path)
+        )
+
+    def _exists(self, path):
+        raise NotImplementedError
+
+    def exists_many(self, paths, batch_size=1000):
+        """
+        Returns set of existing paths.
+        """
+        result = set()
+        for paths_batch in utils.chunks(paths, batch_size):
+            existing_paths = set(self._exists_many(paths=paths_batch))
+            for path in paths_batch:
+                request_cache.set_value(namespace=id(self), key='exists', path=path, value=path in existing_paths)
+            result.update(existing_paths)
+        return result
+
+    def _exists_many(self, paths):
+        return [path for path in paths if self._exists(path=path)]
+
+    def iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        """
+        Generator of meta-backend objects ordered by path. Paths are compared bytewise (order of UTF-8
+        bytes, which is order of python 3 strings), not by database collation: `iterate`, `iterate_paths`
+        and `iterate_by_original_storage_path` of every meta-backend must follow it, because streams of
+        different meta-backends are merged by sharded meta-backend and reconciliation.
+
+        If `start_after` is passed, iteration starts from the first path greater than it, so callers
+        could skip ranges of paths without reading them.
+        """
+        kwargs = {}
+        fields = self.get_projection_fields(fields)
+        if fields is not None:
+            kwargs['fields'] = fields
+        if start_after is not None:
+            kwargs['start_after'] = start_after
+        for obj in self._iterate(prefix=prefix, batch_size=batch_size, **kwargs):
+            yield self.get_meta_backend_obj(obj)
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        raise NotImplementedError
+
+    def iterate_paths(self, prefix=None, batch_size=1000, start_after=None):
+        for meta_backend_obj in self.iterate(
+            prefix=prefix,
+            batch_size=batch_size,
+            fields=['path'],
+            start_after=start_after
+        ):
+            yield meta_backend_obj['path']
+
+    def count(self):
+        """
+        Returns number of objects, for example to size bloom filter of all paths.
+        """
+        return self._count()
+
+    def _count(self):
+        # meta-backends which count without walking all paths override it
+        return sum(1 for path in self.iterate_paths())
+
+    def iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        """
+        Generator of meta-backend objects ordered by "original_storage_path" compared bytewise, objects
+        with equal original storage path could be in any order. If `filters` dict is passed then only
+        objects with equal values of those keys are returned.
+        """
+        for obj in self._iterate_by_original_storage_path(filters=filters, batch_size=batch_size):
+            yield self.get_meta_backend_obj(obj)
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        raise NotImplementedError
+
+    def filter_by_original_storage_path(self, original_storage_path, filters=None):
+        """
+        Returns list of meta-backend objects which refer to `original_storage_path`. Point lookup
+        for checks of single files, `iterate_by_original_storage_path` is for whole storages.
+        """
+        return [
+            self.get_meta_backend_obj(obj)
+            for obj in self._filter_by_original_storage_path(original_storage_path, filters=filters)
+        ]
+
+    def _filter_by_original_storage_path(self, original_storage_path, filters=None):
+        # backends with index on original storage path override it
+        filters = dict(filters or {}, original_storage_path=original_storage_path)
+        return self._iterate_by_original_storage_path(filters=filters)
+
+    def filter_by_content_object(self, content_type_id, object_id, field=None, fields=None):
+        """
+        Returns list of meta-backend objects of files attached to content object ordered by path.
+        If `field` is passed then only files of that model field are returned.
+        """
+        return self.filter_by_content_objects(
+            content_objects=[(content_type_id, object_id)],
+            field=field,
+            fields=fields
+        )[(content_type_id, object_id)]
+
+    def filter_by_content_objects(self, content_objects, field=None, fields=None, batch_size=1000):
+        """
+        Bulk variant of `filter_by_content_object`. Returns dict of lists of meta-backend objects
+        by `(content_type_id, object_id)` pairs of `content_objects`.
+        """
+        content_objects = [tuple(content_object) for content_object in content_objects]
+        if fields is not None:
+            fields = list(fields) + ['content_type_id', 'object_id', 'field']
+        fields = self.get_projection_fields(fields)
+        result = dict((content_object, []) for content_object in content_objects)
+        for content_objects_batch in utils.chunks(sorted(set(content_objects)), batch_size):
+            if fields is None:
+                objs = self._filter_by_content_objects(content_objects=content_objects_batch, field=field)
+            else:
+                objs = self._filter_by_content_objects(
+                    content_objects=content_objects_batch,
+                    field=field,
+                    fields=fields
+                )
+            for obj in objs:
+                meta_backend_obj = self.get_meta_backend_obj(obj)
+                content_object = (meta_backend_obj.get('content_type_id'), meta_backend_obj.get('object_id'))
+                if content_object in result:
+                    result[content_object].append(meta_backend_obj)
+        for meta_backend_objs in result.values():
+            meta_backend_objs.sort(key=lambda meta_backend_obj: meta_backend_obj['path'])
+        return result
+
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        # full scan, backends with content object index override it
+        content_objects = set(content_objects)
+        for obj in self._iterate_by_original_storage_path():
+            obj_dict = self._convert_obj_to_dict(obj)
+            if (obj_dict.get('content_type_id'), obj_dict.get('object_id')) not in content_objects:
+                continue
+            if field is not None and obj_dict.get('field') != field:
+                continue
+            yield obj
+
+    def group_content_objects(self, content_objects):
+        """
+        Returns dict of object ids by content type id, so backends could look them up with one
+        "IN" condition per content type.
+        """
+        object_ids_by_content_type_id = {}
+        for content_type_id, object_id in content_objects:
+            object_ids_by_content_type_id.setdefault(content_type_id, []).append(object_id)
+        return object_ids_by_content_type_id
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+import time
+
+from proxy_storage.meta_backends.base import (
+    MetaBackendBase,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+
+
+def simulate_latency(latency):
+    if callable(latency):
+        latency = latency()
+    if latency:
+        time.sleep(latency)
+
+
+class MemoryMetaBackend(MetaBackendBase):
+    """
+    Thread-safe meta-backend which keeps objects in process memory. Intended for tests and
+    benchmarks of proxy-storage logic without database.
+
+    `indexes` is list of field names (or tuples of field names) which `filter` looks up without
+    scanning all objects. `latency` is number of seconds (or callable which returns it) every
+    operation sleeps to simulate remote meta-backend.
+    """
+    supports_projections = True
+
+    def __init__(self, indexes=(), latency=0):
+        self.indexes = [index if isinstance(index, tuple) else (index,) for index in indexes]
+        self.latency = latency
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._objects = {}
+            self._sorted_paths = []
+            self._index_values = dict((index, {}) for index in self.indexes)
+
+    def _convert_obj_to_dict(self, obj):
+        return obj
+
+    def _project(self, obj, fields=None):
+        # objects are copied, so callers never share stored dicts
+        if fields is None:
+            return dict(obj)
+        return dict((field, obj[field]) for field in fields if field in obj)
+
+    def _get_index_key(self, index, obj):
+        return tuple(obj.get(field) for field in index)
+
+    def _add(self, obj):
+        self._objects[obj['path']] = obj
+        bisect.insort(self._sorted_paths, obj['path'])
+        for index, values in self._index_values.items():
+            values.setdefault(self._get_index_key(index, obj), set()).add(obj['path'])
+
+    def _remove(self, path):
+        obj = self._objects.pop(path)
+        del self._sorted_paths[bisect.bisect_left(self._sorted_paths, path)]
+        for index, values in self._index_values.items():
+            key = self._get_index_key(index, obj)
+            values[key].discard(path)
+            if not values[key]:
+                del values[key]
+        return obj
+
+    def _create(self, data):
+        simulate_latency(self.latency)
+        with self._lock:
+            if data['path'] in self._objects:
+                raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(data['path']))
+            self._add(dict(data))
+        return dict(data)
+
+    def _get(self, path, fields=None):
+        simulate_latency(self.latency)
+        with self._lock:
+            try:
+                return self._project(self._objects[path], fields)
+            except KeyError:
+                raise MetaBackendObjectDoesNotExist('Could not find object with path "{0}"'.format(path))
+
+    def _get_many(self, paths, fields=None):
+        simulate_latency(self.latency)
+        with self._lock:
+            return [self._project(self._objects[path], fields) for path in paths if path in self._objects]
+
+    def _delete(self, path):
+        self._delete_many([path])
+
+    def _delete_many(self, paths):
+        simulate_latency(self.latency)
+        with self._lock:
+            for path in paths:
+                if path in self._objects:
+                    self._remove(path)
+
+    def _update(self, path, update_data):
+        simulate_latency(self.latency)
+        with self._lock:
+            if path not in self._objects:
+                return
+            new_path = update_data.get('path', path)
+            if new_path != path and new_path in self._objects:
+                raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(new_path))
+            self._add(dict(self._remove(path), **update_data))
+
+    def _exists(self, path):
+        simulate_latency(self.latency)
+        with self._lock:
+            return path in self._objects
+
+    def _exists_many(self, paths):
+        simulate_latency(self.latency)
+        with self._lock:
+            return [path for path in paths if path in self._objects]
+
+    def _count(self):
+        simulate_latency(self.latency)
+        with self._lock:
+            return len(self._objects)
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        last_path = start_after
+        while True:
+            simulate_latency(self.latency)
+            with self._lock:
+                start = bisect.bisect_left(self._sorted_paths, prefix or '')
+                if last_path is not None:
+                    start = max(start, bisect.bisect_right(self._sorted_paths, last_path))
+                batch = []
+                for path in self._sorted_paths[start:start + batch_size]:
+                    if prefix and not path.startswith(prefix):
+                        break
+                    batch.append(self._project(self._objects[path], fields))
+            for obj in batch:
+                yield obj
+            if len(batch) < batch_size:
+                break
+            last_path = batch[-1]['path']
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        simulate_latency(self.latency)
+        with self._lock:
+            objs = [dict(obj) for obj in self._objects.values()]
+        objs.sort(key=lambda obj: (obj.get('original_storage_path') or '', obj['path']))
+        for obj in objs:
+            if filters and any(obj.get(key) != value for key, value in filters.items()):
+                continue
+            yield obj
+
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        objs = []
+        for content_type_id, object_id in content_objects:
+            lookup = {'content_type_id': content_type_id, 'object_id': object_id}
+            if field is not None:
+                lookup['field'] = field
+            objs.extend(self._project(obj, fields) for obj in self._filter(lookup))
+        return objs
+
+    def _filter(self, lookup):
+        simulate_latency(self.latency)
+        with self._lock:
+            # the widest index which fields are all in lookup narrows down candidates
+            candidate_indexes = [index for index in self.indexes if set(index) <= set(lookup)]
+            if candidate_indexes:
+                index = max(candidate_indexes, key=len)
+                paths = self._index_values[index].get(self._get_index_key(index, lookup), ())
+                objs = [self._objects[path] for path in paths]
+            else:
+                objs = list(self._objects.values())
+            return [
+                dict(obj) for obj in objs
+                if all(obj.get(key) == value for key, value in lookup.items())
+            ]
+
+    def filter(self, **lookup):
+        """
+        Returns list of meta-backend objects with equal values of `lookup` fields ordered by path.
+        Index is used if its fields are all in `lookup`, otherwise all objects are scanned.
+        """
+        objs = self._filter(lookup)
+        return [self.get_meta_backend_obj(obj) for obj in sorted(objs, key=lambda obj: obj['path'])]
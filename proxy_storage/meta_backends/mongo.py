@@ -1,15 +1,45 @@
 # -*- coding: utf-8 -*-
-from copy import deepcopy
+import re
+
 from proxy_storage.meta_backends.base import MetaBackendBase, MetaBackendObjectDoesNotExist
 
 
 class MongoMetaBackend(MetaBackendBase):
-    def __init__(self, database, collection):
+    """
+    `write_concerns` and `read_preferences` are dicts of pymongo `WriteConcern` (or dicts of its arguments)
+    and read preferences by operation name: "create", "update", "delete", "delete_many", "get",
+    "get_many", "exists", "iterate" and "filter_by_content_objects". `create_many` uses settings of
+    "create" and `update_many` uses settings of "update". Operations which are not mentioned use
+    collection defaults.
+
+    Bulk operations (`create_many`, `update_many`, `delete_many`) are sent as unordered batches: server
+    applies them in any order and doesn't stop on the first failed document. Requires pymongo>=3.7.
+    """
+    supports_projections = True
+
+    def __init__(self, database, collection, write_concerns=None, read_preferences=None):
         self.database = database
         self.collection = collection
+        self.write_concerns = write_concerns or {}
+        self.read_preferences = read_preferences or {}
+        self._indexes_ensured = False
 
-    def get_collection(self):
-        return getattr(self.get_database(), self.collection)
+    def get_collection(self, operation=None):
+        collection = getattr(self.get_database(), self.collection)
+        options = {}
+        write_concern = self.write_concerns.get(operation)
+        if write_concern is not None:
+            if isinstance(write_concern, dict):
+                from pymongo.write_concern import WriteConcern
+
+                write_concern = WriteConcern(**write_concern)
+            options['write_concern'] = write_concern
+        read_preference = self.read_preferences.get(operation)
+        if read_preference is not None:
+            options['read_preference'] = read_preference
+        if options:
+            collection = collection.with_options(**options)
+        return collection
 
     def get_database(self):
         from pymongo.database import Database
@@ -22,17 +52,49 @@ class MongoMetaBackend(MetaBackendBase):
     def _convert_obj_to_dict(self, obj):
         return obj
 
+    def ensure_indexes(self):
+        if not self._indexes_ensured:
+            collection = self.get_collection()
+            collection.create_index('path', unique=True)
+            collection.create_index([('content_type_id', 1), ('object_id', 1), ('field', 1)])
+            # "iterate_by_original_storage_path" is sorted by index instead of in-memory sort
+            collection.create_index([('original_storage_path', 1), ('_id', 1)])
+            self._indexes_ensured = True
+
     def _create(self, data):
-        self.get_collection().ensure_index('path', unique=True)
-        object_id = self.get_collection().insert(data)
-        obj = deepcopy(data)
-        obj.update({
-            '_id': object_id
-        })
-        return obj
+        self.ensure_indexes()
+        # shallow copy, because pymongo sets "_id" of inserted document in place
+        document = dict(data)
+        self.get_collection('create').insert_one(document)
+        return document
+
+    def _create_many(self, data_list):
+        self.ensure_indexes()
+        documents = [dict(data) for data in data_list]
+        self.get_collection('create').insert_many(documents, ordered=False)
+        return documents
+
+    def get_unique_violation_exceptions(self):
+        from pymongo.errors import DuplicateKeyError
+
+        return super(MongoMetaBackend, self).get_unique_violation_exceptions() + (DuplicateKeyError,)
+
+    def get_not_written_exceptions(self):
+        from pymongo.errors import InvalidDocument, WriteError
+
+        # server rejected the write or document was not sent at all
+        return super(MongoMetaBackend, self).get_not_written_exceptions() + (WriteError, InvalidDocument)
 
-    def _get(self, path):
-        response = self.get_collection().find_one({'path': path})
+    def get_projection(self, fields):
+        if fields is None:
+            return None
+        projection = dict((field, 1) for field in fields)
+        # "_id" is returned by default, so it should be excluded explicitly
+        projection.setdefault('_id', 0)
+        return projection
+
+    def _get(self, path, fields=None):
+        response = self.get_collection('get').find_one({'path': path}, self.get_projection(fields))
         if response is None:
             raise MetaBackendObjectDoesNotExist('Could not find document in "{}"'.format(
                 self.collection
@@ -40,11 +102,64 @@ class MongoMetaBackend(MetaBackendBase):
         else:
             return response
 
-    def delete(self, path):
-        return self.get_collection().remove({'path': path})
+    def _get_many(self, paths, fields=None):
+        return self.get_collection('get_many').find({'path': {'$in': paths}}, self.get_projection(fields))
+
+    def _delete(self, path):
+        return self.get_collection('delete').delete_one({'path': path})
+
+    def _delete_many(self, paths):
+        return self.get_collection('delete_many').delete_many({'path': {'$in': paths}})
+
+    def _update(self, path, update_data):
+        return self.get_collection('update').update_one({'path': path}, {'$set': update_data})
+
+    def _update_many(self, update_data_by_path):
+        from pymongo import UpdateOne
+
+        return self.get_collection('update').bulk_write([
+            UpdateOne({'path': path}, {'$set': update_data})
+            for path, update_data in update_data_by_path.items()
+        ], ordered=False)
+
+    def _exists(self, path):
+        # only "_id" is fetched, so document itself is not transferred
+        return self.get_collection('exists').find_one({'path': path}, {'_id': 1}) is not None
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        return self._get_iterate_cursor(
+            prefix=prefix,
+            batch_size=batch_size,
+            projection=self.get_projection(fields),
+            start_after=start_after
+        )
+
+    def _count(self):
+        return self.get_collection('count').count_documents({})
+
+    def _get_iterate_cursor(self, prefix=None, batch_size=1000, projection=None, start_after=None):
+        query = {}
+        if prefix:
+            # anchored case sensitive regex is served by "path" index range scan
+            query.setdefault('path', {})['$regex'] = '^' + re.escape(prefix)
+        if start_after is not None:
+            query.setdefault('path', {})['$gt'] = start_after
+        return self.get_collection('iterate').find(query, projection).sort('path', 1).batch_size(batch_size)
 
-    def update(self, path, update_data):
-        self.get_collection().update({'path': path}, {'$set': update_data})
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        query = {
+            '$or': [
+                {'content_type_id': content_type_id, 'object_id': {'$in': object_ids}}
+                for content_type_id, object_ids in self.group_content_objects(content_objects).items()
+            ]
+        }
+        if field is not None:
+            query['field'] = field
+        return self.get_collection('filter_by_content_objects').find(query, self.get_projection(fields))
 
-    def exists(self, path):
-        return bool(self.get_collection().find({'path': path}).count())
\ No newline at end of file
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        self.ensure_indexes()
+        return self.get_collection('iterate').find(filters or {}).sort([
+            ('original_storage_path', 1),
+            ('_id', 1),
+        ]).batch_size(batch_size)
@@ -1,46 +1,335 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+import threading
+import time
 
-from proxy_storage.meta_backends.base import MetaBackendBase, MetaBackendObjectDoesNotExist
+from django.core.cache import caches
+from django.db import connections, models, router, transaction, DataError, IntegrityError
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+from django.db.models.expressions import Case, RawSQL, Value, When
+
+from proxy_storage import utils
+from proxy_storage.meta_backends.base import (
+    MetaBackendBase,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist
+)
+
+
+# expressions of column (or placeholder) which are compared bytewise, like python compares strings
+BINARY_ORDER_EXPRESSIONS = {
+    'postgresql': '{0} COLLATE "C"',
+    'mysql': 'BINARY {0}',
+    'oracle': "NLSSORT({0}, 'NLS_SORT=BINARY')",
+}
+
+
+class PathIntegrityError(MetaBackendObjectAlreadyExists, IntegrityError):
+    """
+    `IntegrityError` which is caused by existing object with the same path.
+    """
 
 
 class ORMMetaBackend(MetaBackendBase):
-    def __init__(self, model, *args, **kwargs):
+    """
+    Reads go to `read_using` database alias and writes go to `write_using` alias. If alias is not set
+    it is taken from database routers.
+
+    If `read_your_writes_timeout` is set then paths which were written are read from write alias during
+    that number of seconds, so replication lag is not visible to the writer. Written paths are remembered
+    in process memory or in django cache `read_your_writes_cache_alias` to share them between processes.
+    """
+    supports_projections = True
+    max_local_written_paths = 10000
+    binary_order_expressions = BINARY_ORDER_EXPRESSIONS
+
+    def __init__(self, model, read_using=None, write_using=None, read_your_writes_timeout=0,
+                 read_your_writes_cache_alias=None, *args, **kwargs):
         self.model = model
+        self.read_using = read_using
+        self.write_using = write_using
+        self.read_your_writes_timeout = read_your_writes_timeout
+        self.read_your_writes_cache_alias = read_your_writes_cache_alias
+        self._written_paths = {}
+        self._written_paths_lock = threading.Lock()
         super(ORMMetaBackend, self).__init__(*args, **kwargs)
 
+    def get_write_using(self):
+        return self.write_using or router.db_for_write(self.model)
+
+    def get_read_using(self, paths=()):
+        if self.read_your_writes_timeout and self.has_recently_written(paths):
+            return self.get_write_using()
+        return self.read_using or router.db_for_read(self.model)
+
+    def get_read_queryset(self, paths=()):
+        return self.model.objects.using(self.get_read_using(paths))
+
+    def get_write_queryset(self):
+        return self.model.objects.using(self.get_write_using())
+
+    def get_written_path_cache_key(self, path):
+        return utils.get_path_cache_key('proxy_storage:written:{0}:'.format(self.model._meta.db_table), path)
+
+    def remember_written_paths(self, *paths):
+        if not self.read_your_writes_timeout:
+            return
+        paths = [path for path in paths if path is not None]
+        if self.read_your_writes_cache_alias:
+            caches[self.read_your_writes_cache_alias].set_many(
+                dict((self.get_written_path_cache_key(path), True) for path in paths),
+                self.read_your_writes_timeout
+            )
+            return
+        expires_at = time.time() + self.read_your_writes_timeout
+        with self._written_paths_lock:
+            if len(self._written_paths) >= self.max_local_written_paths:
+                now = time.time()
+                self._written_paths = dict(
+                    (path, path_expires_at) for path, path_expires_at in self._written_paths.items()
+                    if path_expires_at > now
+                )
+            for path in paths:
+                self._written_paths[path] = expires_at
+
+    def is_recently_written(self, path):
+        return self.has_recently_written([path])
+
+    def has_recently_written(self, paths):
+        if not paths:
+            return False
+        if self.read_your_writes_cache_alias:
+            # single round trip to cache for all paths of the query
+            cached = caches[self.read_your_writes_cache_alias].get_many(
+                [self.get_written_path_cache_key(path) for path in paths]
+            )
+            return any(cached.values())
+        now = time.time()
+        return any(self._written_paths.get(path, 0) > now for path in paths)
+
     def _convert_obj_to_dict(self, obj):
+        if isinstance(obj, dict):
+            # projected row from `values()`
+            return obj
         return dict(
             [(field.name, getattr(obj, field.name)) for field in self.model._meta.fields]
         )
 
     def _create(self, data):
-        return self.model.objects.create(**data)
+        try:
+            # savepoint keeps outer transaction usable if path is not unique
+            with transaction.atomic(using=self.get_write_using()):
+                obj = self.get_write_queryset().create(**data)
+        except IntegrityError as exc:
+            # NOT NULL or foreign key violations must not look like path conflicts
+            if data.get('path') is not None and self.is_path_taken(data['path']):
+                raise PathIntegrityError(*exc.args)
+            raise
+        self.remember_written_paths(obj.path)
+        return obj
+
+    def is_path_taken(self, path):
+        return self.get_write_queryset().filter(**self.get_path_lookup(path)).exists()
+
+    def get_not_written_exceptions(self):
+        # statement was rejected and savepoint of `create` is rolled back
+        return super(ORMMetaBackend, self).get_not_written_exceptions() + (IntegrityError, DataError)
+
+    def is_path_hashed(self):
+        return issubclass(self.model, HashedPathProxyStorageModelBase)
+
+    def get_path_lookup(self, path):
+        if self.is_path_hashed():
+            # index lookup goes through fixed-width hash and full path is verified afterwards
+            return {
+                'path_hash': utils.get_path_hash(path),
+                'path': path,
+            }
+        else:
+            return {'path': path}
+
+    def get_paths_lookup(self, paths):
+        if self.is_path_hashed():
+            return {
+                'path_hash__in': [utils.get_path_hash(path) for path in paths],
+                'path__in': paths,
+            }
+        else:
+            return {'path__in': paths}
+
+    def project(self, queryset, fields):
+        # "values" skips model instantiation and loads only requested columns
+        if fields is None:
+            return queryset
+        # callers could ask for optional fields (mixins) which the model doesn't have
+        return queryset.values(*[field for field in fields if field in self.get_model_field_names()])
 
-    def _get(self, path):
+    def get_model_field_names(self):
+        names = set()
+        for field in self.model._meta.concrete_fields:
+            names.update([field.name, field.attname])
+        return names
+
+    def _get(self, path, fields=None):
+        queryset = self.project(self.get_read_queryset([path]), fields)
         try:
-            return self.model.objects.get(path=path)
+            return queryset.get(**self.get_path_lookup(path))
         except self.model.DoesNotExist as exc:
             raise MetaBackendObjectDoesNotExist(exc)
 
-    def update(self, path, update_data):
-        return self.model.objects.filter(path=path).update(**update_data)
+    def _get_many(self, paths, fields=None):
+        return self.project(self.get_read_queryset(paths).filter(**self.get_paths_lookup(paths)), fields)
 
-    def delete(self, path):
-        return self.model.objects.filter(path=path).delete()
+    def _update(self, path, update_data):
+        if self.is_path_hashed() and 'path' in update_data:
+            update_data = dict(update_data, path_hash=utils.get_path_hash(update_data['path']))
+        result = self.get_write_queryset().filter(**self.get_path_lookup(path)).update(**update_data)
+        self.remember_written_paths(path, update_data.get('path'))
+        return result
 
-    def exists(self, path):
-        return self.model.objects.filter(path=path).exists()
+    def _delete(self, path):
+        result = self.get_write_queryset().filter(**self.get_path_lookup(path)).delete()
+        self.remember_written_paths(path)
+        return result
 
+    def _delete_many(self, paths):
+        result = self.get_write_queryset().filter(**self.get_paths_lookup(paths)).delete()
+        self.remember_written_paths(*paths)
+        return result
 
-class ProxyStorageModelBase(models.Model):
-    path = models.CharField(max_length=255, unique=True)
-    proxy_storage_name = models.CharField(max_length=50)
-    original_storage_path = models.CharField(max_length=255)
+    def _exists(self, path):
+        return self.get_read_queryset([path]).filter(**self.get_path_lookup(path)).exists()
 
-    class Meta:
-        abstract = True
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        if fields is None:
+            return self._iterate_in_batches(
+                queryset=self._get_iterate_queryset(prefix=prefix),
+                batch_size=batch_size,
+                get_path=lambda obj: obj.path,
+                start_after=start_after
+            )
+        return self._iterate_projected(prefix=prefix, batch_size=batch_size, fields=fields, start_after=start_after)
+
+    def _iterate_projected(self, prefix, batch_size, fields, start_after=None):
+        # like in `project`, optional fields which the model doesn't have are skipped
+        fields = [field for field in fields if field in self.get_model_field_names()]
+        rows = self._iterate_in_batches(
+            queryset=self._get_iterate_queryset(prefix=prefix).values(*(set(fields) | set(['path']))),
+            batch_size=batch_size,
+            get_path=lambda row: row['path'],
+            start_after=start_after
+        )
+        for row in rows:
+            # row is still used as keyset of the next batch, so it is not modified in place
+            yield dict((field, row[field]) for field in fields)
+
+    def iterate_paths(self, prefix=None, batch_size=1000, start_after=None):
+        return self._iterate_in_batches(
+            queryset=self._get_iterate_queryset(prefix=prefix).values_list('path', flat=True),
+            batch_size=batch_size,
+            get_path=lambda path: path,
+            start_after=start_after
+        )
+
+    def _count(self):
+        return self.get_read_queryset().count()
 
+    def _get_iterate_queryset(self, prefix=None):
+        queryset = self.get_read_queryset()
+        if prefix:
+            queryset = queryset.filter(path__startswith=prefix)
+        return queryset
+
+    def get_binary_order_expression(self, vendor, column):
+        """
+        Returns SQL expression of `column` (or placeholder) which is compared bytewise, like python
+        compares strings, whatever collation the column has.
+        """
+        return self.binary_order_expressions.get(vendor, '{0}').format(column)
+
+    def get_binary_order_expressions(self, queryset, field_name):
+        """
+        Returns binary expressions of column of `field_name` and of placeholder.
+        """
+        quote_name = connections[queryset.db].ops.quote_name
+        vendor = connections[queryset.db].vendor
+        key = self.get_binary_order_expression(vendor, '{0}.{1}'.format(
+            quote_name(self.model._meta.db_table),
+            quote_name(self.model._meta.get_field(field_name).column)
+        ))
+        value = self.get_binary_order_expression(vendor, '%s')
+        return key, value
+
+    def get_original_storage_path_expressions(self, queryset):
+        """
+        Returns binary expressions of "original_storage_path" column and of placeholder, and column of pk.
+        """
+        key, value = self.get_binary_order_expressions(queryset, 'original_storage_path')
+        quote_name = connections[queryset.db].ops.quote_name
+        pk = '{0}.{1}'.format(quote_name(self.model._meta.db_table), quote_name(self.model._meta.pk.column))
+        return key, value, pk
+
+    def _filter_by_original_storage_path(self, original_storage_path, filters=None):
+        queryset = self.get_read_queryset().filter(**(filters or {}))
+        key, value, pk = self.get_original_storage_path_expressions(queryset)
+        # the same expression as in ordering, so index of `AddOriginalStoragePathIndex` is used
+        return list(queryset.extra(where=['{0} = {1}'.format(key, value)], params=[original_storage_path]))
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        queryset = self.get_read_queryset().filter(**(filters or {}))
+        key, value, pk = self.get_original_storage_path_expressions(queryset)
+        # default collations of postgresql and mysql ignore case and punctuation, so reconciliation
+        # would not be able to merge objects with listing of original storage
+        queryset = queryset.extra(
+            select={'binary_original_storage_path': key},
+            order_by=['binary_original_storage_path', 'pk']
+        )
+        # "original_storage_path" is not unique, so keyset is (original_storage_path, pk) pair
+        last_obj = None
+        while True:
+            if last_obj is None:
+                batch = list(queryset[:batch_size])
+            else:
+                batch = list(queryset.extra(
+                    where=['({0} > {1} OR ({0} = {1} AND {2} > %s))'.format(key, value, pk)],
+                    params=[last_obj.original_storage_path, last_obj.original_storage_path, last_obj.pk]
+                )[:batch_size])
+            for obj in batch:
+                yield obj
+            if len(batch) < batch_size:
+                break
+            last_obj = batch[-1]
+
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        condition = models.Q()
+        for content_type_id, object_ids in self.group_content_objects(content_objects).items():
+            condition |= models.Q(content_type_id=content_type_id, object_id__in=object_ids)
+        queryset = self.get_read_queryset().filter(condition)
+        if field is not None:
+            queryset = queryset.filter(field=field)
+        return self.project(queryset, fields)
+
+    def _iterate_in_batches(self, queryset, batch_size, get_path, start_after=None):
+        # keyset pagination by path compared bytewise, so the order is the same as in other
+        # meta-backends (sharded meta-backend merges them). Every batch is an index range scan
+        # if index of `AddPathIndex` exists (or column collation is binary already), and no more
+        # than one batch is kept in memory
+        key, value = self.get_binary_order_expressions(queryset, 'path')
+        queryset = queryset.order_by(RawSQL(key, ()))
+        last_path = start_after
+        while True:
+            if last_path is None:
+                batch = list(queryset[:batch_size])
+            else:
+                batch = list(queryset.extra(where=['{0} > {1}'.format(key, value)], params=[last_path])[:batch_size])
+            for item in batch:
+                yield item
+            if len(batch) < batch_size:
+                break
+            last_path = get_path(batch[-1])
+
+
+class ProxyStorageModelMethodsMixin(object):
     def get_meta_backend_obj(self):
         # todo: test me
         return ORMMetaBackend(model=type(self)).get_meta_backend_obj(self)
@@ -57,6 +346,141 @@ class ProxyStorageModelBase(models.Model):
         )
 
 
+class ProxyStorageModelBase(ProxyStorageModelMethodsMixin, models.Model):
+    path = models.CharField(max_length=255, unique=True)
+    proxy_storage_name = models.CharField(max_length=50)
+    original_storage_path = models.CharField(max_length=255)
+
+    class Meta:
+        abstract = True
+
+
+class HashedPathProxyStorageModelBase(ProxyStorageModelMethodsMixin, models.Model):
+    """
+    Stores fixed-width hash of path as unique lookup key. Full path is kept in unbounded
+    text column, so there is no limit on path length and unique index stays narrow.
+    """
+    path_hash = models.CharField(max_length=40, unique=True)
+    path = models.TextField()
+    proxy_storage_name = models.CharField(max_length=50)
+    original_storage_path = models.TextField()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.path_hash = utils.get_path_hash(self.path)
+        return super(HashedPathProxyStorageModelBase, self).save(*args, **kwargs)
+
+
+def get_binary_index_sql(model, schema_editor, name, field_name):
+    connection = schema_editor.connection
+    field = model._meta.get_field(field_name)
+    column = schema_editor.quote_name(field.column)
+    if connection.vendor == 'mysql':
+        # expression of "BINARY" can't be indexed, column should have binary collation instead
+        expression = column if field.get_internal_type() != 'TextField' else '{0}(255)'.format(column)
+    else:
+        expression = BINARY_ORDER_EXPRESSIONS.get(connection.vendor, '{0}').format(column)
+    return 'CREATE INDEX {0} ON {1} ({2}, {3})'.format(
+        schema_editor.quote_name(name),
+        schema_editor.quote_name(model._meta.db_table),
+        expression,
+        schema_editor.quote_name(model._meta.pk.column)
+    )
+
+
+def get_original_storage_path_index_sql(model, schema_editor, name):
+    return get_binary_index_sql(model, schema_editor, name, 'original_storage_path')
+
+
+class AddOriginalStoragePathIndex(Operation):
+    """
+    Migration operation which creates index on ("original_storage_path", pk) compared bytewise, like
+    `iterate_by_original_storage_path` orders objects and `filter_by_original_storage_path` looks
+    them up, so reconciliation doesn't sort the table. Django fields can't declare such index.
+    """
+    reduces_to_sql = True
+    reversible = True
+    field_name = 'original_storage_path'
+
+    def __init__(self, model_name, name=None):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        kwargs = {}
+        if self.name is not None:
+            kwargs['name'] = self.name
+        return self.__class__.__name__, [self.model_name], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def get_index_name(self, model, connection):
+        if self.name is not None:
+            return self.name
+        return truncate_name(
+            '{0}_{1}'.format(model._meta.db_table, self.field_name),
+            connection.ops.max_name_length()
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            name = self.get_index_name(model, schema_editor.connection)
+            schema_editor.execute(get_binary_index_sql(model, schema_editor, name, self.field_name))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            name = self.get_index_name(model, schema_editor.connection)
+            schema_editor.execute(schema_editor.sql_delete_index % {
+                'table': schema_editor.quote_name(model._meta.db_table),
+                'name': schema_editor.quote_name(name),
+            })
+
+    def describe(self):
+        return 'Create binary index on {0} of {1}'.format(self.field_name.replace('_', ' '), self.model_name)
+
+
+class AddPathIndex(AddOriginalStoragePathIndex):
+    """
+    Migration operation which creates index on ("path", pk) compared bytewise, like `iterate` and
+    `iterate_paths` order objects. Not needed if "path" column has binary collation already
+    (default of SQLite).
+    """
+    field_name = 'path'
+
+
+def fill_path_hashes(model, batch_size=1000):
+    """
+    Fills "path_hash" column for existing rows. Intended to be called from data migration
+    when migrating from `ProxyStorageModelBase` to `HashedPathProxyStorageModelBase`.
+
+    Every batch is written by one "UPDATE ... SET path_hash = CASE pk WHEN ..." query (split only
+    if it exceeds query params limit of database, like 999 of old SQLite).
+    """
+    using = router.db_for_write(model)
+    last_pk = None
+    while True:
+        queryset = model.objects.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        batch = list(queryset.values_list('pk', 'path')[:batch_size])
+        # every row takes params of "pk IN", of "WHEN pk" and of "THEN path_hash"
+        update_batch_size = max(1, connections[using].ops.bulk_batch_size(['pk', 'pk', 'path_hash'], batch))
+        with transaction.atomic(using=using):
+            for update_batch in utils.chunks(batch, update_batch_size):
+                model.objects.using(using).filter(pk__in=[pk for pk, path in update_batch]).update(path_hash=Case(
+                    *[When(pk=pk, then=Value(utils.get_path_hash(path))) for pk, path in update_batch],
+                    output_field=models.CharField()
+                ))
+        if len(batch) < batch_size:
+            break
+        last_pk = batch[-1][0]
+
+
 class ContentObjectFieldMixin(models.Model):
     content_type_id = models.PositiveIntegerField(blank=True, null=True)
     object_id = models.PositiveIntegerField(blank=True, null=True)
@@ -64,10 +488,31 @@ class ContentObjectFieldMixin(models.Model):
 
     class Meta:
         abstract = True
+        # used by "filter_by_content_object", keep it if Meta is overridden
+        index_together = [
+            ('content_type_id', 'object_id', 'field'),
+        ]
 
 
 class OriginalStorageNameMixin(models.Model):
     original_storage_name = models.CharField(max_length=50, blank=True)
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class ContentHashMixin(models.Model):
+    content_hash = models.CharField(max_length=128, blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+
+class FileAttributesMixin(models.Model):
+    size = models.BigIntegerField(blank=True, null=True)
+    created_time = models.DateTimeField(blank=True, null=True)
+    modified_time = models.DateTimeField(blank=True, null=True)
+    url = models.TextField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
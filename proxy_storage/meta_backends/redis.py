@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import redis
+from django.utils.encoding import force_bytes, force_text
+
+from proxy_storage import utils
+from proxy_storage.meta_backends.base import (
+    MetaBackendBase,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+
+ORIGINAL_STORAGE_PATH_SEPARATOR = u'\x00'
+
+
+class RedisMetaBackend(MetaBackendBase):
+    """
+    Every object is stored as hash "<key_prefix>obj:<path>". Paths are kept in sorted set
+    "<key_prefix>paths" for lexicographic iteration and "<original_storage_path>\\0<path>" pairs
+    in sorted set "<key_prefix>original_storage_paths" for reconciliation.
+
+    `client` is `redis.StrictRedis` instance or callable which returns it. If `content_object_index`
+    is `True` then paths are also indexed by "content_type_id" and "object_id" fields in sets
+    "<key_prefix>content_object:<content_type_id>:<object_id>".
+    """
+    supports_projections = True
+
+    def __init__(self, client, key_prefix='proxy_storage:', content_object_index=False):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.content_object_index = content_object_index
+
+    def get_client(self):
+        if callable(self.client):
+            return self.client()
+        return self.client
+
+    def get_object_key(self, path):
+        return u'{0}obj:{1}'.format(self.key_prefix, path)
+
+    def get_paths_key(self):
+        return u'{0}paths'.format(self.key_prefix)
+
+    def get_original_storage_paths_key(self):
+        return u'{0}original_storage_paths'.format(self.key_prefix)
+
+    def get_content_object_key(self, content_type_id, object_id):
+        return u'{0}content_object:{1}:{2}'.format(self.key_prefix, content_type_id, object_id)
+
+    def get_original_storage_paths_member(self, obj):
+        return u'{0}{1}{2}'.format(obj.get('original_storage_path') or '', ORIGINAL_STORAGE_PATH_SEPARATOR, obj['path'])
+
+    def encode_obj(self, obj):
+        return dict((key, utils.json_dumps(value)) for key, value in obj.items())
+
+    def decode_obj(self, response):
+        return dict((force_text(key), utils.json_loads(value)) for key, value in response.items())
+
+    def _convert_obj_to_dict(self, obj):
+        return obj
+
+    def add_to_indexes(self, pipe, obj):
+        pipe.zadd(self.get_paths_key(), {obj['path']: 0})
+        pipe.zadd(self.get_original_storage_paths_key(), {self.get_original_storage_paths_member(obj): 0})
+        if self.content_object_index and obj.get('content_type_id') is not None:
+            pipe.sadd(self.get_content_object_key(obj['content_type_id'], obj.get('object_id')), obj['path'])
+
+    def remove_from_indexes(self, pipe, obj):
+        pipe.zrem(self.get_paths_key(), obj['path'])
+        pipe.zrem(self.get_original_storage_paths_key(), self.get_original_storage_paths_member(obj))
+        if self.content_object_index and obj.get('content_type_id') is not None:
+            pipe.srem(self.get_content_object_key(obj['content_type_id'], obj.get('object_id')), obj['path'])
+
+    def set_object(self, pipe, object_key, obj):
+        # "mapping" argument of HSET is supported since redis-py 3.5, fakeredis for python 2 requires older one
+        if redis.VERSION < (3, 5):
+            pipe.hmset(object_key, self.encode_obj(obj))
+        else:
+            pipe.hset(object_key, mapping=self.encode_obj(obj))
+
+    def _create(self, data):
+        object_key = self.get_object_key(data['path'])
+
+        def create(pipe):
+            # watched key makes transaction fail if concurrent create wins between check and write
+            if pipe.exists(object_key):
+                raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(data['path']))
+            pipe.multi()
+            self.set_object(pipe, object_key, data)
+            self.add_to_indexes(pipe, data)
+
+        self.get_client().transaction(create, object_key)
+        return dict(data)
+
+    def _get(self, path, fields=None):
+        client = self.get_client()
+        if fields is None:
+            response = client.hgetall(self.get_object_key(path))
+        else:
+            response = dict(zip(fields, client.hmget(self.get_object_key(path), fields)))
+        obj = self._decode_response(response, fields)
+        if obj is None:
+            raise MetaBackendObjectDoesNotExist('Could not find object with path "{0}"'.format(path))
+        return obj
+
+    def _decode_response(self, response, fields=None):
+        if fields is None:
+            return self.decode_obj(response) if response else None
+        if response.get('path') is None:
+            return None
+        return self.decode_obj(dict((key, value) for key, value in response.items() if value is not None))
+
+    def _get_many(self, paths, fields=None):
+        pipe = self.get_client().pipeline(transaction=False)
+        for path in paths:
+            if fields is None:
+                pipe.hgetall(self.get_object_key(path))
+            else:
+                pipe.hmget(self.get_object_key(path), fields)
+        objs = []
+        for response in pipe.execute():
+            if fields is not None:
+                response = dict(zip(fields, response))
+            obj = self._decode_response(response, fields)
+            if obj is not None:
+                objs.append(obj)
+        return objs
+
+    def _delete(self, path):
+        self._delete_many([path])
+
+    def _delete_many(self, paths):
+        object_keys = [self.get_object_key(path) for path in paths]
+
+        def delete_many(pipe):
+            # index entries depend on fields of objects, so objects are read after WATCH: if they are
+            # updated before EXEC, transaction fails and is retried with fresh fields
+            objs = self._get_many(paths)
+            pipe.multi()
+            for obj in objs:
+                pipe.delete(self.get_object_key(obj['path']))
+                self.remove_from_indexes(pipe, obj)
+
+        self.get_client().transaction(delete_many, *object_keys)
+
+    def _update(self, path, update_data):
+        object_key = self.get_object_key(path)
+        new_path = update_data.get('path', path)
+        new_object_key = self.get_object_key(new_path)
+
+        def update(pipe):
+            response = pipe.hgetall(object_key)
+            if not response:
+                return
+            obj = self.decode_obj(response)
+            if new_path != path and pipe.exists(new_object_key):
+                raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(new_path))
+            updated_obj = dict(obj, **update_data)
+            pipe.multi()
+            if new_path != path:
+                pipe.delete(object_key)
+            self.set_object(pipe, new_object_key, updated_obj)
+            self.remove_from_indexes(pipe, obj)
+            self.add_to_indexes(pipe, updated_obj)
+
+        self.get_client().transaction(update, object_key, new_object_key)
+
+    def _exists(self, path):
+        return bool(self.get_client().exists(self.get_object_key(path)))
+
+    def _exists_many(self, paths):
+        pipe = self.get_client().pipeline(transaction=False)
+        for path in paths:
+            pipe.exists(self.get_object_key(path))
+        return [path for path, exists in zip(paths, pipe.execute()) if exists]
+
+    def _count(self):
+        return self.get_client().zcard(self.get_paths_key())
+
+    def iterate_paths(self, prefix=None, batch_size=1000, start_after=None):
+        return self._iterate_sorted_set(
+            self.get_paths_key(),
+            prefix=prefix,
+            batch_size=batch_size,
+            start_after=start_after
+        )
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        paths = self.iterate_paths(prefix=prefix, batch_size=batch_size, start_after=start_after)
+        for paths_batch in utils.chunks(paths, batch_size):
+            for obj in self._get_many(paths_batch, fields=fields):
+                yield obj
+
+    def _iterate_sorted_set(self, key, prefix=None, batch_size=1000, start_after=None):
+        client = self.get_client()
+        if prefix:
+            # 0xff byte never occurs in utf-8, so it is greater than any continuation of prefix
+            min_value = b'[' + force_bytes(prefix)
+            max_value = b'[' + force_bytes(prefix) + b'\xff'
+        else:
+            min_value, max_value = b'-', b'+'
+        if start_after is not None and (not prefix or force_bytes(start_after) >= force_bytes(prefix)):
+            min_value = b'(' + force_bytes(start_after)
+        while True:
+            batch = client.zrangebylex(key, min_value, max_value, start=0, num=batch_size)
+            for member in batch:
+                yield force_text(member)
+            if len(batch) < batch_size:
+                break
+            # keyset pagination, so batches are not shifted by concurrent writes
+            min_value = b'(' + force_bytes(batch[-1])
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        members = self._iterate_sorted_set(self.get_original_storage_paths_key(), batch_size=batch_size)
+        for members_batch in utils.chunks(members, batch_size):
+            paths = [member.rsplit(ORIGINAL_STORAGE_PATH_SEPARATOR, 1)[1] for member in members_batch]
+            objs_by_path = dict((obj['path'], obj) for obj in self._get_many(paths))
+            for path in paths:
+                obj = objs_by_path.get(path)
+                if obj is None:
+                    continue
+                if filters and any(obj.get(key) != value for key, value in filters.items()):
+                    continue
+                yield obj
+
+    def _filter_by_original_storage_path(self, original_storage_path, filters=None):
+        # members of the same original storage path share "<original_storage_path>\0" prefix
+        prefix = force_bytes(u'{0}{1}'.format(original_storage_path, ORIGINAL_STORAGE_PATH_SEPARATOR))
+        members = self.get_client().zrangebylex(
+            self.get_original_storage_paths_key(),
+            b'[' + prefix,
+            b'[' + prefix + b'\xff'
+        )
+        paths = [force_text(member).rsplit(ORIGINAL_STORAGE_PATH_SEPARATOR, 1)[1] for member in members]
+        return [
+            obj for obj in self._get_many(paths)
+            if not filters or all(obj.get(key) == value for key, value in filters.items())
+        ]
+
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        if not self.content_object_index:
+            return super(RedisMetaBackend, self)._filter_by_content_objects(
+                content_objects=content_objects,
+                field=field,
+                fields=fields
+            )
+        pipe = self.get_client().pipeline(transaction=False)
+        for content_type_id, object_id in content_objects:
+            pipe.smembers(self.get_content_object_key(content_type_id, object_id))
+        paths = set()
+        for members in pipe.execute():
+            paths.update(force_text(path) for path in members)
+        objs = self._get_many(sorted(paths), fields=fields)
+        return [obj for obj in objs if field is None or obj.get('field') == field]
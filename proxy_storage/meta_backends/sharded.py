@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+import bisect
+import hashlib
+import heapq
+import logging
+import os
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from django.db import connections
+from django.utils.encoding import force_bytes
+
+from proxy_storage import utils
+from proxy_storage.meta_backends.base import (
+    MetaBackendBase,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+
+logger = logging.getLogger('proxy_storage')
+
+
+class HashRing(object):
+    """
+    Consistent hashing ring: every shard owns `virtual_nodes` points, so adding a shard
+    moves only about 1/N of paths.
+    """
+
+    def __init__(self, names, virtual_nodes=100):
+        points = []
+        for name in names:
+            for i in range(virtual_nodes):
+                points.append((self.get_hash(u'{0}:{1}'.format(name, i)), name))
+        points.sort()
+        self.hashes = [point_hash for point_hash, name in points]
+        self.names = [name for point_hash, name in points]
+
+    def get_hash(self, key):
+        return int(hashlib.md5(force_bytes(key)).hexdigest()[:16], 16)
+
+    def get_name(self, key):
+        index = bisect.bisect(self.hashes, self.get_hash(key)) % len(self.hashes)
+        return self.names[index]
+
+
+def merge_sorted(iterables, get_key):
+    # heapq.merge has no "key" argument in python 2, so items are decorated. Items with equal keys
+    # are ordered by stream and position in it, so items themselves are never compared
+    decorated = [decorate(iterable, get_key, i) for i, iterable in enumerate(iterables)]
+    for key, i, j, item in heapq.merge(*decorated):
+        yield key, item
+
+
+def decorate(iterable, get_key, i):
+    for j, item in enumerate(iterable):
+        yield get_key(item), i, j, item
+
+
+def get_binary_key(value):
+    # meta-backends order strings bytewise (see `MetaBackendBase.iterate`), on python 2 unicode
+    # strings could be compared by UTF-16 code units otherwise
+    return force_bytes(value)
+
+
+class ShardedMetaBackend(MetaBackendBase):
+    """
+    Partitions paths over child meta-backends by consistent hashing. `shards` is list of
+    `(name, meta_backend)` pairs. Single path operations go to one shard, `get_many`,
+    `exists_many`, `delete_many` and `create_many` are sent to all involved shards in parallel
+    by pool of `workers` threads, iteration merges sorted streams of shards. Pool is created on first
+    use and lives until `close()`.
+
+    Streams of shards are merged by keys compared bytewise, so every child meta-backend must order
+    `iterate` and `iterate_paths` by path and `iterate_by_original_storage_path` by original storage
+    path in UTF-8 byte order, as `MetaBackendBase` requires.
+
+    When shard is added, pass names of shards of the old ring as `previous_shard_names`: objects
+    which are not moved yet are looked up in their previous shard. Run `rebalance` (or
+    `rebalance_proxy_storage_shards` command) and remove `previous_shard_names` after it finishes.
+    """
+    supports_projections = True
+    # keys of objects which are assigned by shard database and must not be copied to other shard
+    shard_specific_fields = ('id', '_id')
+
+    def __init__(self, shards, previous_shard_names=None, workers=8, virtual_nodes=100):
+        self.shards = OrderedDict(shards)
+        self.workers = workers
+        self.ring = HashRing(list(self.shards.keys()), virtual_nodes=virtual_nodes)
+        if previous_shard_names:
+            self.previous_ring = HashRing(previous_shard_names, virtual_nodes=virtual_nodes)
+        else:
+            self.previous_ring = None
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def get_shard_name(self, path):
+        return self.ring.get_name(path)
+
+    def get_shard(self, path):
+        return self.shards[self.get_shard_name(path)]
+
+    def get_previous_shard(self, path):
+        """
+        Returns shard where object could be until rebalancing is finished or `None`.
+        """
+        if self.previous_ring is None:
+            return None
+        previous_shard_name = self.previous_ring.get_name(path)
+        if previous_shard_name == self.get_shard_name(path):
+            return None
+        return self.shards[previous_shard_name]
+
+    def group_by_shard(self, paths, get_shard=None):
+        get_shard = get_shard or self.get_shard
+        paths_by_shard = OrderedDict()
+        for path in paths:
+            shard = get_shard(path)
+            if shard is not None:
+                paths_by_shard.setdefault(shard, []).append(path)
+        return paths_by_shard
+
+    def map_shards(self, func, items_by_shard):
+        """
+        Calls `func(shard, items)` for every shard in parallel and returns list of results.
+        """
+        items = list(items_by_shard.items())
+        if len(items) <= 1 or self.workers <= 1:
+            return [func(shard, shard_items) for shard, shard_items in items]
+        return self.get_pool().map(
+            self._call_in_worker,
+            [(func, shard, shard_items) for shard, shard_items in items]
+        )
+
+    def get_pool(self):
+        with self._pool_lock:
+            # threads are not copied by fork, so forked process creates its own pool
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPool(processes=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _call_in_worker(self, args):
+        func, shard, shard_items = args
+        try:
+            return func(shard, shard_items)
+        finally:
+            # worker threads outlive the call, so database connections opened by ORM shards
+            # in them are closed right away instead of being kept by every thread of the pool
+            for connection in connections.all():
+                connection.close()
+
+    def close(self):
+        """
+        Stops threads of the pool. It is created again by the next parallel call.
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            pool_pid, self._pool_pid = self._pool_pid, None
+        if pool is not None and pool_pid == os.getpid():
+            pool.close()
+            pool.join()
+
+    def get_unique_violation_exceptions(self):
+        return self._merge_shard_exceptions('get_unique_violation_exceptions')
+
+    def get_not_written_exceptions(self):
+        return self._merge_shard_exceptions('get_not_written_exceptions')
+
+    def _merge_shard_exceptions(self, method_name):
+        exceptions = list(getattr(super(ShardedMetaBackend, self), method_name)())
+        for shard in self.shards.values():
+            for exception in getattr(shard, method_name)():
+                if exception not in exceptions:
+                    exceptions.append(exception)
+        return tuple(exceptions)
+
+    def get_movable_data(self, obj):
+        return dict((key, value) for key, value in obj.items() if key not in self.shard_specific_fields)
+
+    def _convert_obj_to_dict(self, obj):
+        return dict(obj)
+
+    def _create(self, data):
+        previous_shard = self.get_previous_shard(data['path'])
+        if previous_shard is not None and previous_shard.exists(data['path']):
+            raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(data['path']))
+        return self.get_shard(data['path']).create(data)
+
+    def _create_many(self, data_list):
+        data_by_shard = OrderedDict()
+        for data in data_list:
+            data_by_shard.setdefault(self.get_shard(data['path']), []).append(data)
+        objs = []
+        for shard_objs in self.map_shards(lambda shard, shard_data: shard.create_many(shard_data), data_by_shard):
+            objs.extend(shard_objs)
+        return objs
+
+    def _get(self, path, fields=None):
+        try:
+            return self.get_shard(path).get(path, fields=fields)
+        except MetaBackendObjectDoesNotExist:
+            previous_shard = self.get_previous_shard(path)
+            if previous_shard is None:
+                raise
+            return previous_shard.get(path, fields=fields)
+
+    def _get_many(self, paths, fields=None):
+        def get_many(shard, shard_paths):
+            return shard.get_many(shard_paths, fields=fields)
+
+        objs_by_path = {}
+        for shard_objs in self.map_shards(get_many, self.group_by_shard(paths)):
+            objs_by_path.update(shard_objs)
+        if self.previous_ring is not None:
+            missing_paths = [path for path in paths if path not in objs_by_path]
+            for shard_objs in self.map_shards(get_many, self.group_by_shard(missing_paths, self.get_previous_shard)):
+                objs_by_path.update(shard_objs)
+        return list(objs_by_path.values())
+
+    def _delete(self, path):
+        self._delete_many([path])
+
+    def _delete_many(self, paths):
+        self.map_shards(lambda shard, shard_paths: shard.delete_many(shard_paths), self.group_by_shard(paths))
+        if self.previous_ring is not None:
+            self.map_shards(
+                lambda shard, shard_paths: shard.delete_many(shard_paths),
+                self.group_by_shard(paths, self.get_previous_shard)
+            )
+
+    def _update(self, path, update_data):
+        source_shard = self.get_shard(path)
+        if not source_shard.exists(path):
+            source_shard = self.get_previous_shard(path)
+            if source_shard is None or not source_shard.exists(path):
+                return
+        new_path = update_data.get('path', path)
+        target_shard = self.get_shard(new_path)
+        if target_shard is source_shard:
+            return source_shard.update(path, update_data)
+        # object is moved to shard of new path
+        if new_path != path and self.exists(new_path):
+            raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(new_path))
+        obj = self.get_movable_data(source_shard.get(path))
+        obj.update(update_data)
+        target_shard.create(obj)
+        source_shard.delete(path)
+
+    def _update_many(self, update_data_by_path):
+        if self.previous_ring is not None or any(
+            update_data.get('path', path) != path for path, update_data in update_data_by_path.items()
+        ):
+            return super(ShardedMetaBackend, self)._update_many(update_data_by_path)
+        self.map_shards(
+            lambda shard, shard_paths: shard.update_many(
+                dict((path, update_data_by_path[path]) for path in shard_paths)
+            ),
+            self.group_by_shard(update_data_by_path.keys())
+        )
+
+    def _exists(self, path):
+        if self.get_shard(path).exists(path):
+            return True
+        previous_shard = self.get_previous_shard(path)
+        return previous_shard is not None and previous_shard.exists(path)
+
+    def _exists_many(self, paths):
+        def exists_many(shard, shard_paths):
+            return shard.exists_many(shard_paths)
+
+        existing_paths = set()
+        for shard_existing_paths in self.map_shards(exists_many, self.group_by_shard(paths)):
+            existing_paths.update(shard_existing_paths)
+        if self.previous_ring is not None:
+            missing_paths = [path for path in paths if path not in existing_paths]
+            for shard_existing_paths in self.map_shards(
+                exists_many,
+                self.group_by_shard(missing_paths, self.get_previous_shard)
+            ):
+                existing_paths.update(shard_existing_paths)
+        return [path for path in paths if path in existing_paths]
+
+    def _count(self):
+        # objects which are being moved by rebalancing could be counted twice
+        return sum(self.map_shards(lambda shard, items: shard.count(), OrderedDict(
+            (shard, None) for shard in self.shards.values()
+        )))
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        streams = [
+            shard.iterate(prefix=prefix, batch_size=batch_size, fields=fields, start_after=start_after)
+            for shard in self.shards.values()
+        ]
+        return self._merge_unique(
+            streams,
+            get_key=lambda obj: get_binary_key(obj['path']),
+            get_path=lambda obj: obj['path']
+        )
+
+    def iterate_paths(self, prefix=None, batch_size=1000, start_after=None):
+        streams = [
+            shard.iterate_paths(prefix=prefix, batch_size=batch_size, start_after=start_after)
+            for shard in self.shards.values()
+        ]
+        return self._merge_unique(streams, get_key=get_binary_key, get_path=lambda path: path)
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        streams = [
+            shard.iterate_by_original_storage_path(filters=filters, batch_size=batch_size)
+            for shard in self.shards.values()
+        ]
+        # objects with the same original storage path are ordered differently by meta-backends
+        # (ORM by pk, others by path), so streams are merged by original storage path only
+        return self._merge_unique(
+            streams,
+            get_key=lambda obj: get_binary_key(obj['original_storage_path']),
+            get_path=lambda obj: obj['path']
+        )
+
+    def _filter_by_original_storage_path(self, original_storage_path, filters=None):
+        # original storage path is not a part of path, so every shard is asked
+        def filter_by_original_storage_path(shard, shard_original_storage_path):
+            return shard.filter_by_original_storage_path(shard_original_storage_path, filters=filters)
+
+        objs_by_path = {}
+        for shard_objs in self.map_shards(
+            filter_by_original_storage_path,
+            OrderedDict((shard, original_storage_path) for shard in self.shards.values())
+        ):
+            for obj in shard_objs:
+                objs_by_path.setdefault(obj['path'], obj)
+        return [objs_by_path[path] for path in sorted(objs_by_path)]
+
+    def _filter_by_content_objects(self, content_objects, field=None, fields=None):
+        # content object is not a part of path, so every shard is asked
+        def filter_by_content_objects(shard, shard_content_objects):
+            return shard.filter_by_content_objects(shard_content_objects, field=field, fields=fields)
+
+        objs_by_path = {}
+        for shard_result in self.map_shards(
+            filter_by_content_objects,
+            OrderedDict((shard, content_objects) for shard in self.shards.values())
+        ):
+            for shard_objs in shard_result.values():
+                for obj in shard_objs:
+                    objs_by_path.setdefault(obj['path'], obj)
+        return list(objs_by_path.values())
+
+    def _merge_unique(self, streams, get_key, get_path):
+        # during rebalancing object could be in both shards for a moment. Its copies have equal
+        # keys, so they are looked for among paths of items with the current key
+        last_key = None
+        paths = set()
+        for key, item in merge_sorted(streams, get_key):
+            if key != last_key:
+                last_key = key
+                paths = set()
+            path = get_path(item)
+            if path not in paths:
+                paths.add(path)
+                yield item
+
+    def rebalance(self, batch_size=1000):
+        """
+        Moves objects to shards which own their paths. Generator of `(path, source_shard_name,
+        target_shard_name)` for every moved object.
+
+        Every object is re-read from source shard right before copying, and source object is deleted
+        only if it still matches the copy. Objects changed during the move are left in source shard
+        (their copies are rolled back) for the next run. If target shard already has an object with
+        other data, both are kept and the conflict is logged. Meta-backends have no atomic
+        compare-and-delete, so pause writes while rebalancing if a write racing with the final check
+        must not be lost.
+        """
+        for shard_name, shard in self.shards.items():
+            paths = (
+                path for path in shard.iterate_paths(batch_size=batch_size)
+                if self.get_shard_name(path) != shard_name
+            )
+            for paths_batch in utils.chunks(paths, batch_size):
+                copied = OrderedDict()
+                for path in paths_batch:
+                    target_shard_name = self.get_shard_name(path)
+                    data = self.copy_to_shard(shard, self.shards[target_shard_name], path)
+                    if data is not None:
+                        copied[path] = (data, target_shard_name)
+                if not copied:
+                    continue
+                # compare-and-delete: source could be updated while its copy was created
+                current_objs = shard.get_many(list(copied.keys()))
+                moved = []
+                for path, (data, target_shard_name) in copied.items():
+                    if path not in current_objs:
+                        continue
+                    if self.get_movable_data(current_objs[path]) == data:
+                        moved.append((path, shard_name, target_shard_name))
+                    else:
+                        self.rollback_copy(self.shards[target_shard_name], path, data)
+                shard.delete_many([path for path, source_shard_name, target_shard_name in moved])
+                for item in moved:
+                    yield item
+
+    def copy_to_shard(self, source_shard, target_shard, path):
+        """
+        Copies object from source shard and returns copied data. Returns `None` if object is
+        gone from source shard or target shard has an object with other data.
+        """
+        try:
+            data = self.get_movable_data(source_shard.get(path))
+        except MetaBackendObjectDoesNotExist:
+            return None
+        try:
+            target_shard.create(data)
+        except target_shard.get_unique_violation_exceptions():
+            # copy was made by interrupted run or path was written to target shard meanwhile
+            try:
+                target_data = self.get_movable_data(target_shard.get(path))
+            except MetaBackendObjectDoesNotExist:
+                return None
+            if target_data != data:
+                logger.warning('Object "%s" differs in source and target shards, it is not moved', path)
+                return None
+        return data
+
+    def rollback_copy(self, target_shard, path, data):
+        try:
+            target_data = self.get_movable_data(target_shard.get(path))
+        except MetaBackendObjectDoesNotExist:
+            return
+        if target_data == data:
+            target_shard.delete(path)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from proxy_storage import utils
+from proxy_storage.compat import six
+from proxy_storage.meta_backends.base import (
+    MetaBackendBase,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+
+
+def get_prefix_upper_bound(prefix):
+    # the smallest string which is greater than all strings starting with prefix
+    return prefix[:-1] + six.unichr(ord(prefix[-1]) + 1)
+
+
+class SQLiteMetaBackend(MetaBackendBase):
+    """
+    Embedded meta-backend for single node deployments without database server. Objects are stored
+    as JSON in SQLite file `database_path` keyed by path, which is primary key of table without rowid,
+    so lookup is one B-tree search in memory-mapped file and `iterate` with prefix is range scan.
+
+    Database works in WAL mode: readers don't block writer. `synchronous` is SQLite synchronous
+    pragma, "NORMAL" doesn't lose committed data on application crash, only on power loss.
+
+    Every thread uses its own connection. Use `transaction()` to commit many writes at once.
+    """
+    supports_projections = True
+    # old SQLite builds limit number of query parameters to 999
+    max_query_params = 500
+
+    def __init__(self, database_path, table='proxy_storage_objects', mmap_size=256 * 1024 * 1024,
+                 synchronous='NORMAL', timeout=30):
+        self.database_path = database_path
+        self.table = table
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_created = False
+
+    def get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # autocommit mode, transactions are started explicitly by `transaction`
+            connection = sqlite3.connect(self.database_path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous={0}'.format(self.synchronous))
+            connection.execute('PRAGMA mmap_size={0}'.format(int(self.mmap_size)))
+            self._local.connection = connection
+            self._local.transaction_depth = 0
+            self.create_schema(connection)
+        return connection
+
+    def create_schema(self, connection):
+        with self._schema_lock:
+            if self._schema_created:
+                return
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS {0} ('
+                'path TEXT PRIMARY KEY, '
+                'original_storage_path TEXT, '
+                'data TEXT NOT NULL'
+                ') WITHOUT ROWID'.format(self.table)
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS {0}_original_storage_path '
+                'ON {0} (original_storage_path, path)'.format(self.table)
+            )
+            self._schema_created = True
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups writes into one transaction, so they are committed (and synced) at once. Could be nested.
+        """
+        connection = self.get_connection()
+        if self._local.transaction_depth == 0:
+            # writer lock is taken at start, so transaction never fails on lock upgrade
+            connection.execute('BEGIN IMMEDIATE')
+        self._local.transaction_depth += 1
+        try:
+            yield connection
+        except BaseException:
+            self._local.transaction_depth -= 1
+            if self._local.transaction_depth == 0:
+                connection.execute('ROLLBACK')
+            raise
+        else:
+            self._local.transaction_depth -= 1
+            if self._local.transaction_depth == 0:
+                connection.execute('COMMIT')
+
+    def _convert_obj_to_dict(self, obj):
+        return obj
+
+    def _decode_row(self, data, fields=None):
+        obj = utils.json_loads(data)
+        if fields is not None:
+            obj = dict((field, obj[field]) for field in fields if field in obj)
+        return obj
+
+    def _create(self, data):
+        self._create_many([data])
+        return dict(data)
+
+    def _create_many(self, data_list):
+        with self.transaction() as connection:
+            for data in data_list:
+                try:
+                    self._insert(connection, data)
+                except sqlite3.IntegrityError:
+                    raise MetaBackendObjectAlreadyExists(
+                        'Object with path "{0}" already exists'.format(data['path'])
+                    )
+        return [dict(data) for data in data_list]
+
+    def _insert(self, connection, obj):
+        connection.execute(
+            'INSERT INTO {0} (path, original_storage_path, data) VALUES (?, ?, ?)'.format(self.table),
+            (obj['path'], obj.get('original_storage_path') or '', utils.json_dumps(obj))
+        )
+
+    def _select_data(self, connection, path):
+        row = connection.execute('SELECT data FROM {0} WHERE path = ?'.format(self.table), (path,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def _get(self, path, fields=None):
+        data = self._select_data(self.get_connection(), path)
+        if data is None:
+            raise MetaBackendObjectDoesNotExist('Could not find object with path "{0}"'.format(path))
+        return self._decode_row(data, fields)
+
+    def _execute_for_paths(self, connection, query, paths):
+        # "{params}" placeholder of query is replaced with parameters for chunk of paths
+        rows = []
+        for paths_chunk in utils.chunks(paths, self.max_query_params):
+            rows.extend(connection.execute(
+                query.format(table=self.table, params=', '.join(['?'] * len(paths_chunk))),
+                paths_chunk
+            ).fetchall())
+        return rows
+
+    def _get_many(self, paths, fields=None):
+        rows = self._execute_for_paths(
+            self.get_connection(),
+            'SELECT data FROM {table} WHERE path IN ({params})',
+            paths
+        )
+        return [self._decode_row(data, fields) for data, in rows]
+
+    def _delete(self, path):
+        self._delete_many([path])
+
+    def _delete_many(self, paths):
+        with self.transaction() as connection:
+            self._execute_for_paths(connection, 'DELETE FROM {table} WHERE path IN ({params})', paths)
+
+    def _update(self, path, update_data):
+        self._update_many({path: update_data})
+
+    def _update_many(self, update_data_by_path):
+        with self.transaction() as connection:
+            for path, update_data in update_data_by_path.items():
+                data = self._select_data(connection, path)
+                if data is None:
+                    continue
+                obj = dict(utils.json_loads(data), **update_data)
+                try:
+                    connection.execute(
+                        'UPDATE {0} SET path = ?, original_storage_path = ?, data = ? WHERE path = ?'.format(
+                            self.table
+                        ),
+                        (obj['path'], obj.get('original_storage_path') or '', utils.json_dumps(obj), path)
+                    )
+                except sqlite3.IntegrityError:
+                    raise MetaBackendObjectAlreadyExists('Object with path "{0}" already exists'.format(obj['path']))
+
+    def _exists(self, path):
+        return self.get_connection().execute(
+            'SELECT 1 FROM {0} WHERE path = ?'.format(self.table),
+            (path,)
+        ).fetchone() is not None
+
+    def _exists_many(self, paths):
+        rows = self._execute_for_paths(
+            self.get_connection(),
+            'SELECT path FROM {table} WHERE path IN ({params})',
+            paths
+        )
+        return [path for path, in rows]
+
+    def _count(self):
+        return self.get_connection().execute('SELECT COUNT(*) FROM {0}'.format(self.table)).fetchone()[0]
+
+    def _iterate(self, prefix=None, batch_size=1000, fields=None, start_after=None):
+        rows = self._iterate_rows('path, data', prefix=prefix, batch_size=batch_size, start_after=start_after)
+        for path, data in rows:
+            yield self._decode_row(data, fields)
+
+    def iterate_paths(self, prefix=None, batch_size=1000, start_after=None):
+        for path, in self._iterate_rows('path', prefix=prefix, batch_size=batch_size, start_after=start_after):
+            yield path
+
+    def _iterate_rows(self, columns, prefix=None, batch_size=1000, start_after=None):
+        conditions, params = [], []
+        if prefix:
+            conditions.append('path >= ? AND path < ?')
+            params.extend([prefix, get_prefix_upper_bound(prefix)])
+        last_path = start_after
+        while True:
+            batch_conditions, batch_params = list(conditions), list(params)
+            if last_path is not None:
+                batch_conditions.append('path > ?')
+                batch_params.append(last_path)
+            query = 'SELECT {0} FROM {1}{2} ORDER BY path LIMIT ?'.format(
+                columns,
+                self.table,
+                ' WHERE ' + ' AND '.join(batch_conditions) if batch_conditions else ''
+            )
+            batch = self.get_connection().execute(query, batch_params + [batch_size]).fetchall()
+            for row in batch:
+                yield row
+            if len(batch) < batch_size:
+                break
+            last_path = batch[-1][0]
+
+    def _iterate_by_original_storage_path(self, filters=None, batch_size=1000):
+        # filters by indexed columns are applied by SQL, so lookup of one original storage path
+        # is range scan of (original_storage_path, path) index, the rest are checked on decoded objects
+        conditions, params, data_filters = [], [], {}
+        for key, value in (filters or {}).items():
+            if key == 'original_storage_path':
+                conditions.append('original_storage_path = ?')
+                params.append(value or '')
+            elif key == 'path':
+                conditions.append('path = ?')
+                params.append(value)
+            else:
+                data_filters[key] = value
+        last_key = None
+        while True:
+            batch_conditions, batch_params = list(conditions), list(params)
+            if last_key is not None:
+                batch_conditions.append('(original_storage_path > ? OR (original_storage_path = ? AND path > ?))')
+                batch_params.extend([last_key[0], last_key[0], last_key[1]])
+            query = (
+                'SELECT original_storage_path, path, data FROM {0}{1} '
+                'ORDER BY original_storage_path, path LIMIT ?'
+            ).format(self.table, ' WHERE ' + ' AND '.join(batch_conditions) if batch_conditions else '')
+            batch = self.get_connection().execute(query, batch_params + [batch_size]).fetchall()
+            for original_storage_path, path, data in batch:
+                obj = utils.json_loads(data)
+                if any(obj.get(key) != value for key, value in data_filters.items()):
+                    continue
+                yield obj
+            if len(batch) < batch_size:
+                break
+            last_key = batch[-1][:2]
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from proxy_storage import request_cache
+from proxy_storage.compat import MiddlewareMixin
+
+
+class MetaBackendRequestCacheMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request_cache.activate()
+
+    def process_response(self, request, response):
+        request_cache.deactivate()
+        return response
+
+    def process_exception(self, request, exception):
+        request_cache.deactivate()
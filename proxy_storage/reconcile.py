@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Detection of drift between original storages and meta-backend.
+
+Both sides are walked as streams sorted by original storage path and merged like
+in merge join, so memory usage doesn't depend on number of files:
+
+* orphaned file - file exists in original storage but no meta-backend object references it
+  (meta-backends of all registered proxy-storages which use the same original storage are checked);
+* dangling record - meta-backend object references file which doesn't exist in original storage.
+"""
+import datetime
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+from django.utils import timezone
+
+from proxy_storage import utils
+from proxy_storage.meta_backends.base import MetaBackendObjectDoesNotExist
+
+ORPHANED_FILE = 'orphaned_file'
+DANGLING_RECORD = 'dangling_record'
+
+FOUND = 'found'
+DELETED = 'deleted'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+Difference = namedtuple('Difference', ['kind', 'original_storage_name', 'original_storage_path', 'path'])
+Result = namedtuple('Result', ['difference', 'action', 'error'])
+
+
+class ReconcileOrderError(Exception):
+    pass
+
+
+def iterate_original_storage_paths(original_storage, path=''):
+    """
+    Generator of all file paths of storage in lexicographic order.
+    """
+    directories, files = original_storage.listdir(path)
+    # directory "a" goes after file "a.txt", because "a/..." > "a.txt"
+    entries = sorted(
+        [(directory + '/', True) for directory in directories] + [(file_name, False) for file_name in files]
+    )
+    for name, is_directory in entries:
+        full_path = path + name
+        if is_directory:
+            for file_path in iterate_original_storage_paths(original_storage, full_path):
+                yield file_path
+        else:
+            yield full_path
+
+
+def is_same_storage(storage, other_storage):
+    """
+    Checks whether storages point to the same files: different instances of deconstructible
+    storages (e.g. `FileSystemStorage`) with equal arguments are the same storage.
+    """
+    if storage is other_storage:
+        return True
+    if type(storage) is not type(other_storage) or not hasattr(storage, 'deconstruct'):
+        return False
+    return storage.deconstruct() == other_storage.deconstruct()
+
+
+def check_order(iterable, get_key, description):
+    last_key = None
+    for item in iterable:
+        key = get_key(item)
+        if last_key is not None and key < last_key:
+            # merge of unordered streams reports live files as orphans, so it is better to stop
+            raise ReconcileOrderError('{0} is not ordered: "{1}" goes after "{2}"'.format(description, key, last_key))
+        last_key = key
+        yield item
+
+
+class Reconciler(object):
+    """
+    Finds orphaned files and dangling records of proxy-storage and optionally deletes them.
+
+    `workers` is number of threads which verify and delete differences. It could be dict with numbers
+    by original storage name. Orphaned files modified less than `grace_period` seconds ago are never
+    deleted, because they could belong to save which is in progress.
+    """
+
+    def __init__(self, proxy_storage, workers=1, delete_orphaned_files=False, delete_dangling_records=False,
+                 grace_period=60 * 60, batch_size=1000):
+        self.proxy_storage = proxy_storage
+        self.workers = workers
+        self.delete_orphaned_files = delete_orphaned_files
+        self.delete_dangling_records = delete_dangling_records
+        self.grace_period = grace_period
+        self.batch_size = batch_size
+        self._registered_proxy_storages = None
+
+    def get_original_storages(self):
+        original_storages_dict = getattr(self.proxy_storage, 'original_storages_dict', None)
+        if original_storages_dict:
+            return list(original_storages_dict.items())
+        else:
+            return [(None, self.proxy_storage.original_storage)]
+
+    def get_registered_proxy_storages(self):
+        from proxy_storage.settings import proxy_storage_settings
+
+        if self._registered_proxy_storages is None:
+            proxy_storages = dict(
+                (name, proxy_storage_class())
+                for name, proxy_storage_class in proxy_storage_settings.PROXY_STORAGE_CLASSES.items()
+            )
+            proxy_storages.setdefault(self.proxy_storage.get_name(), self.proxy_storage)
+            self._registered_proxy_storages = proxy_storages
+        return self._registered_proxy_storages
+
+    def get_meta_backends_of_storage(self, original_storage):
+        """
+        Returns meta-backends of registered proxy-storages which save files to `original_storage`.
+        """
+        meta_backends = [self.proxy_storage.meta_backend]
+        for proxy_storage in self.get_registered_proxy_storages().values():
+            original_storages_dict = getattr(proxy_storage, 'original_storages_dict', None)
+            storages = original_storages_dict.values() if original_storages_dict else [proxy_storage.original_storage]
+            if any(is_same_storage(storage, original_storage) for storage in storages):
+                if not any(meta_backend is proxy_storage.meta_backend for meta_backend in meta_backends):
+                    meta_backends.append(proxy_storage.meta_backend)
+        return meta_backends
+
+    def is_referenced(self, original_storage, original_storage_path):
+        """
+        Checks whether file is referenced by meta-backend object of any registered proxy-storage.
+        Objects of unknown proxy-storages are considered to reference it.
+        """
+        proxy_storages = self.get_registered_proxy_storages()
+        for meta_backend in self.get_meta_backends_of_storage(original_storage):
+            for meta_backend_obj in meta_backend.filter_by_original_storage_path(original_storage_path):
+                proxy_storage = proxy_storages.get(meta_backend_obj.get('proxy_storage_name'))
+                if proxy_storage is None or is_same_storage(
+                    proxy_storage.get_original_storage(meta_backend_obj=meta_backend_obj),
+                    original_storage
+                ):
+                    return True
+        return False
+
+    def get_workers(self, original_storage_name):
+        if isinstance(self.workers, dict):
+            return self.workers.get(original_storage_name, 1)
+        return self.workers
+
+    def get_meta_backend_filters(self, original_storage_name):
+        filters = {'proxy_storage_name': self.proxy_storage.get_name()}
+        if original_storage_name is not None:
+            filters['original_storage_name'] = original_storage_name
+        return filters
+
+    def iterate_differences(self, original_storage_name, original_storage):
+        file_paths = check_order(
+            iterate_original_storage_paths(original_storage),
+            get_key=lambda file_path: file_path,
+            description='Original storage listing'
+        )
+        meta_backend_objs = check_order(
+            self.proxy_storage.meta_backend.iterate_by_original_storage_path(
+                filters=self.get_meta_backend_filters(original_storage_name),
+                batch_size=self.batch_size
+            ),
+            get_key=lambda obj: obj['original_storage_path'],
+            description='Meta-backend iteration'
+        )
+        file_path = next(file_paths, None)
+        meta_backend_obj = next(meta_backend_objs, None)
+        while file_path is not None or meta_backend_obj is not None:
+            if meta_backend_obj is None or (file_path is not None and
+                                            file_path < meta_backend_obj['original_storage_path']):
+                yield Difference(ORPHANED_FILE, original_storage_name, file_path, None)
+                file_path = next(file_paths, None)
+            elif file_path is None or meta_backend_obj['original_storage_path'] < file_path:
+                yield Difference(
+                    DANGLING_RECORD,
+                    original_storage_name,
+                    meta_backend_obj['original_storage_path'],
+                    meta_backend_obj['path']
+                )
+                meta_backend_obj = next(meta_backend_objs, None)
+            else:
+                # file could be referenced by many objects
+                while meta_backend_obj is not None and meta_backend_obj['original_storage_path'] == file_path:
+                    meta_backend_obj = next(meta_backend_objs, None)
+                file_path = next(file_paths, None)
+
+    def process(self, original_storage, difference):
+        try:
+            return self._process(original_storage, difference)
+        except Exception as exc:
+            return Result(difference, FAILED, exc)
+
+    def _process(self, original_storage, difference):
+        if difference.kind == ORPHANED_FILE:
+            # file could belong to another proxy-storage with the same original storage
+            if self.is_referenced(original_storage, difference.original_storage_path):
+                return None
+            if not self.delete_orphaned_files:
+                return Result(difference, FOUND, None)
+            if not self.is_older_than_grace_period(original_storage, difference.original_storage_path):
+                return Result(difference, SKIPPED, None)
+            original_storage.delete(difference.original_storage_path)
+            return Result(difference, DELETED, None)
+        else:
+            if not self.delete_dangling_records:
+                return Result(difference, FOUND, None)
+            # file or object could have changed since the walk
+            if original_storage.exists(difference.original_storage_path):
+                return Result(difference, SKIPPED, None)
+            try:
+                meta_backend_obj = self.proxy_storage.meta_backend.get(
+                    path=difference.path,
+                    fields=['original_storage_path']
+                )
+            except MetaBackendObjectDoesNotExist:
+                return Result(difference, SKIPPED, None)
+            if meta_backend_obj['original_storage_path'] != difference.original_storage_path:
+                return Result(difference, SKIPPED, None)
+            self.proxy_storage.meta_backend.delete(path=difference.path)
+            return Result(difference, DELETED, None)
+
+    def is_older_than_grace_period(self, original_storage, original_storage_path):
+        if not self.grace_period:
+            return True
+        try:
+            get_modified_time = getattr(original_storage, 'get_modified_time', None)
+            if get_modified_time is not None:
+                modified_time = get_modified_time(original_storage_path)
+            else:
+                modified_time = original_storage.modified_time(original_storage_path)
+        except NotImplementedError:
+            # age is unknown, so file is not safe to delete
+            return False
+        if timezone.is_aware(modified_time):
+            now = timezone.now()
+        else:
+            now = datetime.datetime.now()
+        return now - modified_time > datetime.timedelta(seconds=self.grace_period)
+
+    def reconcile(self):
+        """
+        Generator of `Result` for every found difference. Files referenced by other proxy-storages
+        which share original storage are not differences.
+        """
+        for original_storage_name, original_storage in self.get_original_storages():
+            differences = self.iterate_differences(original_storage_name, original_storage)
+            workers = self.get_workers(original_storage_name)
+            if workers <= 1:
+                for difference in differences:
+                    result = self.process(original_storage, difference)
+                    if result is not None:
+                        yield result
+                continue
+            pool = ThreadPool(processes=workers)
+            try:
+                for differences_batch in utils.chunks(differences, self.batch_size):
+                    for result in pool.map(lambda difference: self.process(original_storage, difference),
+                                           differences_batch):
+                        if result is not None:
+                            yield result
+            finally:
+                pool.close()
+                pool.join()
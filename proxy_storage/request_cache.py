@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Context-local memoization of meta-backend lookups.
+
+While cache is active (for example between `MetaBackendRequestCacheMiddleware`
+request and response phases or inside `scope()` block) results of meta-backend's
+`get` and `exists` are memoized by path. Every write to meta-backend made in the same
+context invalidates memoized results for touched paths. When cache is not active
+every lookup goes straight to meta-backend.
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def activate():
+    _local.cache = {}
+
+
+def deactivate():
+    _local.cache = None
+
+
+def get_cache():
+    return getattr(_local, 'cache', None)
+
+
+def is_active():
+    return get_cache() is not None
+
+
+@contextmanager
+def scope():
+    previous_cache = get_cache()
+    activate()
+    try:
+        yield
+    finally:
+        _local.cache = previous_cache
+
+
+def get_or_set(namespace, key, path, getter):
+    cache = get_cache()
+    if cache is None:
+        return getter()
+    path_cache = cache.setdefault(path, {})
+    cache_key = (namespace, key)
+    try:
+        return path_cache[cache_key]
+    except KeyError:
+        value = path_cache[cache_key] = getter()
+        return value
+
+
+def set_value(namespace, key, path, value):
+    cache = get_cache()
+    if cache is not None:
+        cache.setdefault(path, {})[(namespace, key)] = value
+
+
+def invalidate(*paths):
+    cache = get_cache()
+    if cache is not None:
+        for path in paths:
+            cache.pop(path, None)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from django.http import FileResponse
+
+from proxy_storage.files import MmapFile
+
+
+class SendfileResponse(FileResponse):
+    """
+    File response which lets WSGI server send file by `sendfile(2)`: whole file is passed to
+    `wsgi.file_wrapper` and "Content-Length" is set from file size.
+
+    Wrappers send file from offset 0 (uwsgi) or from current position of its descriptor (gunicorn)
+    till the end, so byte ranges (partial content responses and files with `is_partial`) are never
+    passed to them and streamed by django. `MmapFile` is streamed by `memoryview` chunks, so data
+    is copied from page cache only once, to bytes of response.
+    """
+    block_size = 64 * 1024
+
+    def _set_streaming_content(self, value):
+        if isinstance(value, MmapFile):
+            self._closable_objects.append(value)
+            super(FileResponse, self)._set_streaming_content(value.chunks(self.block_size))
+            self.file_to_stream = value
+        else:
+            super(SendfileResponse, self)._set_streaming_content(value)
+        if self.status_code == 206 or getattr(value, 'is_partial', False):
+            self.file_to_stream = None
+        size = getattr(value, 'size', None) if hasattr(value, 'read') else None
+        if size is not None and not self.has_header('Content-Length'):
+            self['Content-Length'] = size
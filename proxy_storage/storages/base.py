@@ -1,20 +1,44 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import sys
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
-from django.utils.encoding import force_text
+from django.utils import timezone
+from django.utils.encoding import force_bytes, force_text
+from django.utils.http import http_date
 from django.core.files.storage import Storage
 
 from proxy_storage import utils
+from proxy_storage.compat import six
+from proxy_storage.files import RangeFile
 from proxy_storage.meta_backends.base import MetaBackendObjectDoesNotExist
 
 
 class ProxyStorageBase(Storage):
     original_storage = None
     meta_backend = None
+    url_from_original_storage = False
+    delete_many_workers = 8
+    delete_many_batch_size = 1000
+    listdir_batch_size = 100
+    reconcile_workers = 1
+    content_object_update_buffer = None
 
     def get_original_storage(self, meta_backend_obj=None):
         return self.original_storage
 
+    def get_original_storage_name(self, original_storage):
+        return None
+
+    def get_original_storage_fields(self):
+        """
+        Fields of meta-backend object which are needed to find file in original storage. Only
+        they are fetched by `open` and `delete`, so extend the list if `get_original_storage`
+        is overridden to use other fields.
+        """
+        return ['original_storage_path']
+
     def get_name(self):
         from proxy_storage.settings import proxy_storage_settings
 
@@ -22,19 +46,57 @@ class ProxyStorageBase(Storage):
 
     def _open(self, name, mode='rb'):
         try:
-            meta_backend_obj = self.meta_backend.get(path=name)
+            meta_backend_obj = self.meta_backend.get(path=name, fields=self.get_original_storage_fields())
             return self.get_original_storage(meta_backend_obj=meta_backend_obj).open(
                 meta_backend_obj['original_storage_path'],
                 mode
             )
         except MetaBackendObjectDoesNotExist:
-            raise IOError(u'No such {0} object with path: {1}'.format(type(self.meta_backend).__name__, name))
+            raise self.get_does_not_exist_error(name)
+
+    def open_range(self, name, offset, length=None):
+        """
+        Opens `length` bytes (till the end if `None`) of file from `offset` for reading.
+        """
+        try:
+            meta_backend_obj = self.meta_backend.get(path=name, fields=self.get_original_storage_fields())
+        except MetaBackendObjectDoesNotExist:
+            raise self.get_does_not_exist_error(name)
+        return self.open_range_for_meta_backend_obj(meta_backend_obj, offset=offset, length=length)
+
+    def open_range_for_meta_backend_obj(self, meta_backend_obj, offset, length=None):
+        """
+        Original storages with `open_range(name, offset, length)` method read only requested bytes,
+        others are opened and seeked to `offset`.
+        """
+        original_storage = self.get_original_storage(meta_backend_obj=meta_backend_obj)
+        original_storage_path = meta_backend_obj['original_storage_path']
+        if hasattr(original_storage, 'open_range'):
+            return original_storage.open_range(original_storage_path, offset=offset, length=length)
+        return RangeFile(original_storage.open(original_storage_path, 'rb'), offset=offset, length=length)
+
+    def get_does_not_exist_error(self, name):
+        return IOError(u'No such {0} object with path: {1}'.format(type(self.meta_backend).__name__, name))
 
     def save(self, name, content, original_storage_path=None):
+        if original_storage_path:
+            return self.save_to_meta_backend(original_storage_path=original_storage_path, content=content)
+
         # save file to original storage
-        if not original_storage_path:
-            original_storage_path = self.get_original_storage().save(name, content)
+        original_storage = self.get_original_storage()
+        original_storage_path = original_storage.save(name, content)
+        try:
+            return self.save_to_meta_backend(original_storage_path=original_storage_path, content=content)
+        except Exception:
+            exc_info = sys.exc_info()
+            self.handle_meta_backend_save_error(
+                original_storage=original_storage,
+                original_storage_path=original_storage_path,
+                error=exc_info[1]
+            )
+            six.reraise(*exc_info)
 
+    def save_to_meta_backend(self, original_storage_path, content):
         # Get the proper name for the file, as it will actually be saved to meta backend
         name = self.get_available_name(
             utils.clean_path(  # todo: test utils.clean_path usage
@@ -51,6 +113,10 @@ class ProxyStorageBase(Storage):
         ))
         return force_text(name)
 
+    def handle_meta_backend_save_error(self, original_storage, original_storage_path, error=None):
+        # file saved to original storage is kept by default
+        pass
+
     def get_data_for_meta_backend_save(self, path, original_storage_path, original_name, content):
         return {
             'path': path,
@@ -67,7 +133,7 @@ class ProxyStorageBase(Storage):
 
     def delete(self, name):
         try:
-            meta_backend_obj = self.meta_backend.get(path=name)
+            meta_backend_obj = self.meta_backend.get(path=name, fields=self.get_original_storage_fields())
             self.get_original_storage(meta_backend_obj=meta_backend_obj).delete(
                 meta_backend_obj['original_storage_path']
             )
@@ -75,9 +141,279 @@ class ProxyStorageBase(Storage):
         except MetaBackendObjectDoesNotExist:
             raise IOError("File not found: {0}".format(name))
 
+    def delete_many(self, names):
+        """
+        Deletes files in bulk. Returns dict of exceptions by name for files which were
+        not deleted. Meta-backend objects are kept for files which original storage
+        failed to delete.
+        """
+        # duplicated names would be deleted twice and reported as missing
+        names = list(OrderedDict.fromkeys(names))
+        meta_backend_objs = self.meta_backend.get_many(
+            paths=names,
+            batch_size=self.delete_many_batch_size,
+            fields=self.get_original_storage_fields()
+        )
+        errors = OrderedDict()
+        objs_by_original_storage = OrderedDict()
+        for name in names:
+            meta_backend_obj = meta_backend_objs.get(name)
+            if meta_backend_obj is None:
+                errors[name] = IOError("File not found: {0}".format(name))
+            else:
+                original_storage = self.get_original_storage(meta_backend_obj=meta_backend_obj)
+                objs_by_original_storage.setdefault(original_storage, []).append(meta_backend_obj)
+
+        deleted_names = []
+        for original_storage, objs in objs_by_original_storage.items():
+            for meta_backend_obj, error in self._delete_many_from_original_storage(original_storage, objs):
+                if error is None:
+                    deleted_names.append(meta_backend_obj['path'])
+                else:
+                    errors[meta_backend_obj['path']] = error
+
+        for names_batch in utils.chunks(deleted_names, self.delete_many_batch_size):
+            try:
+                self.meta_backend.delete_many(paths=names_batch)
+            except Exception as exc:
+                for name in names_batch:
+                    errors[name] = exc
+        return errors
+
+    def _delete_many_from_original_storage(self, original_storage, meta_backend_objs):
+        def delete(meta_backend_obj):
+            try:
+                original_storage.delete(meta_backend_obj['original_storage_path'])
+            except Exception as exc:
+                return meta_backend_obj, exc
+            else:
+                return meta_backend_obj, None
+
+        pool = ThreadPool(processes=max(1, min(self.delete_many_workers, len(meta_backend_objs))))
+        try:
+            return pool.map(delete, meta_backend_objs)
+        finally:
+            pool.close()
+            pool.join()
+
     def exists(self, name):
         return self.meta_backend.exists(path=name)
 
+    def listdir(self, path):
+        prefix = utils.clean_path(path)
+        if prefix != '/':
+            prefix += '/'
+        directories, files = [], []
+        start_after = None
+        while True:
+            paths = self.meta_backend.iterate_paths(
+                prefix=prefix,
+                batch_size=self.listdir_batch_size,
+                start_after=start_after
+            )
+            for meta_backend_path in paths:
+                relative_path = meta_backend_path[len(prefix):]
+                if '/' not in relative_path:
+                    files.append(relative_path)
+                    continue
+                directory = relative_path.split('/', 1)[0]
+                if directories and directories[-1] == directory:
+                    # only names starting with u'\uffff' or greater, like u'\U0001f600', get here
+                    continue
+                directories.append(directory)
+                # contents of directory are not read: iteration is restarted after them
+                start_after = u'{0}{1}/\uffff'.format(prefix, directory)
+                break
+            else:
+                return sorted(directories), sorted(files)
+
+    def filter_by_content_object(self, content_type_id, object_id, field=None, fields=None):
+        """
+        Same as `filter_by_content_object` of meta-backend, but files hidden by mixins of proxy-storage
+        (like soft deleted ones) are not returned.
+        """
+        return self.filter_by_content_objects([(content_type_id, object_id)], field=field, fields=fields)[
+            (content_type_id, object_id)
+        ]
+
+    def filter_by_content_objects(self, content_objects, field=None, fields=None):
+        return self.meta_backend.filter_by_content_objects(content_objects, field=field, fields=fields)
+
+    def get_meta_backend_obj(self, name):
+        try:
+            return self.meta_backend.get(path=name)
+        except MetaBackendObjectDoesNotExist:
+            raise self.get_does_not_exist_error(name)
+
+    def update_meta_backend_obj(self, name, update_data):
+        """
+        Updates meta-backend object of file. Use it instead of `meta_backend.update` when path
+        is changed, so mixins which remember missing paths learn about the new one.
+        """
+        self.meta_backend.update(path=name, update_data=update_data)
+
+    def size(self, name):
+        return self.size_for_meta_backend_obj(self.get_meta_backend_obj(name))
+
+    def size_for_meta_backend_obj(self, meta_backend_obj):
+        size = meta_backend_obj.get('size')
+        if size is None:
+            size = self.get_original_storage(meta_backend_obj=meta_backend_obj).size(
+                meta_backend_obj['original_storage_path']
+            )
+        return size
+
+    def url(self, name):
+        return self.url_for_meta_backend_obj(self.get_meta_backend_obj(name))
+
+    def url_for_meta_backend_obj(self, meta_backend_obj):
+        url = None
+        if not self.url_from_original_storage:
+            url = meta_backend_obj.get('url')
+        if url is None:
+            url = self.get_original_storage(meta_backend_obj=meta_backend_obj).url(
+                meta_backend_obj['original_storage_path']
+            )
+        return url
+
+    def created_time(self, name):
+        return self.created_time_for_meta_backend_obj(self.get_meta_backend_obj(name))
+
+    def created_time_for_meta_backend_obj(self, meta_backend_obj):
+        return self._get_time_for_meta_backend_obj(meta_backend_obj, 'created')
+
+    def get_created_time(self, name):
+        return self.created_time(name)
+
+    def modified_time(self, name):
+        return self.modified_time_for_meta_backend_obj(self.get_meta_backend_obj(name))
+
+    def modified_time_for_meta_backend_obj(self, meta_backend_obj):
+        return self._get_time_for_meta_backend_obj(meta_backend_obj, 'modified')
+
+    def get_modified_time(self, name):
+        return self.modified_time(name)
+
+    def accessed_time(self, name):
+        return self._get_time_for_meta_backend_obj(self.get_meta_backend_obj(name), 'accessed')
+
+    def get_accessed_time(self, name):
+        return self.accessed_time(name)
+
+    def etag(self, name):
+        return self.etag_for_meta_backend_obj(self.get_meta_backend_obj(name))
+
+    def etag_for_meta_backend_obj(self, meta_backend_obj):
+        content_hash = meta_backend_obj.get('content_hash')
+        if content_hash is None:
+            return None
+        return utils.quote_etag(content_hash)
+
+    def last_modified_for_meta_backend_obj(self, meta_backend_obj):
+        modified_time = meta_backend_obj.get('modified_time')
+        if modified_time is None:
+            return None
+        return http_date(utils.get_timestamp(modified_time))
+
+    def is_not_modified(self, name, if_none_match=None, if_modified_since=None):
+        """
+        Answers conditional request by values of "If-None-Match" and "If-Modified-Since" headers
+        from meta-backend object only, original storage is not touched.
+        """
+        try:
+            meta_backend_obj = self.meta_backend.get(path=name, fields=['content_hash', 'modified_time'])
+        except MetaBackendObjectDoesNotExist:
+            raise self.get_does_not_exist_error(name)
+        return self.is_not_modified_for_meta_backend_obj(
+            meta_backend_obj,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since
+        )
+
+    def is_not_modified_for_meta_backend_obj(self, meta_backend_obj, if_none_match=None, if_modified_since=None):
+        # "If-Modified-Since" is ignored when "If-None-Match" is sent (RFC 7232)
+        if if_none_match:
+            etag = self.etag_for_meta_backend_obj(meta_backend_obj)
+            return etag is not None and utils.etag_matches(etag, if_none_match)
+        if if_modified_since:
+            modified_time = meta_backend_obj.get('modified_time')
+            return modified_time is not None and not utils.is_modified_since(modified_time, if_modified_since)
+        return False
+
+    def _get_time_for_meta_backend_obj(self, meta_backend_obj, kind):
+        value = meta_backend_obj.get('{0}_time'.format(kind))
+        if value is None:
+            original_storage = self.get_original_storage(meta_backend_obj=meta_backend_obj)
+            # django>=1.10 provides timezone aware "get_*_time" methods
+            method = (
+                getattr(original_storage, 'get_{0}_time'.format(kind), None) or
+                getattr(original_storage, '{0}_time'.format(kind))
+            )
+            value = method(meta_backend_obj['original_storage_path'])
+        return value
+
+
+class FileAttributesProxyStorageMixin(object):
+    """
+    Records size, creation and modification time and url of file to meta-backend at save time,
+    so `size`, `url`, `created_time` and `modified_time` are served without original storage calls.
+    """
+    def get_data_for_meta_backend_save(self, path, original_storage_path, original_name, content):
+        data = super(FileAttributesProxyStorageMixin, self).get_data_for_meta_backend_save(
+            path=path,
+            original_storage_path=original_storage_path,
+            original_name=original_name,
+            content=content
+        )
+        now = timezone.now()
+        data.update({
+            'size': self.get_content_size(content),
+            'created_time': now,
+            'modified_time': now,
+            'url': self.get_original_storage_url(original_storage_path),
+        })
+        return data
+
+    def get_content_size(self, content):
+        try:
+            return content.size
+        except (AttributeError, IOError, OSError):
+            return None
+
+    def get_original_storage_url(self, original_storage_path):
+        try:
+            return self.get_original_storage().url(original_storage_path)
+        except (NotImplementedError, ValueError):
+            return None
+
+
+class ContentHashProxyStorageMixin(object):
+    """
+    Records hash of content (hex digest of `content_hash_algorithm`) and modification time to
+    meta-backend at save time, so ETag and Last-Modified validators are served from meta-backend.
+    """
+    content_hash_algorithm = 'sha1'
+
+    def get_data_for_meta_backend_save(self, path, original_storage_path, original_name, content):
+        data = super(ContentHashProxyStorageMixin, self).get_data_for_meta_backend_save(
+            path=path,
+            original_storage_path=original_storage_path,
+            original_name=original_name,
+            content=content
+        )
+        data['content_hash'] = self.get_content_hash(content)
+        if 'modified_time' not in data:
+            data['modified_time'] = timezone.now()
+        return data
+
+    def get_content_hash(self, content):
+        if not hasattr(content, 'chunks'):
+            return None
+        content_hash = hashlib.new(self.content_hash_algorithm)
+        for chunk in content.chunks():
+            content_hash.update(force_bytes(chunk))
+        return content_hash.hexdigest()
+
 
 class MultipleOriginalStoragesMixin(object):
     original_storages = []
@@ -112,6 +448,12 @@ class MultipleOriginalStoragesMixin(object):
         else:
             return super(MultipleOriginalStoragesMixin, self).get_original_storage(meta_backend_obj=meta_backend_obj)
 
+    def get_original_storage_name(self, original_storage):
+        return self.original_storages_dict_inversed[original_storage]
+
+    def get_original_storage_fields(self):
+        return super(MultipleOriginalStoragesMixin, self).get_original_storage_fields() + ['original_storage_name']
+
     def get_data_for_meta_backend_save(self, path, original_storage_path, *args, **kwargs):
         data = super(MultipleOriginalStoragesMixin, self).get_data_for_meta_backend_save(
             path=path,
@@ -120,6 +462,6 @@ class MultipleOriginalStoragesMixin(object):
             **kwargs
         )
         data.update({
-            'original_storage_name': self.original_storages_dict_inversed[self.original_storage]
+            'original_storage_name': self.get_original_storage_name(self.original_storage)
         })
         return data
\ No newline at end of file
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from proxy_storage.files import MmapFile
+
+
+@deconstructible
+class MmapFileSystemStorage(FileSystemStorage):
+    """
+    Original storage which opens files in "rb" mode as `MmapFile`, so their content is read
+    from page cache without copying and streamed by `sendfile(2)`. Other modes are opened as usual.
+    """
+
+    def _open(self, name, mode='rb'):
+        if mode != 'rb':
+            return super(MmapFileSystemStorage, self)._open(name, mode)
+        return MmapFile(open(self.path(name), 'rb'))
+
+    def open_range(self, name, offset, length=None):
+        return MmapFile(open(self.path(name), 'rb'), offset=offset, length=length)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import posixpath
+import threading
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri, force_bytes
+
+from proxy_storage.meta_backends.memory import simulate_latency
+
+
+@deconstructible
+class MemoryStorage(Storage):
+    """
+    Thread-safe original storage which keeps files in process memory. Intended for tests and
+    benchmarks. `latency` is number of seconds (or callable which returns it) every operation
+    sleeps to simulate remote storage.
+    """
+
+    def __init__(self, base_url='/memory/', latency=0):
+        self.base_url = base_url
+        self.latency = latency
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._files = {}
+
+    def _normalize_name(self, name):
+        return posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+
+    def _get_file(self, name):
+        try:
+            return self._files[self._normalize_name(name)]
+        except KeyError:
+            raise IOError('No such file: {0}'.format(name))
+
+    def _open(self, name, mode='rb'):
+        simulate_latency(self.latency)
+        with self._lock:
+            content_file = ContentFile(self._get_file(name)['content'])
+        content_file.name = name
+        return content_file
+
+    def open_range(self, name, offset, length=None):
+        simulate_latency(self.latency)
+        with self._lock:
+            content = self._get_file(name)['content']
+        end = None if length is None else offset + length
+        content_file = ContentFile(content[offset:end])
+        content_file.name = name
+        return content_file
+
+    def _save(self, name, content):
+        simulate_latency(self.latency)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        data = b''.join(force_bytes(chunk) for chunk in content.chunks())
+        now = timezone.now()
+        with self._lock:
+            self._files[self._normalize_name(name)] = {
+                'content': data,
+                'created_time': now,
+                'modified_time': now,
+            }
+        return name
+
+    def delete(self, name):
+        simulate_latency(self.latency)
+        with self._lock:
+            self._files.pop(self._normalize_name(name), None)
+
+    def exists(self, name):
+        simulate_latency(self.latency)
+        with self._lock:
+            return self._normalize_name(name) in self._files
+
+    def listdir(self, path):
+        simulate_latency(self.latency)
+        prefix = self._normalize_name(path)
+        prefix = prefix + '/' if prefix not in ('', '.') else ''
+        directories, files = set(), []
+        with self._lock:
+            names = list(self._files)
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            relative_name = name[len(prefix):]
+            if '/' in relative_name:
+                directories.add(relative_name.split('/', 1)[0])
+            else:
+                files.append(relative_name)
+        return sorted(directories), sorted(files)
+
+    def size(self, name):
+        simulate_latency(self.latency)
+        with self._lock:
+            return len(self._get_file(name)['content'])
+
+    def url(self, name):
+        return self.base_url + filepath_to_uri(self._normalize_name(name))
+
+    def created_time(self, name):
+        with self._lock:
+            return self._get_file(name)['created_time']
+
+    def modified_time(self, name):
+        with self._lock:
+            return self._get_file(name)['modified_time']
+
+    def accessed_time(self, name):
+        return self.modified_time(name)
+
+    def get_created_time(self, name):
+        return self.created_time(name)
+
+    def get_modified_time(self, name):
+        return self.modified_time(name)
+
+    def get_accessed_time(self, name):
+        return self.accessed_time(name)
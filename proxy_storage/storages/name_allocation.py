@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import posixpath
+
+from django.utils.crypto import get_random_string
+from django.utils.encoding import force_text
+
+from proxy_storage import utils
+
+
+class OptimisticNameAllocationProxyStorageMixin(object):
+    """
+    Allocates path of meta-backend object without `exists` checks. Object is created with desired path
+    and unique index of meta-backend decides: on conflict the next name with random suffix is tried,
+    up to `name_allocation_attempts` times.
+
+    `get_available_name` is not used, so concurrent saves of the same name never fail on
+    check-then-act race and every save costs one meta-backend query when there is no conflict.
+    """
+    name_allocation_attempts = 100
+
+    def save_to_meta_backend(self, original_storage_path, content):
+        desired_name = name = utils.clean_path(self.get_original_storage_full_path(original_storage_path))
+        unique_violation_exceptions = self.meta_backend.get_unique_violation_exceptions()
+        attempt = 1
+        while True:
+            try:
+                self.meta_backend.create(data=self.get_data_for_meta_backend_save(
+                    path=name,
+                    original_storage_path=original_storage_path,
+                    original_name=name,
+                    content=content,
+                ))
+                return force_text(name)
+            except unique_violation_exceptions:
+                if attempt >= self.name_allocation_attempts:
+                    raise
+                attempt += 1
+                name = self.get_alternative_meta_backend_name(desired_name)
+
+    def get_alternative_meta_backend_name(self, name):
+        # random suffix, so concurrent saves don't fight for the same next name
+        dir_name, file_name = posixpath.split(name)
+        file_root, file_ext = posixpath.splitext(file_name)
+        return posixpath.join(dir_name, '{0}_{1}{2}'.format(file_root, get_random_string(7), file_ext))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import threading
+import time
+
+from django.core.cache import caches
+
+from proxy_storage.bloom import BloomFilter
+from proxy_storage.utils import get_path_cache_key
+
+logger = logging.getLogger('proxy_storage')
+
+
+class NegativeLookupCacheMixin(object):
+    """
+    Remembers paths which are missing in meta-backend, so repeated `exists` and `open`
+    calls for them don't hit meta-backend until cache timeout expires. Paths are forgotten
+    when file is saved or meta-backend object is moved to them by `update_meta_backend_obj`.
+    """
+    negative_lookup_cache_alias = 'default'
+    negative_lookup_cache_timeout = 60
+    negative_lookup_cache_key_prefix = None
+
+    def get_negative_lookup_cache(self):
+        return caches[self.negative_lookup_cache_alias]
+
+    def get_negative_lookup_cache_key(self, name):
+        prefix = self.negative_lookup_cache_key_prefix
+        if prefix is None:
+            prefix = 'proxy_storage:missing:{0}.{1}:'.format(type(self).__module__, type(self).__name__)
+        return get_path_cache_key(prefix, name)
+
+    def exists(self, name):
+        cache = self.get_negative_lookup_cache()
+        cache_key = self.get_negative_lookup_cache_key(name)
+        if cache.get(cache_key):
+            return False
+        exists = super(NegativeLookupCacheMixin, self).exists(name)
+        if not exists:
+            cache.set(cache_key, True, self.negative_lookup_cache_timeout)
+        return exists
+
+    def _open(self, name, mode='rb'):
+        if self.get_negative_lookup_cache().get(self.get_negative_lookup_cache_key(name)):
+            raise self.get_does_not_exist_error(name)
+        return super(NegativeLookupCacheMixin, self)._open(name, mode)
+
+    def save(self, *args, **kwargs):
+        name = super(NegativeLookupCacheMixin, self).save(*args, **kwargs)
+        self.forget_missing_path(name)
+        return name
+
+    def update_meta_backend_obj(self, name, update_data):
+        super(NegativeLookupCacheMixin, self).update_meta_backend_obj(name, update_data)
+        if update_data.get('path', name) != name:
+            self.forget_missing_path(update_data['path'])
+
+    def forget_missing_path(self, name):
+        self.get_negative_lookup_cache().delete(self.get_negative_lookup_cache_key(name))
+
+
+class BloomFilterLookupGuardMixin(object):
+    """
+    Checks paths against bloom filter built over all meta-backend paths. Definitely missing
+    paths are answered without meta-backend query.
+
+    Filter is rebuilt periodically (see `rebuild_proxy_storage_bloom_filters` command) and paths
+    created (or moved to by `update_meta_backend_obj`) after the last rebuild are remembered in
+    cache for `bloom_filter_recent_paths_timeout` seconds, which must be longer than rebuild period.
+
+    Filter is sized for number of meta-backend objects at rebuild multiplied by `bloom_filter_capacity_headroom`,
+    but not less than `bloom_filter_capacity` if it is set. Filter which got more paths than its capacity is
+    logged when loaded.
+    """
+    bloom_filter_file_path = None
+    bloom_filter_capacity = None
+    bloom_filter_capacity_headroom = 1.1
+    bloom_filter_error_rate = 0.01
+    bloom_filter_check_interval = 60
+    bloom_filter_recent_paths_cache_alias = 'default'
+    bloom_filter_recent_paths_timeout = 24 * 60 * 60
+    bloom_filter_recent_paths_key_prefix = 'proxy_storage:recent:'
+
+    _loaded_bloom_filters = {}
+    _loaded_bloom_filters_lock = threading.Lock()
+
+    def get_bloom_filter(self):
+        file_path = self.bloom_filter_file_path
+        if not file_path:
+            return None
+        now = time.time()
+        loaded = self._loaded_bloom_filters.get(file_path)
+        if loaded is not None and now - loaded['checked_at'] < self.bloom_filter_check_interval:
+            return loaded['bloom_filter']
+        with self._loaded_bloom_filters_lock:
+            loaded = self._loaded_bloom_filters.get(file_path) or {'bloom_filter': None, 'signature': None}
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                bloom_filter, signature = None, None
+            else:
+                # rebuilt filter replaces file, so inode changes even if mtime doesn't
+                signature = (stat.st_ino, stat.st_mtime, stat.st_size)
+                if signature == loaded['signature']:
+                    bloom_filter = loaded['bloom_filter']
+                else:
+                    bloom_filter = self.load_bloom_filter(file_path)
+            if loaded['bloom_filter'] is not None and loaded['bloom_filter'] is not bloom_filter:
+                # lookup which still uses replaced filter treats path as possibly existing
+                loaded['bloom_filter'].close()
+            self._loaded_bloom_filters[file_path] = {
+                'bloom_filter': bloom_filter,
+                'signature': signature,
+                'checked_at': now,
+            }
+            return bloom_filter
+
+    def load_bloom_filter(self, file_path):
+        bloom_filter = BloomFilter.load(file_path)
+        if bloom_filter.is_over_capacity:
+            logger.warning(
+                'Bloom filter "%s" holds %s paths over capacity of %s, false positive rate is higher than %s',
+                file_path,
+                bloom_filter.count,
+                bloom_filter.capacity,
+                self.bloom_filter_error_rate
+            )
+        return bloom_filter
+
+    def get_bloom_filter_capacity(self):
+        capacity = int(self.meta_backend.count() * self.bloom_filter_capacity_headroom)
+        return max(capacity, self.bloom_filter_capacity or 0)
+
+    def get_bloom_filter_recent_paths_cache(self):
+        return caches[self.bloom_filter_recent_paths_cache_alias]
+
+    def is_definitely_missing(self, name):
+        bloom_filter = self.get_bloom_filter()
+        if bloom_filter is None:
+            return False
+        try:
+            if name in bloom_filter:
+                return False
+        except ValueError:
+            # filter was closed by other thread which loaded the rebuilt one
+            return False
+        return not self.get_bloom_filter_recent_paths_cache().get(
+            get_path_cache_key(self.bloom_filter_recent_paths_key_prefix, name)
+        )
+
+    def rebuild_bloom_filter(self):
+        bloom_filter = BloomFilter.for_capacity(
+            capacity=self.get_bloom_filter_capacity(),
+            error_rate=self.bloom_filter_error_rate
+        )
+        for path in self.meta_backend.iterate_paths():
+            bloom_filter.add(path)
+        bloom_filter.save(self.bloom_filter_file_path)
+        with self._loaded_bloom_filters_lock:
+            loaded = self._loaded_bloom_filters.pop(self.bloom_filter_file_path, None)
+            if loaded is not None and loaded['bloom_filter'] is not None:
+                loaded['bloom_filter'].close()
+
+    def exists(self, name):
+        if self.is_definitely_missing(name):
+            return False
+        return super(BloomFilterLookupGuardMixin, self).exists(name)
+
+    def _open(self, name, mode='rb'):
+        if self.is_definitely_missing(name):
+            raise self.get_does_not_exist_error(name)
+        return super(BloomFilterLookupGuardMixin, self)._open(name, mode)
+
+    def save(self, *args, **kwargs):
+        name = super(BloomFilterLookupGuardMixin, self).save(*args, **kwargs)
+        self.remember_recent_path(name)
+        return name
+
+    def update_meta_backend_obj(self, name, update_data):
+        super(BloomFilterLookupGuardMixin, self).update_meta_backend_obj(name, update_data)
+        if update_data.get('path', name) != name:
+            self.remember_recent_path(update_data['path'])
+
+    def remember_recent_path(self, name):
+        self.get_bloom_filter_recent_paths_cache().set(
+            get_path_cache_key(self.bloom_filter_recent_paths_key_prefix, name),
+            True,
+            self.bloom_filter_recent_paths_timeout
+        )
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import time
+import uuid
+from collections import OrderedDict
+
+from proxy_storage import utils
+from proxy_storage.meta_backends.base import MetaBackendObjectDoesNotExist
+
+
+class SoftDeleteProxyStorageMixin(object):
+    """
+    `delete` doesn't touch original storage. It only moves meta-backend object to tombstone path
+    under `soft_delete_trash_path`, so the file disappears from proxy-storage at once and could be
+    restored with `undelete`. Files are removed physically by `purge_deleted` (see
+    `purge_proxy_storage_deleted_files` command) after `soft_delete_purge_delay` seconds.
+
+    Tombstone path is "<trash path>/<SHA-1 of path>/<deletion timestamp>-<random hex>", so its length
+    doesn't depend on path and fits into path field of any length of at least 100 characters.
+    """
+    soft_delete_trash_path = '/.trash'
+    soft_delete_purge_delay = 24 * 60 * 60
+
+    def get_tombstone_prefix(self, name):
+        return '{0}/{1}/'.format(self.soft_delete_trash_path, utils.get_path_hash(utils.clean_path(name)))
+
+    def get_tombstone_path(self, name, deleted_at=None):
+        return '{0}{1:d}-{2}'.format(
+            self.get_tombstone_prefix(name),
+            int(deleted_at if deleted_at is not None else time.time()),
+            uuid.uuid4().hex
+        )
+
+    def is_tombstone_path(self, path):
+        return path.startswith(self.soft_delete_trash_path + '/')
+
+    def get_tombstone_deleted_at(self, tombstone_path):
+        marker = tombstone_path.rsplit('/', 1)[-1]
+        return int(marker.split('-', 1)[0])
+
+    def delete(self, name):
+        try:
+            self.meta_backend.get(path=name, fields=['path'])
+        except MetaBackendObjectDoesNotExist:
+            raise IOError("File not found: {0}".format(name))
+        self.update_meta_backend_obj(name, {'path': self.get_tombstone_path(name)})
+
+    def delete_many(self, names):
+        errors = {}
+        for name in OrderedDict.fromkeys(names):
+            try:
+                self.delete(name)
+            except Exception as exc:
+                errors[name] = exc
+        return errors
+
+    def hard_delete(self, name):
+        return super(SoftDeleteProxyStorageMixin, self).delete(name)
+
+    def hard_delete_many(self, names):
+        return super(SoftDeleteProxyStorageMixin, self).delete_many(names)
+
+    def get_tombstone_paths(self, name):
+        return list(self.meta_backend.iterate_paths(prefix=self.get_tombstone_prefix(name)))
+
+    def undelete(self, name):
+        """
+        Restores the most recently deleted file with `name`. Returns name of restored file,
+        which differs from `name` if another file was saved with the same name after deletion.
+        """
+        tombstone_paths = self.get_tombstone_paths(name)
+        if not tombstone_paths:
+            raise IOError("File not found: {0}".format(name))
+        tombstone_path = max(tombstone_paths, key=self.get_tombstone_deleted_at)
+        restored_name = self.get_available_name(name)
+        self.update_meta_backend_obj(tombstone_path, {'path': restored_name})
+        return restored_name
+
+    def iterate_purgeable_paths(self, deleted_before=None):
+        if deleted_before is None:
+            deleted_before = time.time() - self.soft_delete_purge_delay
+        for path in self.meta_backend.iterate_paths(prefix=self.soft_delete_trash_path + '/'):
+            if self.get_tombstone_deleted_at(path) <= deleted_before:
+                yield path
+
+    def purge_deleted(self, deleted_before=None, batch_size=100, pause=0):
+        """
+        Physically deletes soft deleted files by `batch_size` files with `pause` seconds between
+        batches, so original storage is not flooded. Returns dict of exceptions by tombstone path
+        for files which were not deleted.
+        """
+        errors = {}
+        for i, paths_batch in enumerate(utils.chunks(self.iterate_purgeable_paths(deleted_before), batch_size)):
+            if i and pause:
+                time.sleep(pause)
+            errors.update(self.hard_delete_many(paths_batch))
+        return errors
+
+    def listdir(self, path):
+        directories, files = super(SoftDeleteProxyStorageMixin, self).listdir(path)
+        if utils.clean_path(path) == '/':
+            trash_directory = self.soft_delete_trash_path.strip('/')
+            directories = [directory for directory in directories if directory != trash_directory]
+        return directories, files
+
+    def filter_by_content_objects(self, content_objects, field=None, fields=None):
+        result = super(SoftDeleteProxyStorageMixin, self).filter_by_content_objects(
+            content_objects,
+            field=field,
+            fields=fields
+        )
+        return dict(
+            (content_object, [obj for obj in objs if not self.is_tombstone_path(obj['path'])])
+            for content_object, objs in result.items()
+        )
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import logging
+
+logger = logging.getLogger('proxy_storage')
+
+
+class TransactionalSaveProxyStorageMixin(object):
+    """
+    Keeps original storage and meta-backend consistent on save:
+
+    * if meta-backend object could not be created, file is deleted from original storage. If deletion fails
+      too (or `defer_save_cleanup` is `True`) file is put to `cleanup_queue` to be deleted later by
+      `process_proxy_storage_cleanup_queues` command. If error doesn't prove that nothing was written
+      (see `get_not_written_exceptions` of meta-backend) file is never deleted right away: it is put to
+      `cleanup_queue`, which deletes only files without meta-backend objects, or kept if there is no queue;
+    * if other save took the same path between `get_available_name` and meta-backend object creation,
+      the next available name is allocated up to `save_attempts` times instead of failing.
+    """
+    save_attempts = 5
+    cleanup_queue = None
+    defer_save_cleanup = False
+
+    def save_to_meta_backend(self, original_storage_path, content):
+        unique_violation_exceptions = self.meta_backend.get_unique_violation_exceptions()
+        attempt = 1
+        while True:
+            try:
+                return super(TransactionalSaveProxyStorageMixin, self).save_to_meta_backend(
+                    original_storage_path=original_storage_path,
+                    content=content
+                )
+            except unique_violation_exceptions:
+                if attempt >= self.save_attempts:
+                    raise
+                attempt += 1
+
+    def handle_meta_backend_save_error(self, original_storage, original_storage_path, error=None):
+        super(TransactionalSaveProxyStorageMixin, self).handle_meta_backend_save_error(
+            original_storage=original_storage,
+            original_storage_path=original_storage_path,
+            error=error
+        )
+        # timed out write could be applied, so deleting the file could leave object without file
+        not_written_exceptions = self.meta_backend.get_not_written_exceptions()
+        may_be_written = error is None or not isinstance(error, not_written_exceptions)
+        if may_be_written and self.cleanup_queue is None:
+            logger.error('Keeping "%s" in original storage, because failed save could create '
+                         'meta-backend object: %r', original_storage_path, error)
+            return
+        if not may_be_written and (not self.defer_save_cleanup or self.cleanup_queue is None):
+            try:
+                original_storage.delete(original_storage_path)
+                return
+            except Exception:
+                if self.cleanup_queue is None:
+                    logger.exception('Could not delete "%s" from original storage after failed save',
+                                     original_storage_path)
+                    return
+        try:
+            self.cleanup_queue.put(
+                proxy_storage_name=self.get_name(),
+                original_storage_name=self.get_original_storage_name(original_storage),
+                original_storage_path=original_storage_path
+            )
+        except Exception:
+            logger.exception('Could not put "%s" to cleanup queue after failed save', original_storage_path)
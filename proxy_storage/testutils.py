@@ -2,6 +2,7 @@ from mock import patch
 
 from django.test import TestCase
 
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
 from proxy_storage.meta_backends.orm import ORMMetaBackend
 from proxy_storage.meta_backends.mongo import MongoMetaBackend
 
@@ -24,6 +25,8 @@ def create_test_cases_for_proxy_storage(proxy_storage_class, test_case_bases, me
                     meta_backend_instance.database.name,
                     meta_backend_instance.collection
                 )
+            elif isinstance(meta_backend_instance, MemoryMetaBackend):
+                meta_backend_instance_marker = 'MemoryMetaBackend'
             else:
                 raise Exception('You must create meta backend mark for {}'.format(type(meta_backend_instance)))
             new_test_case_class_name = '{0}_{1}_{2}'.format(
@@ -1,5 +1,124 @@
 # -*- coding: utf-8 -*-
+import calendar
+import datetime
+import hashlib
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+from django.utils.http import parse_http_date_safe
 
 
 def clean_path(path):
-    return '/{0}'.format(path.strip('/'))
\ No newline at end of file
+    return '/{0}'.format(path.strip('/'))
+
+
+def get_path_hash(path):
+    return hashlib.sha1(force_bytes(path)).hexdigest()
+
+
+def get_path_cache_key(prefix, path):
+    return '{0}{1}'.format(prefix, hashlib.md5(force_bytes(path)).hexdigest())
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _encode_json_default(value):
+    if isinstance(value, datetime.datetime):
+        return {'$datetime': value.isoformat()}
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def _decode_json_object_hook(obj):
+    if len(obj) == 1 and '$datetime' in obj:
+        return parse_datetime(obj['$datetime'])
+    return obj
+
+
+def json_dumps(value):
+    """
+    JSON encoding for key-value meta-backends, datetimes are tagged so `json_loads` restores them.
+    """
+    return json.dumps(value, default=_encode_json_default)
+
+
+def json_loads(value):
+    return json.loads(force_text(value), object_hook=_decode_json_object_hook)
+
+
+def quote_etag(value):
+    return '"{0}"'.format(value)
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Weak comparison of `etag` with value of "If-None-Match" header.
+    """
+    if if_none_match.strip() == '*':
+        return True
+    etags = [value.strip() for value in if_none_match.split(',')]
+    return strip_weak_etag_prefix(etag) in [strip_weak_etag_prefix(value) for value in etags]
+
+
+def strip_weak_etag_prefix(etag):
+    if etag.startswith('W/'):
+        return etag[2:]
+    return etag
+
+
+def get_timestamp(value):
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return calendar.timegm(value.utctimetuple())
+
+
+def is_modified_since(value, if_modified_since):
+    """
+    Compares datetime with value of "If-Modified-Since" header with one second precision of HTTP dates.
+    """
+    since = parse_http_date_safe(if_modified_since)
+    if since is None:
+        return True
+    return get_timestamp(value) > since
+
+
+def parse_byte_range(range_header, size):
+    """
+    Returns `(offset, length)` of single byte range of "Range" header value for file of `size` bytes.
+    Invalid headers and multiple ranges are ignored with `None`, `ValueError` is raised if range
+    could not be satisfied.
+    """
+    unit, _, ranges = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    first, _, last = ranges.strip().partition('-')
+    try:
+        first = int(first) if first.strip() else None
+        last = int(last) if last.strip() else None
+    except ValueError:
+        return None
+    if first is None:
+        if last is None:
+            return None
+        # suffix range: last N bytes
+        if last == 0 or size == 0:
+            raise ValueError('Range is not satisfiable')
+        first = max(size - last, 0)
+        last = size - 1
+    elif last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError('Range is not satisfiable')
+    if last is None or last >= size:
+        last = size - 1
+    return first, last - first + 1
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import mimetypes
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified
+from django.utils.http import parse_http_date_safe, urlquote
+
+from proxy_storage import utils
+from proxy_storage.compat import View
+from proxy_storage.meta_backends.base import MetaBackendObject, MetaBackendObjectDoesNotExist
+from proxy_storage.responses import SendfileResponse
+
+
+class ServeView(View):
+    """
+    Serves files of `proxy_storage` by path from "path" url keyword argument or query parameter.
+
+    Meta-backend object is fetched by one projected lookup and access is checked by policy from
+    `authorization_policies` dict keyed by `("<app_label>.<model>", field)` pairs (field `None`
+    matches any field of the model). Files without policy are answered with 404.
+
+    If original storage name (`None` for proxy-storages with one original storage) is in
+    `sendfile_locations`, file is handed over to web server by `sendfile_header`, otherwise it is
+    streamed by django. Resolution of files of public policies is cached for `public_cache_timeout`
+    seconds under key of the view class and proxy-storage class. Cache is not invalidated when file
+    is deleted or replaced, so the timeout is short.
+
+    ETag and Last-Modified are taken from "content_hash" and "modified_time" fields, so conditional
+    requests are answered with 304 without original storage calls.
+    """
+    proxy_storage = None
+    authorization_policies = {}
+    sendfile_header = 'X-Accel-Redirect'
+    sendfile_locations = {}
+    public_cache_alias = 'default'
+    public_cache_timeout = 5
+    public_cache_key_prefix = 'proxy_storage:serve:'
+    content_object_fields = ['proxy_storage_name', 'content_type_id', 'object_id', 'field']
+    validator_fields = ['content_hash', 'modified_time']
+
+    def get(self, request, *args, **kwargs):
+        path = self.get_path()
+        if not path:
+            raise Http404
+        meta_backend_obj, is_cached = self.get_cached_meta_backend_obj(path), True
+        if meta_backend_obj is None:
+            meta_backend_obj, is_cached = self.get_meta_backend_obj(path), False
+        if meta_backend_obj is None:
+            raise Http404
+        policy = self.get_authorization_policy(meta_backend_obj)
+        if policy is None:
+            raise Http404
+        if not policy.has_access(request, meta_backend_obj):
+            return HttpResponseForbidden()
+        if policy.public and not is_cached:
+            self.set_cached_meta_backend_obj(path, meta_backend_obj)
+        proxy_storage = self.get_proxy_storage(meta_backend_obj)
+        if proxy_storage.is_not_modified_for_meta_backend_obj(
+            meta_backend_obj,
+            if_none_match=request.META.get('HTTP_IF_NONE_MATCH'),
+            if_modified_since=request.META.get('HTTP_IF_MODIFIED_SINCE')
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = self.serve(meta_backend_obj)
+        return self.set_validators(response, proxy_storage, meta_backend_obj)
+
+    def get_path(self):
+        path = self.kwargs.get('path') or self.request.GET.get('path')
+        if path:
+            return utils.clean_path(path)
+        return None
+
+    def get_proxy_storage(self, meta_backend_obj=None):
+        """
+        Returns proxy-storage which saved the file, so views of proxy-storages sharing one
+        meta-backend could serve each other's files.
+        """
+        from proxy_storage.settings import proxy_storage_settings
+
+        proxy_storage_name = meta_backend_obj.get('proxy_storage_name') if meta_backend_obj else None
+        proxy_storage_class = proxy_storage_settings.PROXY_STORAGE_CLASSES.get(proxy_storage_name)
+        if proxy_storage_class is None or isinstance(self.proxy_storage, proxy_storage_class):
+            return self.proxy_storage
+        return proxy_storage_class()
+
+    def get_meta_backend_fields(self, proxy_storage=None):
+        return (
+            (proxy_storage or self.get_proxy_storage()).get_original_storage_fields() +
+            self.content_object_fields +
+            self.validator_fields +
+            ['size']
+        )
+
+    def get_meta_backend_obj(self, path):
+        fields = self.get_meta_backend_fields()
+        try:
+            meta_backend_obj = self.get_proxy_storage().meta_backend.get(path=path, fields=fields)
+            # file could be saved by other proxy-storage of the meta-backend which needs more fields
+            # (like original storage name), it costs the second lookup
+            proxy_storage = self.get_proxy_storage(meta_backend_obj)
+            proxy_storage_fields = self.get_meta_backend_fields(proxy_storage)
+            if set(proxy_storage_fields) - set(fields):
+                meta_backend_obj = proxy_storage.meta_backend.get(path=path, fields=proxy_storage_fields)
+            return meta_backend_obj
+        except MetaBackendObjectDoesNotExist:
+            return None
+
+    def get_public_cache(self):
+        return caches[self.public_cache_alias]
+
+    def get_public_cache_namespace(self):
+        # views of different proxy-storages (or with different fields) could serve the same path
+        return u'{0}.{1}:{2}.{3}:'.format(
+            type(self).__module__,
+            type(self).__name__,
+            type(self.proxy_storage).__module__,
+            type(self.proxy_storage).__name__
+        )
+
+    def get_public_cache_key(self, path):
+        return utils.get_path_cache_key(self.public_cache_key_prefix, self.get_public_cache_namespace() + path)
+
+    def get_cached_meta_backend_obj(self, path):
+        if not self.public_cache_timeout:
+            return None
+        meta_backend_obj = self.get_public_cache().get(self.get_public_cache_key(path))
+        if meta_backend_obj is None:
+            return None
+        return MetaBackendObject(meta_backend_obj)
+
+    def set_cached_meta_backend_obj(self, path, meta_backend_obj):
+        if self.public_cache_timeout:
+            self.get_public_cache().set(
+                self.get_public_cache_key(path),
+                dict(meta_backend_obj),
+                self.public_cache_timeout
+            )
+
+    def get_authorization_policy(self, meta_backend_obj):
+        if meta_backend_obj.get('content_type_id') is None:
+            return None
+        try:
+            content_type = ContentType.objects.get_for_id(meta_backend_obj['content_type_id'])
+        except ContentType.DoesNotExist:
+            return None
+        model_label = u'{0}.{1}'.format(content_type.app_label, content_type.model)
+        policy = self.authorization_policies.get((model_label, meta_backend_obj.get('field')))
+        if policy is None:
+            policy = self.authorization_policies.get((model_label, None))
+        return policy
+
+    def get_content_type(self, meta_backend_obj):
+        return mimetypes.guess_type(meta_backend_obj['path'])[0] or 'application/octet-stream'
+
+    def serve(self, meta_backend_obj):
+        proxy_storage = self.get_proxy_storage(meta_backend_obj)
+        original_storage = proxy_storage.get_original_storage(meta_backend_obj=meta_backend_obj)
+        location = self.sendfile_locations.get(proxy_storage.get_original_storage_name(original_storage))
+        if location is None:
+            return self.stream(proxy_storage, meta_backend_obj)
+        # web server handles "Range" header itself
+        response = HttpResponse(content_type=self.get_content_type(meta_backend_obj))
+        response[self.sendfile_header] = self.get_sendfile_value(location, meta_backend_obj)
+        return response
+
+    def stream(self, proxy_storage, meta_backend_obj):
+        content_type = self.get_content_type(meta_backend_obj)
+        range_header = self.request.META.get('HTTP_RANGE')
+        if range_header and self.is_range_fresh(proxy_storage, meta_backend_obj):
+            size = proxy_storage.size_for_meta_backend_obj(meta_backend_obj)
+            try:
+                byte_range = utils.parse_byte_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{0}'.format(size)
+                return response
+            if byte_range is not None:
+                offset, length = byte_range
+                response = SendfileResponse(
+                    proxy_storage.open_range_for_meta_backend_obj(meta_backend_obj, offset=offset, length=length),
+                    status=206,
+                    content_type=content_type
+                )
+                response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(offset, offset + length - 1, size)
+                response['Content-Length'] = length
+                response['Accept-Ranges'] = 'bytes'
+                return response
+        original_storage = proxy_storage.get_original_storage(meta_backend_obj=meta_backend_obj)
+        response = SendfileResponse(
+            original_storage.open(meta_backend_obj['original_storage_path'], 'rb'),
+            content_type=content_type
+        )
+        if meta_backend_obj.get('size') is not None:
+            response['Content-Length'] = meta_backend_obj['size']
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def is_range_fresh(self, proxy_storage, meta_backend_obj):
+        """
+        Checks "If-Range" header: range is served only if file is not changed since client got its head.
+        """
+        if_range = self.request.META.get('HTTP_IF_RANGE')
+        if not if_range:
+            return True
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # strong comparison, weak validators never match
+            return if_range == proxy_storage.etag_for_meta_backend_obj(meta_backend_obj)
+        modified_time = meta_backend_obj.get('modified_time')
+        return modified_time is not None and utils.get_timestamp(modified_time) == parse_http_date_safe(if_range)
+
+    def set_validators(self, response, proxy_storage, meta_backend_obj):
+        etag = proxy_storage.etag_for_meta_backend_obj(meta_backend_obj)
+        if etag is not None:
+            response['ETag'] = etag
+        last_modified = proxy_storage.last_modified_for_meta_backend_obj(meta_backend_obj)
+        if last_modified is not None:
+            response['Last-Modified'] = last_modified
+        return response
+
+    def get_sendfile_value(self, location, meta_backend_obj):
+        value = u'{0}/{1}'.format(location.rstrip('/'), meta_backend_obj['original_storage_path'].lstrip('/'))
+        if self.sendfile_header.lower() == 'x-accel-redirect':
+            # nginx expects uri, X-Sendfile expects file system path
+            value = urlquote(value)
+        return value
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Write-behind buffer of meta-backend updates. Updates of the same path are coalesced and sent
+to meta-backend by `update_many` later.
+"""
+import atexit
+import functools
+import logging
+import threading
+import weakref
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger('proxy_storage')
+
+# buffers are flushed on interpreter exit, but the hook doesn't keep them alive
+_buffers = weakref.WeakSet()
+
+
+class WriteBehindBuffer(object):
+    """
+    Pending updates are flushed:
+
+    * on commit of transaction in which they were put. Until then they are kept per transaction, so other
+      flushes don't send them and they are discarded on rollback;
+    * every `flush_interval` seconds by single flusher thread if they were put outside of transaction.
+      If `flush_interval` is `None` they are flushed immediately;
+    * when number of pending paths reaches `max_size`;
+    * on interpreter exit or `close()` call.
+
+    Updates which could not be flushed are logged and kept for the next flush unless newer update
+    of the same path is put meanwhile.
+    """
+
+    def __init__(self, flush_interval=None, max_size=1000, batch_size=1000):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flusher = None
+        self._stop_flusher = None
+        self._local = threading.local()
+        _buffers.add(self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def put(self, meta_backend, path, update_data, using=None):
+        if self.is_in_transaction(using):
+            add_update(self.get_transaction_pending(using), meta_backend, path, update_data)
+            return
+        with self._lock:
+            add_update(self._pending, meta_backend, path, update_data)
+            is_full = len(self._pending) >= self.max_size
+        if is_full:
+            self.flush()
+        elif self.flush_interval is None:
+            self.flush()
+        else:
+            self._start_flusher()
+
+    def is_in_transaction(self, using=None):
+        # transaction.on_commit appeared in django 1.9
+        if not hasattr(transaction, 'on_commit'):
+            return False
+        return transaction.get_connection(using or DEFAULT_DB_ALIAS).in_atomic_block
+
+    def get_transaction_pending(self, using=None):
+        """
+        Returns dict of updates put in current transaction of `using` connection. Single `on_commit`
+        callback is registered per transaction (and savepoint), so its updates are dropped together
+        with it if transaction or savepoint is rolled back.
+        """
+        connection = transaction.get_connection(using or DEFAULT_DB_ALIAS)
+        # connections are thread-local, so are transactions
+        registered = getattr(self._local, 'registered', None)
+        if registered is None:
+            registered = self._local.registered = {}
+        callback, pending = registered.get(connection.alias, (None, None))
+        if callback is not None and (set(connection.savepoint_ids), callback) in connection.run_on_commit:
+            return pending
+        pending = {}
+        callback = functools.partial(self._commit, pending)
+        transaction.on_commit(callback, using=connection.alias)
+        registered[connection.alias] = (callback, pending)
+        return pending
+
+    def _commit(self, pending):
+        with self._lock:
+            for (meta_backend, path), update_data in pending.items():
+                add_update(self._pending, meta_backend, path, update_data)
+        self.flush()
+
+    def _start_flusher(self):
+        with self._lock:
+            # thread is not copied by fork, so it is started again in forked process
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stop_flusher = threading.Event()
+            self._flusher = threading.Thread(
+                target=run_flusher,
+                args=(weakref.ref(self), self._stop_flusher, self.flush_interval)
+            )
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        update_data_by_meta_backend = {}
+        for (meta_backend, path), update_data in pending.items():
+            update_data_by_meta_backend.setdefault(meta_backend, {})[path] = update_data
+        for meta_backend, update_data_by_path in update_data_by_meta_backend.items():
+            try:
+                meta_backend.update_many(update_data_by_path, batch_size=self.batch_size)
+            except Exception:
+                logger.exception('Could not flush %s meta-backend updates', len(update_data_by_path))
+                with self._lock:
+                    for path, update_data in update_data_by_path.items():
+                        self._pending.setdefault((meta_backend, path), update_data)
+
+    def close(self):
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+            stop_flusher, self._stop_flusher = self._stop_flusher, None
+        if flusher is not None:
+            stop_flusher.set()
+            if flusher is not threading.current_thread():
+                flusher.join()
+        self.flush()
+
+
+def add_update(pending, meta_backend, path, update_data):
+    key = (meta_backend, path)
+    pending[key] = dict(pending.get(key, {}), **update_data)
+
+
+def run_flusher(buffer_ref, stop_flusher, flush_interval):
+    while not stop_flusher.wait(flush_interval):
+        if not flush_by_flusher(buffer_ref):
+            return
+
+
+def flush_by_flusher(buffer_ref):
+    # buffer is referenced only during flush, so thread ends when buffer is garbage collected
+    update_buffer = buffer_ref()
+    if update_buffer is None:
+        return False
+    try:
+        update_buffer.flush()
+    finally:
+        # flusher thread lives as long as the buffer, so database connections opened by
+        # meta-backends in it are closed instead of being kept between flushes
+        for connection in connections.all():
+            connection.close()
+    return True
+
+
+def close_buffers():
+    for update_buffer in list(_buffers):
+        update_buffer.close()
+
+
+atexit.register(close_buffers)
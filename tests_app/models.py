@@ -1,18 +1,25 @@
 # -*- coding: utf-8 -*-
 from proxy_storage.meta_backends.orm import (
     ProxyStorageModelBase,
+    HashedPathProxyStorageModelBase,
     ContentObjectFieldMixin,
     OriginalStorageNameMixin,
+    FileAttributesMixin,
 )
+from proxy_storage.cleanup import CleanupTaskModelBase
 
 
 class ProxyStorageModel(ProxyStorageModelBase):
     pass
 
 
+class HashedPathProxyStorageModel(HashedPathProxyStorageModelBase):
+    pass
+
+
 class ProxyStorageModelWithContentObjectField(ContentObjectFieldMixin, ProxyStorageModelBase):
 
-    class Meta:
+    class Meta(ContentObjectFieldMixin.Meta):
         verbose_name = 'Proxy storage with field'
 
 
@@ -25,4 +32,13 @@ class ProxyStorageModelWithOriginalStorageName(OriginalStorageNameMixin, ProxySt
 class ProxyStorageModelWithContentObjectFieldAndOriginalStorageName(OriginalStorageNameMixin,
                                                                     ProxyStorageModelBase):
     class Meta:
-        verbose_name = 'Proxy storage with field and orig'
\ No newline at end of file
+        verbose_name = 'Proxy storage with field and orig'
+
+
+class ProxyStorageModelWithFileAttributes(FileAttributesMixin, ProxyStorageModelBase):
+    class Meta:
+        verbose_name = 'Proxy storage with file attributes'
+
+
+class CleanupTask(CleanupTaskModelBase):
+    pass
@@ -61,12 +61,12 @@ class FlushMongo(AlwaysOnPlugin):
 
     def remove_all_test_databases(self):
         mongo_db = MongoClient('localhost', settings.MONGO_DATABASE_PORT)
-        for database_name in mongo_db.database_names():
+        for database_name in mongo_db.list_database_names():
             if database_name.startswith(settings.MONGO_TEST_DATABASE_PREFIX):
                 mongo_db.drop_database(database_name)
 
     def startTest(self, test):
         db = MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME]
-        for collection_name in db.collection_names():
+        for collection_name in db.list_collection_names():
             if collection_name != 'system.indexes':
-                getattr(db, collection_name).remove({})
\ No newline at end of file
+                getattr(db, collection_name).delete_many({})
\ No newline at end of file
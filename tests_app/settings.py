@@ -29,6 +29,12 @@ DATABASES = {
         'NAME': 'test.db',
         'TEST_CHARSET': 'utf8',
     },
+    # not a mirror of "default", so tests can tell which alias was queried
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'test_replica.db',
+        'TEST_CHARSET': 'utf8',
+    },
 }
 
 CACHES = {
@@ -107,6 +113,7 @@ INSTALLED_APPS = (
     # 'django.contrib.admindocs',
     'django_nose',
 
+    'proxy_storage',
     'tests_app',
 )
 
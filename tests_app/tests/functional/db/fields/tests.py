@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
+import django
+from mock import patch
 from pymongo import MongoClient
 
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.conf import settings
 
+from proxy_storage.db.fields import prefetch_meta_backend_objs
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
 from proxy_storage.meta_backends.orm import ORMMetaBackend
 from proxy_storage.meta_backends.mongo import MongoMetaBackend
 from proxy_storage.testutils import create_test_cases_for_proxy_storage
 from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.memory import MemoryStorage
+from proxy_storage.write_behind import WriteBehindBuffer
 
 
 from tests_app.models import (
@@ -17,6 +26,7 @@ from tests_app.models import (
 from .base_test_cases import (
     ProxyStorageFileFieldTestMixin
 )
+from .models import SurveyAnswer
 
 
 class ProxyStorageForResume(ProxyStorageBase):
@@ -43,4 +53,85 @@ locals().update(
         test_case_bases,
         meta_backend_instances
     )
-)
\ No newline at end of file
+)
+
+class PrefetchMetaBackendObjsTest(TestCase):
+    def setUp(self):
+        self.proxy_storage = ProxyStorageForResume()
+        self.proxy_storage.meta_backend = MemoryMetaBackend()
+        self.proxy_storage.original_storage = MemoryStorage()
+        if django.VERSION[0] == 1 and django.VERSION[1] >= 10:
+            self.field = SurveyAnswer._meta.get_field('resume')
+        else:
+            self.field = SurveyAnswer._meta.get_field_by_name('resume')[0]
+        self.field.storage = self.proxy_storage
+        user = User.objects.create(username='web-chib')
+        for i in range(3):
+            path = '/proxy/{0}.txt'.format(i)
+            self.proxy_storage.meta_backend.create({
+                'path': path,
+                'original_storage_path': path,
+                'size': i,
+                'url': '/url{0}'.format(path),
+            })
+            SurveyAnswer.objects.create(user=user, resume=path)
+        SurveyAnswer.objects.create(user=user)
+
+    def test_should_load_meta_backend_objs_by_one_query(self):
+        with patch.object(self.proxy_storage.meta_backend, 'get_many',
+                          wraps=self.proxy_storage.meta_backend.get_many) as get_many:
+            answers = prefetch_meta_backend_objs(SurveyAnswer.objects.order_by('id'))
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(answers), 4)
+        with patch.object(self.proxy_storage.meta_backend, 'get', side_effect=AssertionError) as get:
+            self.assertEqual([answer.resume.size for answer in answers[:3]], [0, 1, 2])
+            self.assertEqual(
+                [answer.resume.url for answer in answers[:3]],
+                ['/url/proxy/0.txt', '/url/proxy/1.txt', '/url/proxy/2.txt']
+            )
+        self.assertFalse(get.called)
+        self.assertEqual(answers[3].resume.prefetched_meta_backend_obj, None)
+
+    def test_should_query_meta_backend_if_file_was_replaced_after_prefetch(self):
+        answer = prefetch_meta_backend_objs(SurveyAnswer.objects.order_by('id')[:1])[0]
+        answer.resume = '/proxy/2.txt'
+        self.assertEqual(answer.resume.size, 2)
+
+
+class ContentObjectUpdateBufferTest(TransactionTestCase):
+    def setUp(self):
+        self.proxy_storage = ProxyStorageForResume()
+        self.proxy_storage.meta_backend = MemoryMetaBackend()
+        self.proxy_storage.original_storage = MemoryStorage()
+        self.proxy_storage.content_object_update_buffer = WriteBehindBuffer()
+        if django.VERSION[0] == 1 and django.VERSION[1] >= 10:
+            self.field = SurveyAnswer._meta.get_field('resume')
+        else:
+            self.field = SurveyAnswer._meta.get_field_by_name('resume')[0]
+        self.old_storage, self.field.storage = self.field.storage, self.proxy_storage
+        self.proxy_storage.meta_backend.create({'path': '/proxy/0.txt', 'original_storage_path': '/proxy/0.txt'})
+        self.user = User.objects.create(username='web-chib')
+
+    def tearDown(self):
+        self.field.storage = self.old_storage
+
+    def get_content_object(self):
+        meta_backend_obj = self.proxy_storage.meta_backend.get('/proxy/0.txt')
+        return meta_backend_obj.get('content_type_id'), meta_backend_obj.get('object_id')
+
+    def test_should_update_content_object_on_commit_of_model_save(self):
+        with transaction.atomic():
+            answer = SurveyAnswer.objects.create(user=self.user, resume='/proxy/0.txt')
+            self.assertEqual(self.get_content_object(), (None, None))
+        self.assertEqual(self.get_content_object(), (ContentType.objects.get_for_model(SurveyAnswer).id, answer.id))
+        self.assertEqual(self.proxy_storage.meta_backend.get('/proxy/0.txt')['field'], 'resume')
+
+    def test_should_not_update_content_object_if_model_save_was_rolled_back(self):
+        try:
+            with transaction.atomic():
+                SurveyAnswer.objects.create(user=self.user, resume='/proxy/0.txt')
+                raise ValueError
+        except ValueError:
+            pass
+        self.proxy_storage.content_object_update_buffer.close()
+        self.assertEqual(self.get_content_object(), (None, None))
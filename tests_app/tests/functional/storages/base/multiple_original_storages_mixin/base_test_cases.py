@@ -63,6 +63,17 @@ class TestDeleteMixin(TestDeleteMixinBase):
         self.assertFalse(self.proxy_storage.original_storages_dict['original_storage_1'].exists(self.file_name))
         self.assertTrue(self.proxy_storage.original_storages_dict['original_storage_2'].exists(self.file_name))
 
+    def test_delete_many_should_delete_files_from_proper_original_storages(self):
+        path_1 = self.proxy_storage.save('file_1.txt', self.content_file, using='original_storage_1')
+        path_2 = self.proxy_storage.save('file_2.txt', self.content_file, using='original_storage_2')
+
+        self.assertEqual(self.proxy_storage.delete_many([path_1, path_2]), {})
+
+        self.assertFalse(self.proxy_storage.exists(path_1))
+        self.assertFalse(self.proxy_storage.exists(path_2))
+        self.assertFalse(self.proxy_storage.original_storages_dict['original_storage_1'].exists('file_1.txt'))
+        self.assertFalse(self.proxy_storage.original_storages_dict['original_storage_2'].exists('file_2.txt'))
+
 
 class TestOpenMixin(TestOpenMixinBase):
     def test_should_open_file_from_proper_original_storage(self):
@@ -5,6 +5,8 @@ from django.utils.encoding import force_text
 from proxy_storage.settings import proxy_storage_settings
 import os.path
 
+from mock import patch, Mock
+
 
 class TestExistsMixin(object):
     def test_file_should_not_exists_by_default(self):
@@ -119,6 +121,49 @@ class TestDeleteMixin(object):
         else:
             self.fail('Should raise IOError if file not exists')
 
+    def test_delete_many(self):
+        names = [self.proxy_storage.save('file_{0}.txt'.format(i), ContentFile('content')) for i in range(5)]
+        errors = self.proxy_storage.delete_many(names[:4] + ['not_existing.txt'])
+
+        self.assertEqual(list(errors.keys()), ['not_existing.txt'])
+        self.assertEqual(str(errors['not_existing.txt']), 'File not found: not_existing.txt')
+        for name in names[:4]:
+            self.assertFalse(self.proxy_storage.exists(name))
+        self.assertTrue(self.proxy_storage.exists(names[4]))
+        self.assertTrue(self.proxy_storage.original_storage.exists('file_4.txt'))
+        self.assertFalse(self.proxy_storage.original_storage.exists('file_0.txt'))
+
+    def test_delete_many_should_delete_duplicated_names_once(self):
+        names = [self.proxy_storage.save('file_{0}.txt'.format(i), ContentFile('content')) for i in range(2)]
+        with patch.object(
+            self.proxy_storage.original_storage,
+            'delete',
+            Mock(side_effect=self.proxy_storage.original_storage.delete)
+        ) as delete_mock:
+            errors = self.proxy_storage.delete_many(names + names[:1])
+
+        self.assertEqual(dict(errors), {})
+        self.assertEqual(delete_mock.call_count, 2)
+        for name in names:
+            self.assertFalse(self.proxy_storage.exists(name))
+
+    def test_delete_many_should_keep_meta_backend_object_if_original_storage_failed_to_delete_file(self):
+        names = [self.proxy_storage.save('file_{0}.txt'.format(i), ContentFile('content')) for i in range(2)]
+        original_delete = self.proxy_storage.original_storage.delete
+        error = OSError('Permission denied')
+
+        def delete(name):
+            if name == 'file_1.txt':
+                raise error
+            return original_delete(name)
+
+        with patch.object(self.proxy_storage.original_storage, 'delete', Mock(side_effect=delete)):
+            errors = self.proxy_storage.delete_many(names)
+
+        self.assertEqual(dict(errors), {names[1]: error})
+        self.assertFalse(self.proxy_storage.exists(names[0]))
+        self.assertTrue(self.proxy_storage.exists(names[1]))
+
 
 class TestOpenMixin(object):
     def test_simple_open(self):
@@ -147,3 +192,86 @@ class TestOpenMixin(object):
             self.assertEqual(error_message, expected)
         else:
             self.fail('If trying to open path that not exists in proxy storage model, then should raise IOError')
+
+
+class TestListdirMixin(object):
+    def test_listdir(self):
+        for path in ['/files/a.txt', '/files/b.txt', '/files/docs/c.txt', '/files/docs/d.txt',
+                     '/files/images/e.png', '/files_other/f.txt', '/g.txt']:
+            self.proxy_storage.meta_backend.create(
+                data={
+                    'path': path,
+                    'original_storage_path': path.lstrip('/')
+                }
+            )
+        self.assertEqual(
+            self.proxy_storage.listdir('/files/'),
+            (['docs', 'images'], ['a.txt', 'b.txt'])
+        )
+        self.assertEqual(self.proxy_storage.listdir('files/docs'), ([], ['c.txt', 'd.txt']))
+        self.assertEqual(self.proxy_storage.listdir('/'), (['files', 'files_other'], ['g.txt']))
+        self.assertEqual(self.proxy_storage.listdir('/not/existing/'), ([], []))
+
+    def test_listdir_should_not_read_contents_of_subdirectories(self):
+        paths = ['/files/a.txt', '/files/z.txt', u'/files/docs/\uffff.txt', u'/files/docs/\U0001f600.txt'] + [
+            '/files/docs/{0}.txt'.format(i) for i in range(20)
+        ]
+        for path in paths:
+            self.proxy_storage.meta_backend.create(
+                data={
+                    'path': path,
+                    'original_storage_path': path.lstrip('/')
+                }
+            )
+        read_paths = []
+        iterate_paths = self.proxy_storage.meta_backend.iterate_paths
+
+        def iterate_paths_mock(*args, **kwargs):
+            for path in iterate_paths(*args, **kwargs):
+                read_paths.append(path)
+                yield path
+
+        with patch.object(self.proxy_storage.meta_backend, 'iterate_paths', iterate_paths_mock):
+            self.assertEqual(self.proxy_storage.listdir('/files/'), (['docs'], ['a.txt', 'z.txt']))
+        self.assertEqual(
+            read_paths,
+            ['/files/a.txt', '/files/docs/0.txt', u'/files/docs/\uffff.txt', u'/files/docs/\U0001f600.txt',
+             '/files/z.txt']
+        )
+
+
+class TestFileAttributesMixin(object):
+    def test_should_record_file_attributes_to_meta_backend(self):
+        saved_file_name = self.proxy_storage.save(self.file_name, self.content_file)
+        meta_backend_obj = self.proxy_storage.meta_backend.get(path=saved_file_name)
+
+        self.assertEqual(meta_backend_obj['size'], len(self.content))
+        self.assertIsNotNone(meta_backend_obj['created_time'])
+        self.assertIsNotNone(meta_backend_obj['modified_time'])
+        self.assertEqual(meta_backend_obj['url'], self.proxy_storage.original_storage.url(self.file_name))
+
+    def test_should_serve_file_attributes_without_original_storage(self):
+        saved_file_name = self.proxy_storage.save(self.file_name, self.content_file)
+        meta_backend_obj = self.proxy_storage.meta_backend.get(path=saved_file_name)
+        with patch.object(self.proxy_storage, 'original_storage', Mock(side_effect=Exception)):
+            self.assertEqual(self.proxy_storage.size(saved_file_name), len(self.content))
+            self.assertEqual(self.proxy_storage.url(saved_file_name), meta_backend_obj['url'])
+            self.assertEqual(self.proxy_storage.created_time(saved_file_name), meta_backend_obj['created_time'])
+            self.assertEqual(self.proxy_storage.modified_time(saved_file_name), meta_backend_obj['modified_time'])
+
+    def test_url_from_original_storage(self):
+        saved_file_name = self.proxy_storage.save(self.file_name, self.content_file)
+        self.proxy_storage.meta_backend.update(path=saved_file_name, update_data={'url': '/stale/url'})
+        with patch.object(self.proxy_storage, 'url_from_original_storage', True):
+            self.assertEqual(
+                self.proxy_storage.url(saved_file_name),
+                self.proxy_storage.original_storage.url(self.file_name)
+            )
+
+    def test_should_fallback_to_original_storage_if_attributes_were_not_recorded(self):
+        saved_file_name = self.proxy_storage.save(self.file_name, self.content_file)
+        self.proxy_storage.meta_backend.update(path=saved_file_name, update_data={'size': None})
+        self.assertEqual(self.proxy_storage.size(saved_file_name), len(self.content))
+
+    def test_not_existing_file(self):
+        self.assertRaises(IOError, self.proxy_storage.size, '/not/existing/file.txt')
@@ -10,22 +10,27 @@ from django.test import TestCase
 from django.conf import settings
 from django.core.files.base import ContentFile
 
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
 from proxy_storage.meta_backends.orm import ORMMetaBackend
 from proxy_storage.meta_backends.mongo import MongoMetaBackend
-from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.base import ProxyStorageBase, FileAttributesProxyStorageMixin
 from proxy_storage.testutils import create_test_cases_for_proxy_storage
 
 from tests_app.models import (
     ProxyStorageModel,
+    HashedPathProxyStorageModel,
     ProxyStorageModelWithContentObjectField,
     ProxyStorageModelWithOriginalStorageName,
-    ProxyStorageModelWithContentObjectFieldAndOriginalStorageName
+    ProxyStorageModelWithContentObjectFieldAndOriginalStorageName,
+    ProxyStorageModelWithFileAttributes,
 )
 from .base_test_cases import (
     TestExistsMixin,
     TestSaveMixin,
     TestDeleteMixin,
     TestOpenMixin,
+    TestListdirMixin,
+    TestFileAttributesMixin,
 )
 
 
@@ -33,6 +38,10 @@ class SimpleFileSystemProxyStorage(ProxyStorageBase):
     pass
 
 
+class FileAttributesFileSystemProxyStorage(FileAttributesProxyStorageMixin, ProxyStorageBase):
+    pass
+
+
 class PrepareMixin(object):
     def setUp(self):
         self.temp_dir = tempfile.mkdtemp()
@@ -41,6 +50,8 @@ class PrepareMixin(object):
         self.content_file = ContentFile(self.content)
         self.file_full_path = os.path.join(self.temp_dir, self.file_name)
         self.proxy_storage.original_storage = FileSystemStorage(location=self.temp_dir)
+        if isinstance(self.proxy_storage.meta_backend, MemoryMetaBackend):
+            self.proxy_storage.meta_backend.clear()
 
     def tearDown(self):
         shutil.rmtree(self.temp_dir)
@@ -50,18 +61,21 @@ test_case_bases = [
     (TestExistsMixin, PrepareMixin, TestCase),
     (TestSaveMixin, PrepareMixin, TestCase),
     (TestDeleteMixin, PrepareMixin, TestCase),
-    (TestOpenMixin, PrepareMixin, TestCase)
+    (TestOpenMixin, PrepareMixin, TestCase),
+    (TestListdirMixin, PrepareMixin, TestCase),
 ]
 
 meta_backend_instances = [
     ORMMetaBackend(model=ProxyStorageModel),
+    ORMMetaBackend(model=HashedPathProxyStorageModel),
     ORMMetaBackend(model=ProxyStorageModelWithContentObjectField),
     ORMMetaBackend(model=ProxyStorageModelWithOriginalStorageName),
     ORMMetaBackend(model=ProxyStorageModelWithContentObjectFieldAndOriginalStorageName),
     MongoMetaBackend(
         database=MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME],
         collection=settings.MONGO_META_BACKEND_COLLECTION_NAME
-    )
+    ),
+    MemoryMetaBackend(),
 ]
 
 
@@ -72,4 +86,20 @@ locals().update(
         test_case_bases,
         meta_backend_instances
     )
-)
\ No newline at end of file
+)
+
+# test proxy storage with file attributes
+locals().update(
+    create_test_cases_for_proxy_storage(
+        FileAttributesFileSystemProxyStorage,
+        [(TestFileAttributesMixin, PrepareMixin, TestCase)],
+        [
+            ORMMetaBackend(model=ProxyStorageModelWithFileAttributes),
+            MongoMetaBackend(
+                database=MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME],
+                collection=settings.MONGO_META_BACKEND_COLLECTION_NAME
+            ),
+            MemoryMetaBackend(),
+        ]
+    )
+)
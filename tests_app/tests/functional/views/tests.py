@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from proxy_storage.authorization import AllowAny, ContentObjectPolicy, IsStaff
+from proxy_storage.files import MmapFile
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.storages.base import (
+    ContentHashProxyStorageMixin,
+    MultipleOriginalStoragesMixin,
+    ProxyStorageBase,
+)
+from proxy_storage.storages.filesystem import MmapFileSystemStorage
+from proxy_storage.storages.memory import MemoryStorage
+from proxy_storage.testutils import override_proxy_storage_settings
+from proxy_storage.views import ServeView
+
+from tests_app.models import ProxyStorageModelWithContentObjectField
+
+
+class MemoryProxyStorage(ContentHashProxyStorageMixin, ProxyStorageBase):
+    original_storage = MemoryStorage()
+    meta_backend = MemoryMetaBackend()
+
+
+class MultipleMemoryProxyStorage(MultipleOriginalStoragesMixin, ProxyStorageBase):
+    original_storages = [
+        ('disk', MemoryStorage()),
+        ('remote', MemoryStorage()),
+    ]
+    meta_backend = MemoryMetaBackend()
+
+
+class OtherMemoryProxyStorage(ProxyStorageBase):
+    original_storage = MemoryStorage()
+    meta_backend = MemoryMetaBackend()
+
+
+class ORMProxyStorage(ProxyStorageBase):
+    original_storage = MemoryStorage()
+    meta_backend = ORMMetaBackend(model=ProxyStorageModelWithContentObjectField)
+
+
+class ServeViewTest(TestCase):
+    def setUp(self):
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'memory': MemoryProxyStorage, 'multiple': MultipleMemoryProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={MemoryProxyStorage: 'memory', MultipleMemoryProxyStorage: 'multiple'}
+        )
+        self.overrider.start()
+        cache.clear()
+        self.proxy_storage = MemoryProxyStorage()
+        self.proxy_storage.meta_backend.clear()
+        self.proxy_storage.original_storage.clear()
+        self.owner = User.objects.create(username='messi')
+        self.other = User.objects.create(username='ronaldo')
+        self.staff = User.objects.create(username='admin', is_staff=True)
+        self.content_type_id = ContentType.objects.get_for_model(User).id
+        self.resume_path = self.save('resume.txt', 'resume', 'resume')
+        self.avatar_path = self.save('avatar.jpg', 'avatar', 'avatar')
+        self.view = ServeView.as_view(
+            proxy_storage=self.proxy_storage,
+            authorization_policies={
+                ('auth.user', 'avatar'): AllowAny(),
+                ('auth.user', 'resume'): ContentObjectPolicy(
+                    lambda request, user: request.user.is_staff or request.user == user
+                ),
+            }
+        )
+
+    def tearDown(self):
+        self.overrider.stop()
+
+    def save(self, name, content, field, proxy_storage=None):
+        proxy_storage = proxy_storage or self.proxy_storage
+        path = proxy_storage.save(name, ContentFile(content))
+        proxy_storage.meta_backend.update(path, {
+            'content_type_id': self.content_type_id,
+            'object_id': self.owner.id,
+            'field': field,
+        })
+        return path
+
+    def request(self, path, user=None, view=None, **extra):
+        request = RequestFactory().get('/files/', {'path': path}, **extra)
+        request.user = user or AnonymousUser()
+        return (view or self.view)(request)
+
+    def test_should_stream_file_if_authorization_policy_allows_access(self):
+        response = self.request(self.resume_path, user=self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'resume')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(self.request(self.resume_path, user=self.staff).status_code, 200)
+        self.assertEqual(self.request(self.resume_path, user=self.other).status_code, 403)
+        self.assertEqual(self.request(self.avatar_path).status_code, 200)
+
+    def test_should_raise_404_for_missing_files_and_files_without_policy(self):
+        path = self.save('other.txt', 'other', 'other')
+        self.assertRaises(Http404, self.request, '/missing.txt')
+        self.assertRaises(Http404, self.request, path, user=self.staff)
+        self.assertRaises(Http404, self.request, '')
+
+    def test_model_policy_should_match_any_field(self):
+        view = ServeView.as_view(
+            proxy_storage=self.proxy_storage,
+            authorization_policies={('auth.user', None): IsStaff()}
+        )
+        self.assertEqual(self.request(self.resume_path, user=self.staff, view=view).status_code, 200)
+        self.assertEqual(self.request(self.avatar_path, user=self.owner, view=view).status_code, 403)
+
+    def test_should_make_one_projected_lookup(self):
+        meta_backend = self.proxy_storage.meta_backend
+        with patch.object(meta_backend, 'get', wraps=meta_backend.get) as get:
+            self.request(self.resume_path, user=self.owner)
+        get.assert_called_once_with(
+            path=self.resume_path,
+            fields=[
+                'original_storage_path',
+                'proxy_storage_name',
+                'content_type_id',
+                'object_id',
+                'field',
+                'content_hash',
+                'modified_time',
+                'size',
+            ]
+        )
+
+    def test_should_cache_resolution_of_public_files(self):
+        meta_backend = self.proxy_storage.meta_backend
+        self.request(self.avatar_path)
+        self.request(self.resume_path, user=self.owner)
+        with patch.object(meta_backend, 'get', wraps=meta_backend.get) as get:
+            self.assertEqual(self.request(self.avatar_path).status_code, 200)
+            self.assertEqual(self.request(self.resume_path, user=self.owner).status_code, 200)
+        self.assertEqual(get.call_count, 1)
+
+    def test_public_cache_should_be_namespaced_by_proxy_storage(self):
+        proxy_storage = OtherMemoryProxyStorage()
+        proxy_storage.meta_backend.clear()
+        proxy_storage.original_storage.clear()
+        with override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'memory': MemoryProxyStorage, 'other': OtherMemoryProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={MemoryProxyStorage: 'memory', OtherMemoryProxyStorage: 'other'}
+        ):
+            path = self.save('avatar.jpg', 'other avatar', 'avatar', proxy_storage=proxy_storage)
+            view = ServeView.as_view(
+                proxy_storage=proxy_storage,
+                authorization_policies={('auth.user', 'avatar'): AllowAny()}
+            )
+            self.assertEqual(path, self.avatar_path)
+            self.assertEqual(b''.join(self.request(path).streaming_content), b'avatar')
+            self.assertEqual(b''.join(self.request(path, view=view).streaming_content), b'other avatar')
+
+    def test_should_load_fields_of_proxy_storage_which_saved_the_file(self):
+        with patch.object(MultipleMemoryProxyStorage, 'meta_backend', self.proxy_storage.meta_backend):
+            proxy_storage = MultipleMemoryProxyStorage()
+            path = proxy_storage.save('remote.txt', ContentFile('remote'), using='remote')
+            proxy_storage.meta_backend.update(path, {
+                'content_type_id': self.content_type_id,
+                'object_id': self.owner.id,
+                'field': 'avatar',
+            })
+            response = self.request(path)
+        self.assertEqual(b''.join(response.streaming_content), b'remote')
+
+    def test_should_emit_sendfile_header_for_mapped_original_storages(self):
+        proxy_storage = MultipleMemoryProxyStorage()
+        path = self.save('my resume.txt', 'resume', 'avatar', proxy_storage=proxy_storage)
+        view = ServeView.as_view(
+            proxy_storage=proxy_storage,
+            authorization_policies={('auth.user', 'avatar'): AllowAny()},
+            sendfile_locations={'disk': '/protected/disk/'}
+        )
+        response = self.request(path, view=view)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/disk/my%20resume.txt')
+        self.assertEqual(response.content, b'')
+
+        view = ServeView.as_view(
+            proxy_storage=proxy_storage,
+            authorization_policies={('auth.user', 'avatar'): AllowAny()},
+            sendfile_header='X-Sendfile',
+            sendfile_locations={'disk': '/var/files'},
+            public_cache_timeout=0
+        )
+        self.assertEqual(self.request(path, view=view)['X-Sendfile'], '/var/files/my resume.txt')
+
+    def test_should_answer_conditional_requests_from_meta_backend(self):
+        response = self.request(self.avatar_path)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        self.assertEqual(etag, '"{0}"'.format(hashlib.sha1(b'avatar').hexdigest()))
+        with patch.object(self.proxy_storage.original_storage, 'open', side_effect=AssertionError):
+            response = self.request(self.avatar_path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            response = self.request(self.avatar_path, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.request(self.avatar_path, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.request(self.resume_path, user=self.other, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_should_answer_range_requests_with_partial_content(self):
+        path = self.save('digits.txt', '0123456789', 'avatar')
+        response = self.request(path, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        # ranges are never passed to wsgi.file_wrapper
+        self.assertEqual(response.file_to_stream, None)
+        response = self.request(path, HTTP_RANGE='bytes=-3', HTTP_IF_RANGE=self.request(path)['ETag'])
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_should_ignore_stale_and_multiple_ranges(self):
+        path = self.save('digits.txt', '0123456789', 'avatar')
+        for extra in [{'HTTP_RANGE': 'bytes=0-1,4-5'}, {'HTTP_RANGE': 'bytes=0-1', 'HTTP_IF_RANGE': '"stale"'}]:
+            response = self.request(path, **extra)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+            self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_should_answer_unsatisfiable_range_with_416(self):
+        path = self.save('digits.txt', '0123456789', 'avatar')
+        response = self.request(path, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_should_stream_mmap_files_for_sendfile(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with patch.object(MemoryProxyStorage, 'original_storage', MmapFileSystemStorage(location=location)):
+            path = self.save('digits.txt', '0123456789', 'avatar')
+            response = self.request(path)
+            self.assertIsInstance(response.file_to_stream, MmapFile)
+            self.assertEqual(response['Content-Length'], '10')
+            self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+            response.close()
+            self.assertEqual(b''.join(self.serve_with_file_wrapper(self.request(path))), b'0123456789')
+            response = self.request(path, HTTP_RANGE='bytes=2-5')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.file_to_stream, None)
+            self.assertEqual(response['Content-Length'], '4')
+            self.assertEqual(b''.join(self.serve_with_file_wrapper(response)), b'2345')
+
+    def serve_with_file_wrapper(self, response):
+        """
+        Serves response like WSGIHandler with `wsgi.file_wrapper` which sends file from offset 0
+        till the end ignoring descriptor position (uwsgi).
+        """
+        try:
+            if response.file_to_stream is None:
+                return list(response)
+            fileno = response.file_to_stream.fileno()
+            os.lseek(fileno, 0, os.SEEK_SET)
+            return list(iter(lambda: os.read(fileno, 3), b''))
+        finally:
+            response.close()
+
+
+class ORMServeViewTest(TestCase):
+    def setUp(self):
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'orm': ORMProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={ORMProxyStorage: 'orm'}
+        )
+        self.overrider.start()
+        self.proxy_storage = ORMProxyStorage()
+        self.proxy_storage.original_storage.clear()
+        self.owner = User.objects.create(username='messi')
+
+    def tearDown(self):
+        self.overrider.stop()
+
+    def test_should_serve_files_of_model_without_optional_fields(self):
+        path = self.proxy_storage.save('resume.txt', ContentFile('resume'))
+        self.proxy_storage.meta_backend.update(path, {
+            'content_type_id': ContentType.objects.get_for_model(User).id,
+            'object_id': self.owner.id,
+            'field': 'resume',
+        })
+        view = ServeView.as_view(
+            proxy_storage=self.proxy_storage,
+            authorization_policies={('auth.user', 'resume'): AllowAny()}
+        )
+        request = RequestFactory().get('/files/', {'path': path})
+        request.user = AnonymousUser()
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'resume')
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from proxy_storage.bloom import BloomFilter
+
+
+class BloomFilterTest(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, 'paths.bloom')
+        self.paths = ['/files/{0}.txt'.format(i) for i in range(1000)]
+        self.bloom_filter = BloomFilter.for_capacity(capacity=len(self.paths), error_rate=0.01)
+        for path in self.paths:
+            self.bloom_filter.add(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_should_contain_every_added_path(self):
+        for path in self.paths:
+            self.assertIn(path, self.bloom_filter)
+
+    def test_false_positive_rate_should_be_close_to_requested(self):
+        false_positives = len([
+            i for i in range(10000) if '/missing/{0}.txt'.format(i) in self.bloom_filter
+        ])
+        self.assertLess(false_positives, 300)
+
+    def test_save_and_load(self):
+        self.bloom_filter.save(self.file_path)
+        loaded = BloomFilter.load(self.file_path)
+        self.assertEqual(loaded.bits_count, self.bloom_filter.bits_count)
+        self.assertEqual(loaded.hashes_count, self.bloom_filter.hashes_count)
+        for path in self.paths:
+            self.assertIn(path, loaded)
+        for i in range(100):
+            path = '/missing/{0}.txt'.format(i)
+            self.assertEqual(path in loaded, path in self.bloom_filter)
+
+    def test_save_should_not_leave_temporary_files(self):
+        self.bloom_filter.save(self.file_path)
+        self.bloom_filter.save(self.file_path)
+        self.assertEqual(os.listdir(self.temp_dir), ['paths.bloom'])
+
+    def test_load_should_raise_error_for_not_bloom_filter_file(self):
+        with open(self.file_path, 'wb') as f:
+            f.write(b'hello world, this is not a bloom filter')
+        self.assertRaises(ValueError, BloomFilter.load, self.file_path)
+
+    def test_save_and_load_should_keep_capacity_and_count(self):
+        self.bloom_filter.save(self.file_path)
+        loaded = BloomFilter.load(self.file_path)
+        self.assertEqual(loaded.capacity, len(self.paths))
+        self.assertEqual(loaded.count, len(self.paths))
+        self.assertFalse(loaded.is_over_capacity)
+
+    def test_should_be_over_capacity_after_adding_more_keys_than_capacity(self):
+        self.assertFalse(self.bloom_filter.is_over_capacity)
+        self.bloom_filter.add('/files/one_more.txt')
+        self.assertTrue(self.bloom_filter.is_over_capacity)
+
+    def test_close_should_release_loaded_filter(self):
+        self.bloom_filter.save(self.file_path)
+        loaded = BloomFilter.load(self.file_path)
+        loaded.close()
+        self.assertRaises(ValueError, lambda: self.paths[0] in loaded)
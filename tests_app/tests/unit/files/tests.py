@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from proxy_storage.compat import six
+from proxy_storage.files import MmapFile, RangeFile
+
+
+class NotSeekableFile(object):
+    def __init__(self, content):
+        self.stream = io.BytesIO(content)
+        self.read = self.stream.read
+
+    def seek(self, offset, whence=0):
+        raise io.UnsupportedOperation
+
+
+class RangeFileTest(TestCase):
+    def test_should_read_only_range(self):
+        for file in [io.BytesIO(b'0123456789'), NotSeekableFile(b'0123456789')]:
+            range_file = RangeFile(file, offset=2, length=5)
+            self.assertEqual(range_file.size, 5)
+            self.assertEqual(range_file.read(2), b'23')
+            self.assertEqual(b''.join(range_file.chunks(chunk_size=2)), b'456')
+            self.assertEqual(range_file.read(), b'')
+
+    def test_without_length_should_read_till_the_end(self):
+        range_file = RangeFile(io.BytesIO(b'0123456789'), offset=7)
+        self.assertEqual(range_file.read(), b'789')
+
+
+class MmapFileTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, content, **kwargs):
+        path = os.path.join(self.directory, 'file')
+        with open(path, 'wb') as f:
+            f.write(content)
+        mmap_file = MmapFile(open(path, 'rb'), **kwargs)
+        self.addCleanup(mmap_file.close)
+        return mmap_file
+
+    def get_descriptor_position(self, mmap_file):
+        return os.lseek(mmap_file.fileno(), 0, os.SEEK_CUR)
+
+    def test_should_read_only_range(self):
+        mmap_file = self.open(b'0123456789', offset=2, length=5)
+        self.assertEqual(mmap_file.size, 5)
+        self.assertEqual(mmap_file.read(2), b'23')
+        self.assertEqual(mmap_file.tell(), 2)
+        self.assertEqual(mmap_file.read(), b'456')
+        self.assertEqual(mmap_file.read(), b'')
+
+    def test_should_keep_descriptor_at_reading_position_for_sendfile(self):
+        mmap_file = self.open(b'0123456789', offset=2)
+        self.assertEqual(self.get_descriptor_position(mmap_file), 2)
+        mmap_file.read(3)
+        self.assertEqual(self.get_descriptor_position(mmap_file), 5)
+        mmap_file.seek(-1, os.SEEK_END)
+        self.assertEqual(self.get_descriptor_position(mmap_file), 9)
+
+    def test_memoryview_and_chunks_should_be_slices_of_mapping(self):
+        mmap_file = self.open(b'0123456789', offset=2, length=5)
+        # mmap doesn't support new buffer protocol in python 2
+        view_type = buffer if six.PY2 else memoryview  # noqa
+        view = mmap_file.memoryview(1, 2)
+        self.assertIsInstance(view, view_type)
+        self.assertEqual(bytes(view), b'34')
+        chunks = list(mmap_file.chunks(chunk_size=2))
+        self.assertTrue(all(isinstance(chunk, view_type) for chunk in chunks))
+        self.assertEqual([bytes(chunk) for chunk in chunks], [b'23', b'45', b'6'])
+        # mapping is closed when referenced slices are released
+        mmap_file.close()
+        self.assertEqual(bytes(view), b'34')
+
+    def test_should_iterate_lines_of_range(self):
+        mmap_file = self.open(b'first\nsecond\nthird', offset=6)
+        self.assertEqual(list(mmap_file), [b'second\n', b'third'])
+
+    def test_empty_file(self):
+        mmap_file = self.open(b'')
+        self.assertEqual(mmap_file.size, 0)
+        self.assertEqual(mmap_file.read(), b'')
+        self.assertEqual(list(mmap_file.chunks()), [])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from mock import patch
+
+from django.test import TestCase
+
+from proxy_storage.meta_backends.base import (
+    MetaBackendObject,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+
+
+class MemoryMetaBackendTest(TestCase):
+    def setUp(self):
+        self.meta_backend = MemoryMetaBackend(indexes=[('content_type_id', 'object_id'), 'original_storage_path'])
+
+    def create(self, path, **data):
+        data.setdefault('original_storage_path', path.lstrip('/'))
+        return self.meta_backend.create(dict(data, path=path))
+
+    def test_create_and_get(self):
+        data = {'path': '/hello.txt', 'original_storage_path': 'hello.txt'}
+        self.meta_backend.create(data)
+        data['original_storage_path'] = 'changed.txt'
+        response = self.meta_backend.get('/hello.txt')
+        self.assertIsInstance(response, MetaBackendObject)
+        self.assertEqual(response, {'path': '/hello.txt', 'original_storage_path': 'hello.txt'})
+        self.assertEqual(self.meta_backend.get('/hello.txt', fields=['size']), {'path': '/hello.txt'})
+        self.assertRaises(MetaBackendObjectDoesNotExist, self.meta_backend.get, '/missing.txt')
+
+    def test_create__should_raise_error_if_path_is_not_unique(self):
+        self.create('/hello.txt')
+        self.assertRaises(MetaBackendObjectAlreadyExists, self.create, '/hello.txt')
+
+    def test_update_delete_and_iterate(self):
+        for path in ['/b/1', '/a/2', '/a/1', '/ab/1']:
+            self.create(path)
+        self.meta_backend.update('/b/1', {'path': '/a/3'})
+        self.assertRaises(MetaBackendObjectAlreadyExists, self.meta_backend.update, '/a/3', {'path': '/a/1'})
+        self.meta_backend.delete_many(['/a/2', '/missing'])
+        self.assertEqual(list(self.meta_backend.iterate_paths(prefix='/a/', batch_size=1)), ['/a/1', '/a/3'])
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/a/1', '/a/3', '/ab/1'])
+        self.assertEqual(self.meta_backend.count(), 3)
+        self.assertEqual(list(self.meta_backend.iterate_paths(start_after='/a/1')), ['/a/3', '/ab/1'])
+        self.assertEqual(list(self.meta_backend.iterate_paths(prefix='/a/', start_after='/')), ['/a/1', '/a/3'])
+        self.assertEqual(self.meta_backend.exists_many(['/a/1', '/b/1']), set(['/a/1']))
+
+    def test_filter(self):
+        self.create('/a', content_type_id=1, object_id=2)
+        self.create('/b', content_type_id=1, object_id=2)
+        self.create('/c', content_type_id=1, object_id=3)
+        self.meta_backend.update('/b', {'object_id': 3})
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.filter(object_id=3, content_type_id=1)],
+            ['/b', '/c']
+        )
+        self.assertEqual([obj['path'] for obj in self.meta_backend.filter(original_storage_path='a')], ['/a'])
+        self.assertEqual([obj['path'] for obj in self.meta_backend.filter(object_id=2)], ['/a'])
+
+    def test_filter_by_content_objects(self):
+        self.create('/c', content_type_id=1, object_id=2, field='resume')
+        self.create('/a', content_type_id=1, object_id=2, field='photo')
+        self.create('/b', content_type_id=1, object_id=3, field='resume')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.filter_by_content_object(1, 2, field='resume')],
+            ['/c']
+        )
+        result = self.meta_backend.filter_by_content_objects([(1, 2), (1, 3)], fields=['path'])
+        self.assertEqual([obj['path'] for obj in result[(1, 2)]], ['/a', '/c'])
+        self.assertEqual(result[(1, 3)], [{'path': '/b', 'content_type_id': 1, 'object_id': 3, 'field': 'resume'}])
+
+    def test_iterate_by_original_storage_path(self):
+        self.create('/1', original_storage_path='b.txt', proxy_storage_name='one')
+        self.create('/2', original_storage_path='a.txt', proxy_storage_name='one')
+        self.create('/3', original_storage_path='a', proxy_storage_name='two')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path()],
+            ['/3', '/2', '/1']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(
+                filters={'proxy_storage_name': 'one'}
+            )],
+            ['/2', '/1']
+        )
+
+    def test_concurrent_creates_of_the_same_path_should_succeed_once(self):
+        results = []
+
+        def create():
+            try:
+                self.create('/hello.txt')
+                results.append(True)
+            except MetaBackendObjectAlreadyExists:
+                results.append(False)
+
+        threads = [threading.Thread(target=create) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [False] * 9 + [True])
+
+    def test_latency(self):
+        meta_backend = MemoryMetaBackend(latency=0.01)
+        with patch('proxy_storage.meta_backends.memory.time.sleep') as sleep:
+            meta_backend.exists('/hello.txt')
+        sleep.assert_called_once_with(0.01)
@@ -6,8 +6,9 @@ from proxy_storage.meta_backends.base import MetaBackendObject, MetaBackendObjec
 from proxy_storage.meta_backends.mongo import MongoMetaBackend
 from proxy_storage.testutils import override_proxy_storage_settings
 
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+from pymongo import MongoClient, ReadPreference
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.write_concern import WriteConcern
 
 
 class ORMMetaBackendTest(TestCase):
@@ -24,7 +25,7 @@ class ORMMetaBackendTest(TestCase):
             'another_attr': 'another attr value',
         }
         self.orm_meta_backend_instance.create(data=data)
-        self.assertEqual(self.orm_meta_backend_instance.get_collection().find().count(), 1)
+        self.assertEqual(self.orm_meta_backend_instance.get_collection().count_documents({}), 1)
         obj = self.orm_meta_backend_instance.get_collection().find_one()
         self.assertEqual(obj['path'], data['path'])
         self.assertEqual(obj['some_attr'], data['some_attr'])
@@ -92,24 +93,94 @@ class ORMMetaBackendTest(TestCase):
         self.assertEqual(meta_backend_object['another_attr'], update_data['another_attr'])
 
     def test_delete__should_delete_document_with_exact_path(self):
-        self.orm_meta_backend_instance.get_collection().insert({'path': '/file/one'})
-        self.orm_meta_backend_instance.get_collection().insert({'path': '/file/two'})
-        self.assertEqual(self.orm_meta_backend_instance.get_collection().find().count(), 2)
+        self.orm_meta_backend_instance.get_collection().insert_one({'path': '/file/one'})
+        self.orm_meta_backend_instance.get_collection().insert_one({'path': '/file/two'})
+        self.assertEqual(self.orm_meta_backend_instance.get_collection().count_documents({}), 2)
         self.orm_meta_backend_instance.delete(path='/file/one')
-        self.assertEqual(self.orm_meta_backend_instance.get_collection().find().count(), 1)
+        self.assertEqual(self.orm_meta_backend_instance.get_collection().count_documents({}), 1)
         obj = self.orm_meta_backend_instance.get_collection().find_one()
         self.assertEqual(obj['path'], '/file/two')
 
     def test_exists__should_return_true__if_object_with_exact_path_exists(self):
         path = '/file/one'
-        self.orm_meta_backend_instance.get_collection().insert({'path': path})
+        self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
         self.assertTrue(self.orm_meta_backend_instance.exists(path))
 
     def test_exists__should_return_false__if_object_with_exact_path_does_not_exist(self):
         path = '/file/one'
-        self.orm_meta_backend_instance.get_collection().insert({'path': path})
+        self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
         self.assertFalse(self.orm_meta_backend_instance.exists('/file/two'))
 
+    def test_get_many__should_return_existing_documents_by_path(self):
+        for path in ['/a', '/b', '/c']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        response = self.orm_meta_backend_instance.get_many(paths=['/a', '/c', '/missing'], batch_size=2)
+        self.assertEqual(sorted(response.keys()), ['/a', '/c'])
+        self.assertIsInstance(response['/a'], MetaBackendObject)
+
+    def test_get_and_get_many__with_fields(self):
+        for path in ['/file/one', '/file/two']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path, 'some_attr': path, 'other': 1})
+        self.assertEqual(
+            self.orm_meta_backend_instance.get('/file/one', fields=['some_attr']),
+            {'path': '/file/one', 'some_attr': '/file/one'}
+        )
+        response = self.orm_meta_backend_instance.get_many(['/file/one', '/file/two'], fields=['_id'])
+        self.assertEqual(set(response['/file/two'].keys()), set(['_id', 'path']))
+
+    def test_delete_many__should_delete_documents_with_exact_paths(self):
+        for path in ['/a', '/b', '/c', '/d']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        self.orm_meta_backend_instance.delete_many(paths=['/a', '/c', '/d'], batch_size=2)
+        self.assertEqual([obj['path'] for obj in self.orm_meta_backend_instance.get_collection().find()], ['/b'])
+
+    def test_iterate__should_return_all_documents_ordered_by_path(self):
+        paths = ['/b/{0}'.format(i) for i in range(5)] + ['/a/{0}'.format(i) for i in range(5)]
+        for path in paths:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        response = list(self.orm_meta_backend_instance.iterate(batch_size=3))
+        for meta_backend_object in response:
+            self.assertIsInstance(meta_backend_object, MetaBackendObject)
+        self.assertEqual([obj['path'] for obj in response], sorted(paths))
+
+    def test_iterate__with_prefix(self):
+        for path in ['/a/1', '/a/2', '/ab/1', '/b/1', '/a.b/1']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        response = self.orm_meta_backend_instance.iterate(prefix='/a/', batch_size=1)
+        self.assertEqual([obj['path'] for obj in response], ['/a/1', '/a/2'])
+        response = self.orm_meta_backend_instance.iterate(prefix='/a.b/', batch_size=1)
+        self.assertEqual([obj['path'] for obj in response], ['/a.b/1'])
+
+    def test_iterate__with_fields(self):
+        for path in ['/2', '/1']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path, 'some_attr': path, 'other': 1})
+        self.assertEqual(list(self.orm_meta_backend_instance.iterate(fields=['some_attr'])), [
+            {'path': '/1', 'some_attr': '/1'},
+            {'path': '/2', 'some_attr': '/2'},
+        ])
+
+    def test_iterate_paths(self):
+        for path in ['/b', '/a', '/c']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        self.assertEqual(list(self.orm_meta_backend_instance.iterate_paths(batch_size=2)), ['/a', '/b', '/c'])
+        self.assertEqual(self.orm_meta_backend_instance.count(), 3)
+
+    def test_iterate_by_original_storage_path(self):
+        for path, original_storage_path, proxy_storage_name in [('/1', 'b', 'one'), ('/2', 'a', 'one'),
+                                                                  ('/3', 'c', 'one'), ('/4', 'a', 'two')]:
+            self.orm_meta_backend_instance.get_collection().insert_one({
+                'path': path,
+                'original_storage_path': original_storage_path,
+                'proxy_storage_name': proxy_storage_name
+            })
+        response = self.orm_meta_backend_instance.iterate_by_original_storage_path(
+            filters={'proxy_storage_name': 'one'},
+            batch_size=1
+        )
+        self.assertEqual([obj['path'] for obj in response], ['/2', '/1', '/3'])
+        indexes = self.orm_meta_backend_instance.get_collection().index_information().values()
+        self.assertIn([('original_storage_path', 1), ('_id', 1)], [list(index['key']) for index in indexes])
+
     def test_should_raise_error_if_path_is_not_unique(self):
         path = '/file/one'
         self.orm_meta_backend_instance.create({'path': path})
@@ -120,6 +191,44 @@ class ORMMetaBackendTest(TestCase):
         else:
             self.fail('Should raise exception when trying to create document with not unique path')
 
+    def test_create__should_not_modify_passed_data(self):
+        data = {'path': '/file/one'}
+        self.orm_meta_backend_instance.create(data=data)
+        self.assertEqual(data, {'path': '/file/one'})
+
+    def test_create_many__should_create_documents(self):
+        response = self.orm_meta_backend_instance.create_many(
+            [{'path': '/file/one'}, {'path': '/file/two'}, {'path': '/file/three'}],
+            batch_size=2
+        )
+        self.assertEqual([obj['path'] for obj in response], ['/file/one', '/file/two', '/file/three'])
+        self.assertTrue(all('_id' in obj for obj in response))
+        self.assertEqual(self.orm_meta_backend_instance.get_collection().count_documents({}), 3)
+
+    def test_create_many__should_create_other_documents_of_batch_if_path_is_not_unique(self):
+        self.orm_meta_backend_instance.create({'path': '/file/two'})
+        self.assertRaises(
+            BulkWriteError,
+            self.orm_meta_backend_instance.create_many,
+            [{'path': '/file/one'}, {'path': '/file/two'}, {'path': '/file/three'}]
+        )
+        self.assertEqual(
+            sorted(self.orm_meta_backend_instance.iterate_paths()),
+            ['/file/one', '/file/three', '/file/two']
+        )
+
+    def test_update_many__should_update_documents_by_path(self):
+        for path in ['/file/one', '/file/two', '/file/three']:
+            self.orm_meta_backend_instance.get_collection().insert_one({'path': path})
+        self.orm_meta_backend_instance.update_many({
+            '/file/one': {'some_attr': 1},
+            '/file/three': {'some_attr': 3},
+        }, batch_size=1)
+        self.assertEqual(
+            dict((obj['path'], obj.get('some_attr')) for obj in self.orm_meta_backend_instance.iterate()),
+            {'/file/one': 1, '/file/two': None, '/file/three': 3}
+        )
+
     def test_allow_database_attribute_to_be_callable(self):
         database = MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME]
         orm_meta_backend_instance = MongoMetaBackend(
@@ -131,4 +240,50 @@ class ORMMetaBackendTest(TestCase):
         except AttributeError:
             self.fail('"database" attribute of MongoMetaBackend should be allowed to be callable')
         self.assertEqual(collection.database, database)
-        self.assertEqual(collection.name, settings.MONGO_META_BACKEND_COLLECTION_NAME)
\ No newline at end of file
+        self.assertEqual(collection.name, settings.MONGO_META_BACKEND_COLLECTION_NAME)
+
+    def test_write_concerns_and_read_preferences_by_operation(self):
+        meta_backend = MongoMetaBackend(
+            database=MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME],
+            collection=settings.MONGO_META_BACKEND_COLLECTION_NAME,
+            write_concerns={
+                'create': {'w': 'majority'},
+                'update': WriteConcern(w=1),
+            },
+            read_preferences={
+                'get': ReadPreference.SECONDARY_PREFERRED,
+            }
+        )
+        self.assertEqual(meta_backend.get_collection('create').write_concern, WriteConcern(w='majority'))
+        self.assertEqual(meta_backend.get_collection('update').write_concern, WriteConcern(w=1))
+        self.assertEqual(meta_backend.get_collection('get').read_preference, ReadPreference.SECONDARY_PREFERRED)
+        self.assertEqual(meta_backend.get_collection('exists').read_preference, ReadPreference.PRIMARY)
+        self.assertEqual(meta_backend.get_collection('delete').write_concern, WriteConcern())
+
+        meta_backend.create({'path': '/file.txt'})
+        meta_backend.update('/file.txt', {'some_attr': 'value'})
+        self.assertEqual(meta_backend.get('/file.txt')['some_attr'], 'value')
+
+    def test_filter_by_content_object__should_use_compound_index(self):
+        for path, object_id, field in [('/c', 1, 'title'), ('/a', 1, 'cover'), ('/b', 2, 'title')]:
+            self.orm_meta_backend_instance.create({
+                'path': path,
+                'content_type_id': 7,
+                'object_id': object_id,
+                'field': field,
+            })
+        index_keys = [
+            index['key'] for index in self.orm_meta_backend_instance.get_collection().index_information().values()
+        ]
+        self.assertIn([('content_type_id', 1), ('object_id', 1), ('field', 1)], index_keys)
+        self.assertEqual(
+            [obj['path'] for obj in self.orm_meta_backend_instance.filter_by_content_object(7, 1)],
+            ['/a', '/c']
+        )
+        self.assertEqual(
+            self.orm_meta_backend_instance.filter_by_content_object(7, 1, field='title', fields=['path']),
+            [{'path': '/c', 'content_type_id': 7, 'object_id': 1, 'field': 'title'}]
+        )
+        result = self.orm_meta_backend_instance.filter_by_content_objects([(7, 2), (7, 3)])
+        self.assertEqual([obj['path'] for obj in result[(7, 2)]], ['/b'])
+        self.assertEqual(result[(7, 3)], [])
@@ -3,6 +3,7 @@ from django.db import models
 
 from proxy_storage.meta_backends.orm import (
     ProxyStorageModelBase,
+    HashedPathProxyStorageModelBase,
     ContentObjectFieldMixin,
     OriginalStorageNameMixin
 )
@@ -34,7 +35,7 @@ class UnitMetaBackendsOrmBook(models.Model):
 
 class UnitMetaBackendsOrmProxyStorageWithContentObjectFieldModel(ContentObjectFieldMixin, ProxyStorageModelBase):
 
-    class Meta:
+    class Meta(ContentObjectFieldMixin.Meta):
         app_label = 'tests_app'
         verbose_name = 'Proxy storage with field'
 
@@ -43,4 +44,11 @@ class UnitMetaBackendsOrmProxyStorageWithOriginalStorageNameModel(OriginalStorag
 
     class Meta:
         app_label = 'tests_app'
-        verbose_name = 'proxy storage with orig'
\ No newline at end of file
+        verbose_name = 'proxy storage with orig'
+
+
+class UnitMetaBackendsOrmHashedPathProxyStorageModel(HashedPathProxyStorageModelBase):
+
+    class Meta:
+        app_label = 'tests_app'
+        verbose_name = 'hashed path proxy storage model'
@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
 import re
 
+from mock import Mock, patch
+
+from django.core.cache import caches
 from django.test import TestCase
-from django.db import IntegrityError
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, IntegrityError
 from django.contrib.contenttypes.models import ContentType
 
 from proxy_storage.meta_backends.base import MetaBackendObject, MetaBackendObjectDoesNotExist
-from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage import request_cache, utils
+from proxy_storage.meta_backends.orm import (
+    AddOriginalStoragePathIndex,
+    AddPathIndex,
+    ORMMetaBackend,
+    PathIntegrityError,
+    fill_path_hashes,
+    get_original_storage_path_index_sql,
+)
 from proxy_storage.testutils import override_proxy_storage_settings
 
 from .models import (
@@ -15,6 +27,7 @@ from .models import (
     UnitMetaBackendsOrmBook as Book,
     UnitMetaBackendsOrmProxyStorageWithContentObjectFieldModel as ProxyStorageWithContentObjectFieldModel,
     UnitMetaBackendsOrmProxyStorageWithOriginalStorageNameModel as ProxyStorageWithOriginalStorageNameModel,
+    UnitMetaBackendsOrmHashedPathProxyStorageModel as HashedPathProxyStorageModel,
 )
 
 
@@ -49,6 +62,22 @@ class ORMMetaBackendTest(TestCase):
         self.assertEqual(model_obj.some_attr, meta_backend_object.get('some_attr'))
         self.assertEqual(model_obj.another_attr, meta_backend_object.get('another_attr'))
 
+    def test_create__should_raise_unique_violation_if_path_is_taken(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        data = {'path': '/hello/world.txt', 'proxy_storage_name': 'a', 'original_storage_path': 'world.txt'}
+        meta_backend.create(data=data)
+        with self.assertRaises(meta_backend.get_unique_violation_exceptions()) as context:
+            meta_backend.create(data=data)
+        self.assertIsInstance(context.exception, PathIntegrityError)
+        self.assertIsInstance(context.exception, IntegrityError)
+
+    def test_create__should_not_treat_other_integrity_errors_as_unique_violation(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        data = {'path': '/hello/world.txt', 'proxy_storage_name': None, 'original_storage_path': 'world.txt'}
+        with self.assertRaises(IntegrityError) as context:
+            meta_backend.create(data=data)
+        self.assertNotIsInstance(context.exception, meta_backend.get_unique_violation_exceptions())
+
     def test_get__should_return_meta_backend_object(self):
         data = {
             'path': '/hello/world.txt',
@@ -115,6 +144,325 @@ class ORMMetaBackendTest(TestCase):
         self.orm_meta_backend_instance.model.objects.create(path=path)
         self.assertFalse(self.orm_meta_backend_instance.exists('/file/two'))
 
+    def test_get_many__should_return_existing_objects_by_path(self):
+        for path in ['/a', '/b', '/c']:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        with self.assertNumQueries(2):
+            response = self.orm_meta_backend_instance.get_many(paths=['/a', '/c', '/missing'], batch_size=2)
+        self.assertEqual(sorted(response.keys()), ['/a', '/c'])
+        self.assertIsInstance(response['/a'], MetaBackendObject)
+        self.assertEqual(response['/c']['path'], '/c')
+
+    def test_get__with_fields_should_return_only_those_fields_and_path(self):
+        self.orm_meta_backend_instance.model.objects.create(path='/a', some_attr='some', another_attr='another')
+        response = self.orm_meta_backend_instance.get('/a', fields=['some_attr'])
+        self.assertIsInstance(response, MetaBackendObject)
+        self.assertEqual(response, {'path': '/a', 'some_attr': 'some'})
+
+    def test_get__projected_and_whole_objects_should_be_memoized_separately(self):
+        self.orm_meta_backend_instance.model.objects.create(path='/a', some_attr='some', another_attr='another')
+        with request_cache.scope():
+            with self.assertNumQueries(2):
+                self.orm_meta_backend_instance.get('/a', fields=['some_attr'])
+                self.orm_meta_backend_instance.get('/a', fields=['some_attr', 'path'])
+                response = self.orm_meta_backend_instance.get('/a')
+        self.assertEqual(response['another_attr'], 'another')
+
+    def test_get_many__with_fields(self):
+        for path in ['/a', '/b']:
+            self.orm_meta_backend_instance.model.objects.create(path=path, some_attr=path, another_attr=path)
+        response = self.orm_meta_backend_instance.get_many(paths=['/a', '/b'], fields=['another_attr'])
+        self.assertEqual(response, {
+            '/a': {'path': '/a', 'another_attr': '/a'},
+            '/b': {'path': '/b', 'another_attr': '/b'},
+        })
+
+    def test_delete_many__should_delete_objects_in_batches(self):
+        for path in ['/a', '/b', '/c', '/d']:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        self.orm_meta_backend_instance.delete_many(paths=['/a', '/c', '/d'], batch_size=2)
+        self.assertEqual(list(self.orm_meta_backend_instance.model.objects.values_list('path', flat=True)), ['/b'])
+
+    def test_iterate__should_return_all_objects_ordered_by_path(self):
+        paths = ['/b/{0}'.format(i) for i in range(5)] + ['/a/{0}'.format(i) for i in range(5)]
+        for path in paths:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        response = list(self.orm_meta_backend_instance.iterate(batch_size=3))
+        for meta_backend_object in response:
+            self.assertIsInstance(meta_backend_object, MetaBackendObject)
+        self.assertEqual([obj['path'] for obj in response], sorted(paths))
+
+    def test_iterate__with_prefix(self):
+        for path in ['/a/1', '/a/2', '/ab/1', '/b/1']:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        response = self.orm_meta_backend_instance.iterate(prefix='/a/', batch_size=1)
+        self.assertEqual([obj['path'] for obj in response], ['/a/1', '/a/2'])
+
+    def test_iterate__with_fields(self):
+        for path in ['/b', '/a', '/c']:
+            self.orm_meta_backend_instance.model.objects.create(path=path, some_attr=path)
+        response = list(self.orm_meta_backend_instance.iterate(batch_size=2, fields=['some_attr']))
+        self.assertEqual(response, [
+            {'path': '/a', 'some_attr': '/a'},
+            {'path': '/b', 'some_attr': '/b'},
+            {'path': '/c', 'some_attr': '/c'},
+        ])
+
+    def test_iterate__should_skip_fields_which_model_does_not_have(self):
+        self.orm_meta_backend_instance.model.objects.create(path='/a', some_attr='/a')
+        response = list(self.orm_meta_backend_instance.iterate(fields=['some_attr', 'original_storage_name']))
+        self.assertEqual(response, [{'path': '/a', 'some_attr': '/a'}])
+
+    def test_iterate__should_fetch_objects_in_batches(self):
+        for i in range(5):
+            self.orm_meta_backend_instance.model.objects.create(path='/{0}'.format(i))
+        with self.assertNumQueries(3):
+            list(self.orm_meta_backend_instance.iterate(batch_size=2))
+
+    def test_iterate_paths(self):
+        for path in ['/b', '/a', '/c']:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        self.assertEqual(list(self.orm_meta_backend_instance.iterate_paths(batch_size=2)), ['/a', '/b', '/c'])
+        self.assertEqual(self.orm_meta_backend_instance.count(), 3)
+
+    def test_iterate_should_order_paths_bytewise(self):
+        paths = [u'/a.txt', u'/B.txt', u'/a/b.txt', u'/a_b.txt', u'/A.txt', u'/\xe9.txt', u'/\uffff.txt',
+                 u'/\U0001f600.txt']
+        for path in paths:
+            self.orm_meta_backend_instance.model.objects.create(path=path)
+        expected = sorted(paths, key=lambda path: path.encode('utf-8'))
+        self.assertEqual([obj['path'] for obj in self.orm_meta_backend_instance.iterate(batch_size=3)], expected)
+        self.assertEqual(list(self.orm_meta_backend_instance.iterate_paths(batch_size=3)), expected)
+
+    def test_iterate_by_original_storage_path(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        for path, original_storage_path, proxy_storage_name in [('/1', 'b', 'one'), ('/2', 'a', 'one'),
+                                                                  ('/3', 'a', 'one'), ('/4', 'c', 'one'),
+                                                                  ('/5', 'a', 'two')]:
+            meta_backend.model.objects.create(
+                path=path,
+                original_storage_path=original_storage_path,
+                proxy_storage_name=proxy_storage_name
+            )
+        response = meta_backend.iterate_by_original_storage_path(
+            filters={'proxy_storage_name': 'one'},
+            batch_size=1
+        )
+        self.assertEqual([obj['path'] for obj in response], ['/2', '/3', '/1', '/4'])
+
+    def test_iterate_by_original_storage_path_should_order_like_python(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        original_storage_paths = ['a.txt', 'B.txt', 'a/b.txt', 'a_b.txt', 'A.txt', u'\xe9.txt', 'a-b.txt']
+        for i, original_storage_path in enumerate(original_storage_paths):
+            meta_backend.model.objects.create(path='/{0}'.format(i), original_storage_path=original_storage_path)
+        response = meta_backend.iterate_by_original_storage_path(batch_size=2)
+        self.assertEqual([obj['original_storage_path'] for obj in response], sorted(original_storage_paths))
+
+    def test_filter_by_original_storage_path(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        for path, original_storage_path, proxy_storage_name in [('/1', 'a', 'one'), ('/2', 'A', 'one'),
+                                                                  ('/3', 'a', 'two'), ('/4', 'b', 'one')]:
+            meta_backend.model.objects.create(
+                path=path,
+                original_storage_path=original_storage_path,
+                proxy_storage_name=proxy_storage_name
+            )
+        objs = meta_backend.filter_by_original_storage_path('a')
+        self.assertEqual(sorted(obj['path'] for obj in objs), ['/1', '/3'])
+        objs = meta_backend.filter_by_original_storage_path('a', filters={'proxy_storage_name': 'two'})
+        self.assertEqual([obj['path'] for obj in objs], ['/3'])
+        self.assertEqual(meta_backend.filter_by_original_storage_path('c'), [])
+
+    def test_original_storage_path_index_sql(self):
+        schema_editor = connection.schema_editor()
+        self.assertEqual(
+            get_original_storage_path_index_sql(SimpleProxyStorageModel, schema_editor, 'some_index'),
+            'CREATE INDEX "some_index" ON "{0}" ("original_storage_path", "id")'.format(
+                SimpleProxyStorageModel._meta.db_table
+            )
+        )
+        with patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(
+                get_original_storage_path_index_sql(SimpleProxyStorageModel, schema_editor, 'some_index'),
+                'CREATE INDEX "some_index" ON "{0}" ("original_storage_path" COLLATE "C", "id")'.format(
+                    SimpleProxyStorageModel._meta.db_table
+                )
+            )
+
+    def test_add_original_storage_path_index_operation(self):
+        operation = AddOriginalStoragePathIndex('SimpleProxyStorageModel', name='osp_index')
+        self.assertEqual(operation.deconstruct(), ('AddOriginalStoragePathIndex', ['SimpleProxyStorageModel'],
+                                                   {'name': 'osp_index'}))
+        model_state = Mock(apps=Mock(get_model=Mock(return_value=SimpleProxyStorageModel)))
+        table = SimpleProxyStorageModel._meta.db_table
+        with connection.schema_editor() as schema_editor:
+            operation.database_forwards('tests_app', schema_editor, model_state, model_state)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        self.assertEqual(constraints['osp_index']['columns'], ['original_storage_path', 'id'])
+        with connection.schema_editor() as schema_editor:
+            operation.database_backwards('tests_app', schema_editor, model_state, model_state)
+        with connection.cursor() as cursor:
+            self.assertNotIn('osp_index', connection.introspection.get_constraints(cursor, table))
+
+    def test_add_path_index_operation(self):
+        operation = AddPathIndex('SimpleProxyStorageModel')
+        self.assertEqual(operation.describe(), 'Create binary index on path of SimpleProxyStorageModel')
+        model_state = Mock(apps=Mock(get_model=Mock(return_value=SimpleProxyStorageModel)))
+        table = SimpleProxyStorageModel._meta.db_table
+        with connection.schema_editor() as schema_editor:
+            operation.database_forwards('tests_app', schema_editor, model_state, model_state)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        self.assertEqual(constraints['{0}_path'.format(table)]['columns'], ['path', 'id'])
+        with connection.schema_editor() as schema_editor:
+            operation.database_backwards('tests_app', schema_editor, model_state, model_state)
+
+    def test_get_binary_order_expression(self):
+        meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel)
+        self.assertEqual(meta_backend.get_binary_order_expression('postgresql', '"path"'), '"path" COLLATE "C"')
+        self.assertEqual(meta_backend.get_binary_order_expression('mysql', '%s'), 'BINARY %s')
+        self.assertEqual(meta_backend.get_binary_order_expression('sqlite', '"path"'), '"path"')
+
+
+class ORMMetaBackendWithHashedPathModelTest(TestCase):
+    def setUp(self):
+        self.orm_meta_backend_instance = ORMMetaBackend(model=HashedPathProxyStorageModel)
+        self.long_path = '/{0}/file.txt'.format('long' * 100)
+
+    def test_create__should_store_path_hash(self):
+        self.orm_meta_backend_instance.create(data={'path': self.long_path, 'original_storage_path': 'file.txt'})
+        obj = HashedPathProxyStorageModel.objects.get()
+        self.assertEqual(obj.path, self.long_path)
+        self.assertEqual(obj.path_hash, utils.get_path_hash(self.long_path))
+
+    def test_get_and_exists_should_lookup_by_path_hash_and_path(self):
+        self.orm_meta_backend_instance.create(data={'path': self.long_path, 'original_storage_path': 'file.txt'})
+        self.assertEqual(self.orm_meta_backend_instance.get(self.long_path)['path'], self.long_path)
+        self.assertTrue(self.orm_meta_backend_instance.exists(self.long_path))
+        self.assertFalse(self.orm_meta_backend_instance.exists(self.long_path + 'x'))
+
+    def test_should_verify_full_path_after_hash_lookup(self):
+        self.orm_meta_backend_instance.create(data={'path': self.long_path, 'original_storage_path': 'file.txt'})
+        HashedPathProxyStorageModel.objects.update(path='/another/path.txt')
+        self.assertFalse(self.orm_meta_backend_instance.exists(self.long_path))
+
+    def test_update_path_should_update_path_hash(self):
+        self.orm_meta_backend_instance.create(data={'path': '/old.txt', 'original_storage_path': 'file.txt'})
+        self.orm_meta_backend_instance.update('/old.txt', {'path': self.long_path})
+        self.assertFalse(self.orm_meta_backend_instance.exists('/old.txt'))
+        self.assertTrue(self.orm_meta_backend_instance.exists(self.long_path))
+
+    def test_delete(self):
+        self.orm_meta_backend_instance.create(data={'path': '/one.txt', 'original_storage_path': 'one.txt'})
+        self.orm_meta_backend_instance.create(data={'path': '/two.txt', 'original_storage_path': 'two.txt'})
+        self.orm_meta_backend_instance.delete('/one.txt')
+        self.assertEqual(list(HashedPathProxyStorageModel.objects.values_list('path', flat=True)), ['/two.txt'])
+
+    def test_get_many_and_delete_many(self):
+        for path in [self.long_path, '/one.txt', '/two.txt']:
+            self.orm_meta_backend_instance.create(data={'path': path, 'original_storage_path': 'file.txt'})
+        response = self.orm_meta_backend_instance.get_many(paths=[self.long_path, '/one.txt', '/missing.txt'])
+        self.assertEqual(sorted(response.keys()), sorted([self.long_path, '/one.txt']))
+        self.orm_meta_backend_instance.delete_many(paths=[self.long_path, '/one.txt'])
+        self.assertEqual(list(HashedPathProxyStorageModel.objects.values_list('path', flat=True)), ['/two.txt'])
+
+    def test_iterate_with_prefix(self):
+        for path in ['/b/1', '/a/1', '/a/2', '/c/1']:
+            self.orm_meta_backend_instance.create(data={'path': path, 'original_storage_path': path})
+        response = self.orm_meta_backend_instance.iterate_paths(prefix='/a/', batch_size=1)
+        self.assertEqual(list(response), ['/a/1', '/a/2'])
+
+    def test_get_and_iterate_with_fields(self):
+        for path in ['/b/1', '/a/1', '/a/2']:
+            self.orm_meta_backend_instance.create(data={'path': path, 'original_storage_path': path})
+        self.assertEqual(
+            self.orm_meta_backend_instance.get('/a/1', fields=['original_storage_path']),
+            {'path': '/a/1', 'original_storage_path': '/a/1'}
+        )
+        response = self.orm_meta_backend_instance.iterate(batch_size=1, fields=['original_storage_path'])
+        self.assertEqual([obj['original_storage_path'] for obj in response], ['/a/1', '/a/2', '/b/1'])
+        response = self.orm_meta_backend_instance.iterate(batch_size=1, fields=['path'])
+        self.assertEqual([list(obj.keys()) for obj in response], [['path'], ['path'], ['path']])
+
+    def test_fill_path_hashes(self):
+        for i in range(5):
+            HashedPathProxyStorageModel.objects.create(path='/{0}.txt'.format(i))
+        for obj in HashedPathProxyStorageModel.objects.all():
+            HashedPathProxyStorageModel.objects.filter(pk=obj.pk).update(path_hash='stale_{0}'.format(obj.pk))
+        with CaptureQueriesContext(connection) as context:
+            fill_path_hashes(HashedPathProxyStorageModel, batch_size=2)
+        # one query per batch instead of one per row
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 3)
+        for obj in HashedPathProxyStorageModel.objects.all():
+            self.assertEqual(obj.path_hash, utils.get_path_hash(obj.path))
+
+    def test_fill_path_hashes__should_split_update_by_query_params_limit(self):
+        for i in range(5):
+            HashedPathProxyStorageModel.objects.create(path='/{0}.txt'.format(i))
+        for obj in HashedPathProxyStorageModel.objects.all():
+            HashedPathProxyStorageModel.objects.filter(pk=obj.pk).update(path_hash='stale_{0}'.format(obj.pk))
+        with patch.object(connection.ops, 'bulk_batch_size', return_value=1):
+            with CaptureQueriesContext(connection) as context:
+                fill_path_hashes(HashedPathProxyStorageModel, batch_size=2)
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 5)
+        for obj in HashedPathProxyStorageModel.objects.all():
+            self.assertEqual(obj.path_hash, utils.get_path_hash(obj.path))
+
+
+class ORMMetaBackendReadReplicaTest(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        self.meta_backend = ORMMetaBackend(model=SimpleProxyStorageModel, read_using='replica', write_using='default')
+
+    def test_should_read_from_read_alias_and_write_to_write_alias(self):
+        self.meta_backend.create(data={'path': '/file.txt', 'original_storage_path': 'file.txt'})
+        self.assertTrue(SimpleProxyStorageModel.objects.using('default').filter(path='/file.txt').exists())
+        self.assertFalse(self.meta_backend.exists('/file.txt'))
+        SimpleProxyStorageModel.objects.using('replica').create(path='/replicated.txt')
+        self.assertTrue(self.meta_backend.exists('/replicated.txt'))
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/replicated.txt'])
+        self.meta_backend.update('/file.txt', {'original_storage_path': 'another.txt'})
+        self.assertEqual(SimpleProxyStorageModel.objects.using('default').get().original_storage_path, 'another.txt')
+
+    def test_read_your_writes_timeout_should_read_written_paths_from_write_alias(self):
+        self.meta_backend.read_your_writes_timeout = 5
+        with patch('time.time', return_value=1000):
+            self.meta_backend.create(data={'path': '/file.txt', 'original_storage_path': 'file.txt'})
+            self.meta_backend.update('/file.txt', {'path': '/moved.txt'})
+        with patch('time.time', return_value=1004):
+            self.assertTrue(self.meta_backend.exists('/moved.txt'))
+            self.assertEqual(self.meta_backend.get('/moved.txt')['original_storage_path'], 'file.txt')
+            self.assertEqual(list(self.meta_backend.get_many(['/moved.txt']).keys()), ['/moved.txt'])
+            self.assertFalse(self.meta_backend.exists('/file.txt'))
+        with patch('time.time', return_value=1006):
+            self.assertFalse(self.meta_backend.exists('/moved.txt'))
+
+    def test_read_your_writes_with_cache(self):
+        self.meta_backend.read_your_writes_timeout = 5
+        self.meta_backend.read_your_writes_cache_alias = 'default'
+        self.meta_backend.create(data={'path': '/file.txt', 'original_storage_path': 'file.txt'})
+        another_meta_backend = ORMMetaBackend(
+            model=SimpleProxyStorageModel,
+            read_using='replica',
+            read_your_writes_timeout=5,
+            read_your_writes_cache_alias='default'
+        )
+        self.assertTrue(another_meta_backend.exists('/file.txt'))
+        self.assertFalse(another_meta_backend.exists('/another_file.txt'))
+
+    def test_read_your_writes_with_cache_should_check_all_paths_at_once(self):
+        self.meta_backend.read_your_writes_timeout = 5
+        self.meta_backend.read_your_writes_cache_alias = 'default'
+        self.meta_backend.create(data={'path': '/file.txt', 'original_storage_path': 'file.txt'})
+        cache = caches['default']
+        with patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            paths = ['/another_file.txt', '/file.txt']
+            self.assertEqual(list(self.meta_backend.get_many(paths).keys()), ['/file.txt'])
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len(get_many.call_args[0][0]), 2)
+
 
 class OriginalStorageMockClass(object):
     pass
@@ -195,6 +543,32 @@ class ContentObjectFieldMixinTest(TestCase):
             original_storage_path='/original/path.txt',
         )
 
+    def test_should_index_content_object_and_field_fields(self):
+        self.assertIn(('content_type_id', 'object_id', 'field'), self.model._meta.index_together)
+
+    def test_filter_by_content_object(self):
+        meta_backend = ORMMetaBackend(model=self.model)
+        for path, object_id, field in [('/c', 1, 'title'), ('/a', 1, 'cover'), ('/b', 2, 'title'), ('/d', 3, 'title')]:
+            meta_backend.create({
+                'path': path,
+                'proxy_storage_name': 'some_proxy_storage_name',
+                'original_storage_path': path,
+                'content_type_id': 7,
+                'object_id': object_id,
+                'field': field,
+            })
+        self.assertEqual([obj['path'] for obj in meta_backend.filter_by_content_object(7, 1)], ['/a', '/c'])
+        self.assertEqual(
+            meta_backend.filter_by_content_object(7, 1, field='title', fields=['path']),
+            [{'path': '/c', 'content_type_id': 7, 'object_id': 1, 'field': 'title'}]
+        )
+        self.assertEqual(meta_backend.filter_by_content_object(8, 1), [])
+        result = meta_backend.filter_by_content_objects([(7, 1), (7, 2), (7, 4)])
+        self.assertEqual(
+            dict((key, [obj['path'] for obj in objs]) for key, objs in result.items()),
+            {(7, 1): ['/a', '/c'], (7, 2): ['/b'], (7, 4): []}
+        )
+
 
 class OriginalStorageNameMixinTest(TestCase):
     def setUp(self):
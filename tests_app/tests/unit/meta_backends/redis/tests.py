@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import datetime
+
+import fakeredis
+from mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from proxy_storage import request_cache
+from proxy_storage.meta_backends.base import (
+    MetaBackendObject,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+from proxy_storage.meta_backends.redis import RedisMetaBackend
+
+
+class RedisMetaBackendTest(TestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeStrictRedis()
+        self.client.flushall()
+        self.meta_backend = RedisMetaBackend(client=self.client, content_object_index=True)
+
+    def create(self, path, **data):
+        data.setdefault('original_storage_path', path.lstrip('/'))
+        return self.meta_backend.create(dict(data, path=path))
+
+    def test_create_and_get_should_keep_value_types(self):
+        created_time = timezone.now()
+        meta_backend_obj = self.create(
+            '/hello.txt',
+            size=5,
+            created_time=created_time,
+            url=None,
+            proxy_storage_name=u'проксi'
+        )
+        self.assertIsInstance(meta_backend_obj, MetaBackendObject)
+        response = self.meta_backend.get('/hello.txt')
+        self.assertIsInstance(response, MetaBackendObject)
+        self.assertEqual(response, {
+            'path': '/hello.txt',
+            'original_storage_path': 'hello.txt',
+            'size': 5,
+            'created_time': created_time,
+            'url': None,
+            'proxy_storage_name': u'проксi',
+        })
+
+    def test_create_and_update_should_support_redis_py_without_hset_mapping(self):
+        with patch('proxy_storage.meta_backends.redis.redis.VERSION', (3, 4, 1)):
+            self.create('/hello.txt', size=5)
+            self.meta_backend.update('/hello.txt', {'size': 6})
+        self.assertEqual(self.meta_backend.get('/hello.txt')['size'], 6)
+
+    def test_create__should_raise_error_if_path_is_not_unique(self):
+        self.create('/hello.txt')
+        self.assertRaises(MetaBackendObjectAlreadyExists, self.create, '/hello.txt')
+
+    def test_get__should_raise_special_exception_if_object_does_not_exist(self):
+        self.assertRaises(MetaBackendObjectDoesNotExist, self.meta_backend.get, '/missing.txt')
+        self.assertRaises(MetaBackendObjectDoesNotExist, self.meta_backend.get, '/missing.txt', fields=['size'])
+
+    def test_get__with_fields(self):
+        self.create('/hello.txt', size=5)
+        self.assertEqual(
+            self.meta_backend.get('/hello.txt', fields=['size', 'url']),
+            {'path': '/hello.txt', 'size': 5}
+        )
+
+    def test_get_many_and_exists_many_should_be_pipelined(self):
+        for path in ['/a', '/b', '/c']:
+            self.create(path)
+        with request_cache.scope():
+            self.assertEqual(sorted(self.meta_backend.get_many(['/a', '/c', '/missing']).keys()), ['/a', '/c'])
+            self.assertEqual(self.meta_backend.exists_many(['/a', '/b', '/missing']), set(['/a', '/b']))
+            self.assertFalse(self.meta_backend.exists('/missing'))
+
+    def test_update(self):
+        self.create('/hello.txt', size=5)
+        self.meta_backend.update('/hello.txt', {'size': 6})
+        self.assertEqual(self.meta_backend.get('/hello.txt')['size'], 6)
+
+    def test_update__with_new_path_should_move_object(self):
+        self.create('/hello.txt')
+        self.meta_backend.update('/hello.txt', {'path': '/world.txt'})
+        self.assertFalse(self.meta_backend.exists('/hello.txt'))
+        self.assertEqual(self.meta_backend.get('/world.txt')['original_storage_path'], 'hello.txt')
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/world.txt'])
+
+    def test_update__with_taken_path_should_raise_error(self):
+        self.create('/hello.txt')
+        self.create('/world.txt')
+        self.assertRaises(
+            MetaBackendObjectAlreadyExists,
+            self.meta_backend.update,
+            '/hello.txt',
+            {'path': '/world.txt'}
+        )
+        self.assertTrue(self.meta_backend.exists('/hello.txt'))
+
+    def test_update__of_missing_object_should_not_create_it(self):
+        self.meta_backend.update('/missing.txt', {'size': 1})
+        self.assertFalse(self.meta_backend.exists('/missing.txt'))
+
+    def test_delete_and_delete_many_should_remove_objects_and_indexes(self):
+        for path in ['/a', '/b', '/c']:
+            self.create(path, content_type_id=1, object_id=2)
+        self.meta_backend.delete('/a')
+        self.meta_backend.delete_many(['/b', '/missing'])
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/c'])
+        self.assertEqual(self.meta_backend.count(), 1)
+        self.assertEqual([obj['path'] for obj in self.meta_backend.filter_by_content_object(1, 2)], ['/c'])
+        self.assertEqual([obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path()], ['/c'])
+
+    def test_delete_many_should_retry_if_object_is_updated_after_read(self):
+        self.create('/a', content_type_id=1, object_id=2)
+        get_many = self.meta_backend._get_many
+        read_paths = []
+
+        def get_many_mock(paths, fields=None):
+            objs = get_many(paths, fields=fields)
+            if not read_paths:
+                # concurrent update moves object to another index entry before deletion is executed
+                self.meta_backend.update('/a', {'content_type_id': 3, 'object_id': 4})
+            read_paths.append(paths)
+            return objs
+
+        with patch.object(self.meta_backend, '_get_many', get_many_mock):
+            self.meta_backend.delete_many(['/a'])
+        self.assertEqual(read_paths, [['/a'], ['/a']])
+        self.assertEqual(list(self.meta_backend.iterate_paths()), [])
+        self.assertEqual(self.meta_backend.filter_by_content_object(3, 4), [])
+
+    def test_filter_by_content_objects(self):
+        self.create('/c', content_type_id=1, object_id=2, field='resume')
+        self.create('/a', content_type_id=1, object_id=2, field='photo')
+        self.create('/b', content_type_id=1, object_id=3, field='resume')
+        self.create('/d')
+        for meta_backend in [self.meta_backend, RedisMetaBackend(client=self.client)]:
+            self.assertEqual([obj['path'] for obj in meta_backend.filter_by_content_object(1, 2)], ['/a', '/c'])
+            self.assertEqual(
+                [obj['path'] for obj in meta_backend.filter_by_content_object(1, 2, field='resume', fields=['path'])],
+                ['/c']
+            )
+            result = meta_backend.filter_by_content_objects([(1, 2), (1, 3), (2, 2)])
+            self.assertEqual(
+                dict((key, [obj['path'] for obj in objs]) for key, objs in result.items()),
+                {(1, 2): ['/a', '/c'], (1, 3): ['/b'], (2, 2): []}
+            )
+
+    def test_iterate__with_prefix_and_fields(self):
+        for path in [u'/a/1', u'/a/2', u'/a/я', u'/ab/1', u'/b/1']:
+            self.create(path)
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate(prefix='/a/', batch_size=2)],
+            [u'/a/1', u'/a/2', u'/a/я']
+        )
+        self.assertEqual(
+            list(self.meta_backend.iterate(prefix='/ab/', fields=['path'])),
+            [{'path': '/ab/1'}]
+        )
+        self.assertEqual(len(list(self.meta_backend.iterate_paths(batch_size=1))), 5)
+
+    def test_iterate__with_start_after(self):
+        for path in [u'/a/1', u'/a/2', u'/a/я', u'/ab/1', u'/b/1']:
+            self.create(path)
+        self.assertEqual(list(self.meta_backend.iterate_paths(start_after=u'/a/2')), [u'/a/я', u'/ab/1', u'/b/1'])
+        self.assertEqual(
+            list(self.meta_backend.iterate_paths(prefix='/a/', start_after='/')),
+            [u'/a/1', u'/a/2', u'/a/я']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate(prefix='/a/', start_after=u'/a/1', batch_size=1)],
+            [u'/a/2', u'/a/я']
+        )
+
+    def test_iterate_by_original_storage_path(self):
+        self.create('/1', original_storage_path='b.txt', proxy_storage_name='one')
+        self.create('/2', original_storage_path='a.txt', proxy_storage_name='one')
+        self.create('/3', original_storage_path='a', proxy_storage_name='two')
+        self.create('/4', original_storage_path='a.txt', proxy_storage_name='two')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(batch_size=2)],
+            ['/3', '/2', '/4', '/1']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(
+                filters={'proxy_storage_name': 'one'}
+            )],
+            ['/2', '/1']
+        )
+
+    def test_filter_by_original_storage_path(self):
+        self.create('/1', original_storage_path='a.txt', proxy_storage_name='one')
+        self.create('/2', original_storage_path='a', proxy_storage_name='one')
+        self.create('/3', original_storage_path='a.txt', proxy_storage_name='two')
+        objs = self.meta_backend.filter_by_original_storage_path('a.txt')
+        self.assertEqual([obj['path'] for obj in objs], ['/1', '/3'])
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.filter_by_original_storage_path(
+                'a.txt',
+                filters={'proxy_storage_name': 'two'}
+            )],
+            ['/3']
+        )
+        self.assertEqual(self.meta_backend.filter_by_original_storage_path('b.txt'), [])
+
+    def test_content_object_index_should_follow_updates(self):
+        self.create('/a', content_type_id=1, object_id=2)
+        self.create('/b')
+        self.meta_backend.update('/b', {'content_type_id': 1, 'object_id': 2})
+        self.meta_backend.update('/a', {'content_type_id': 1, 'object_id': 3})
+        self.assertEqual([obj['path'] for obj in self.meta_backend.filter_by_content_object(1, 2)], ['/b'])
+        self.assertEqual(
+            self.meta_backend.filter_by_content_object(1, 3, fields=['object_id']),
+            [{'path': '/a', 'content_type_id': 1, 'object_id': 3}]
+        )
+
+    def test_client_could_be_callable(self):
+        meta_backend = RedisMetaBackend(client=lambda: self.client)
+        meta_backend.create({'path': '/hello.txt', 'created_time': datetime.datetime(2016, 1, 1)})
+        self.assertEqual(self.meta_backend.get('/hello.txt')['created_time'], datetime.datetime(2016, 1, 1))
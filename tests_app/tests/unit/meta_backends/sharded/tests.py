@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+from mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from proxy_storage.meta_backends.base import MetaBackendObjectAlreadyExists, MetaBackendObjectDoesNotExist
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.meta_backends.sharded import HashRing, ShardedMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.testutils import override_proxy_storage_settings
+from tests_app.models import HashedPathProxyStorageModel, ProxyStorageModel
+
+PATHS = ['/files/{0}.txt'.format(i) for i in range(100)]
+
+
+class HashRingTest(TestCase):
+    def test_adding_shard_should_move_only_part_of_keys(self):
+        ring = HashRing(['one', 'two', 'three'])
+        new_ring = HashRing(['one', 'two', 'three', 'four'])
+        keys = ['/files/{0}.txt'.format(i) for i in range(10000)]
+        self.assertEqual(set(ring.get_name(key) for key in keys), set(['one', 'two', 'three']))
+        moved_keys = [key for key in keys if ring.get_name(key) != new_ring.get_name(key)]
+        self.assertTrue(all(new_ring.get_name(key) == 'four' for key in moved_keys))
+        self.assertTrue(1500 < len(moved_keys) < 3500, len(moved_keys))
+
+
+class ShardedMetaBackendTest(TestCase):
+    def setUp(self):
+        self.shards = [(name, MemoryMetaBackend()) for name in ['one', 'two', 'three']]
+        self.meta_backend = ShardedMetaBackend(shards=self.shards)
+
+    def tearDown(self):
+        self.meta_backend.close()
+
+    def create(self, path, **data):
+        data.setdefault('original_storage_path', path.lstrip('/'))
+        return self.meta_backend.create(dict(data, path=path))
+
+    def test_single_path_operations_should_be_routed_to_one_shard(self):
+        for path in PATHS:
+            self.create(path)
+        for name, shard in self.shards:
+            self.assertEqual(
+                sorted(shard.iterate_paths()),
+                sorted(path for path in PATHS if self.meta_backend.get_shard_name(path) == name)
+            )
+        self.assertTrue(all(len(list(shard.iterate_paths())) for name, shard in self.shards))
+        self.assertEqual(self.meta_backend.get('/files/1.txt', fields=['path']), {'path': '/files/1.txt'})
+        self.assertRaises(MetaBackendObjectAlreadyExists, self.create, '/files/1.txt')
+        self.assertRaises(MetaBackendObjectDoesNotExist, self.meta_backend.get, '/missing.txt')
+
+    def test_many_operations_should_scatter_and_gather(self):
+        self.meta_backend.create_many([{'path': path, 'original_storage_path': path} for path in PATHS])
+        self.assertEqual(sorted(self.meta_backend.get_many(PATHS + ['/missing.txt']).keys()), sorted(PATHS))
+        self.assertEqual(self.meta_backend.exists_many(PATHS[:10] + ['/missing.txt']), set(PATHS[:10]))
+        self.meta_backend.update_many(dict((path, {'size': 1}) for path in PATHS[:10]))
+        self.assertEqual(set(obj.get('size') for obj in self.meta_backend.get_many(PATHS[:10]).values()), set([1]))
+        self.meta_backend.delete_many(PATHS[:50])
+        self.assertEqual(list(self.meta_backend.iterate_paths()), sorted(PATHS[50:]))
+        self.assertEqual(self.meta_backend.count(), len(PATHS[50:]))
+
+    def test_parallel_calls_should_reuse_pool_and_close_database_connections_of_workers(self):
+        connection = Mock()
+        with patch('proxy_storage.meta_backends.sharded.connections') as connections_mock:
+            connections_mock.all.return_value = [connection]
+            self.meta_backend.get_many(PATHS)
+            pool = self.meta_backend.get_pool()
+            self.meta_backend.exists_many(PATHS)
+        self.assertIs(self.meta_backend.get_pool(), pool)
+        self.assertEqual(connection.close.call_count, 2 * len(self.shards))
+        self.meta_backend.close()
+        self.assertIsNot(self.meta_backend.get_pool(), pool)
+
+    def test_iterate_should_merge_shards_in_order(self):
+        for path in PATHS:
+            self.create(path, original_storage_path=path[::-1])
+        self.assertEqual([obj['path'] for obj in self.meta_backend.iterate(batch_size=7)], sorted(PATHS))
+        self.assertEqual(
+            list(self.meta_backend.iterate_paths(prefix='/files/1')),
+            sorted(path for path in PATHS if path.startswith('/files/1'))
+        )
+        self.assertEqual(
+            [obj['original_storage_path'] for obj in self.meta_backend.iterate_by_original_storage_path()],
+            sorted(path[::-1] for path in PATHS)
+        )
+
+    def test_iterate_should_merge_shards_of_different_meta_backends_bytewise(self):
+        # test transaction is not visible to worker threads, so shards are queried in this thread
+        meta_backend = ShardedMetaBackend(
+            shards=[
+                ('orm', ORMMetaBackend(model=ProxyStorageModel)),
+                ('hashed', ORMMetaBackend(model=HashedPathProxyStorageModel)),
+                ('memory', MemoryMetaBackend()),
+            ],
+            workers=1
+        )
+        paths = [u'/a.txt', u'/B.txt', u'/a/b.txt', u'/a_b.txt', u'/A.txt', u'/Z.txt', u'/\xe9.txt',
+                 u'/\xc9.txt', u'/\u0451.txt', u'/\uffff.txt', u'/\U0001f600.txt']
+        for i, path in enumerate(paths):
+            meta_backend.create({'path': path, 'original_storage_path': path[1:] if i % 3 else u'same.txt'})
+        # copy of object which is being moved by rebalancing
+        moved_path = paths[0]
+        for shard in meta_backend.shards.values():
+            if not shard.exists(moved_path):
+                shard.create({'path': moved_path, 'original_storage_path': u'same.txt'})
+                break
+        self.assertEqual(set(meta_backend.get_shard_name(path) for path in paths), set(['orm', 'hashed', 'memory']))
+        expected_paths = sorted(paths, key=lambda path: path.encode('utf-8'))
+        self.assertEqual([obj['path'] for obj in meta_backend.iterate(batch_size=2)], expected_paths)
+        self.assertEqual(list(meta_backend.iterate_paths(batch_size=2)), expected_paths)
+        response = list(meta_backend.iterate_by_original_storage_path(batch_size=2))
+        self.assertEqual(
+            [obj['original_storage_path'] for obj in response],
+            sorted(
+                [path[1:] if i % 3 else u'same.txt' for i, path in enumerate(paths)],
+                key=lambda original_storage_path: original_storage_path.encode('utf-8')
+            )
+        )
+        self.assertEqual(sorted(obj['path'] for obj in response), sorted(paths))
+
+    def test_filter_by_content_objects_should_gather_objects_from_all_shards(self):
+        for i, path in enumerate(PATHS):
+            self.create(path, content_type_id=1, object_id=i % 2)
+        result = self.meta_backend.filter_by_content_objects([(1, 0), (1, 1)])
+        self.assertEqual([obj['path'] for obj in result[(1, 0)]], sorted(PATHS[::2]))
+        self.assertEqual([obj['path'] for obj in result[(1, 1)]], sorted(PATHS[1::2]))
+
+    def test_filter_by_original_storage_path_should_gather_objects_from_all_shards(self):
+        for path in PATHS:
+            self.create(path, original_storage_path='same.txt')
+        self.create('/other.txt')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.filter_by_original_storage_path('same.txt')],
+            sorted(PATHS)
+        )
+
+    def test_update_with_new_path_should_move_object_to_its_shard(self):
+        path = PATHS[0]
+        new_path = next(
+            other_path for other_path in ('/moved/{0}.txt'.format(i) for i in range(100))
+            if self.meta_backend.get_shard_name(other_path) != self.meta_backend.get_shard_name(path)
+        )
+        self.create(path, size=5)
+        self.meta_backend.update(path, {'path': new_path})
+        self.assertFalse(self.meta_backend.exists(path))
+        self.assertEqual(self.meta_backend.get_shard(new_path).get(new_path)['size'], 5)
+
+    def test_objects_should_be_available_while_rebalancing(self):
+        for path in PATHS:
+            self.create(path)
+        self.shards.append(('four', MemoryMetaBackend()))
+        meta_backend = ShardedMetaBackend(shards=self.shards, previous_shard_names=['one', 'two', 'three'])
+        moved_paths = [path for path in PATHS if meta_backend.get_shard_name(path) == 'four']
+        self.assertTrue(moved_paths)
+        self.assertEqual(sorted(meta_backend.get_many(PATHS).keys()), sorted(PATHS))
+        self.assertTrue(meta_backend.exists(moved_paths[0]))
+        self.assertEqual(meta_backend.get(moved_paths[0])['path'], moved_paths[0])
+        self.assertRaises(MetaBackendObjectAlreadyExists, meta_backend.create, {'path': moved_paths[0]})
+
+        moved = list(meta_backend.rebalance(batch_size=3))
+        self.assertEqual(sorted(path for path, source, target in moved), sorted(moved_paths))
+        self.assertEqual(set(target for path, source, target in moved), set(['four']))
+        self.assertEqual(sorted(dict(self.shards)['four'].iterate_paths()), sorted(moved_paths))
+        self.assertEqual(list(meta_backend.iterate_paths()), sorted(PATHS))
+        self.assertEqual(list(meta_backend.rebalance()), [])
+
+        meta_backend.delete(moved_paths[0])
+        self.assertFalse(meta_backend.exists(moved_paths[0]))
+
+    def get_rebalanced_meta_backend(self):
+        for path in PATHS:
+            self.create(path, size=5)
+        self.shards.append(('four', MemoryMetaBackend()))
+        meta_backend = ShardedMetaBackend(shards=self.shards, previous_shard_names=['one', 'two', 'three'])
+        moved_paths = [path for path in PATHS if meta_backend.get_shard_name(path) == 'four']
+        return meta_backend, moved_paths
+
+    def test_rebalance_should_not_move_object_updated_while_copying(self):
+        meta_backend, moved_paths = self.get_rebalanced_meta_backend()
+        path = moved_paths[0]
+        source_shard = meta_backend.get_previous_shard(path)
+        target_shard = dict(self.shards)['four']
+        target_create = target_shard.create
+
+        def update_source_and_create(data):
+            if data['path'] == path:
+                source_shard.update(path, {'size': 10})
+            return target_create(data)
+
+        with patch.object(target_shard, 'create', side_effect=update_source_and_create):
+            moved = list(meta_backend.rebalance())
+        self.assertEqual(sorted(item[0] for item in moved), sorted(moved_paths[1:]))
+        self.assertFalse(target_shard.exists(path))
+        self.assertEqual(meta_backend.get(path)['size'], 10)
+
+        self.assertEqual(list(meta_backend.rebalance()), [(path, meta_backend.previous_ring.get_name(path), 'four')])
+        self.assertEqual(target_shard.get(path)['size'], 10)
+
+    def test_rebalance_should_move_object_copied_by_interrupted_run(self):
+        meta_backend, moved_paths = self.get_rebalanced_meta_backend()
+        path = moved_paths[0]
+        target_shard = dict(self.shards)['four']
+        target_shard.create(meta_backend.get_movable_data(meta_backend.get_previous_shard(path).get(path)))
+        moved = list(meta_backend.rebalance())
+        self.assertIn(path, [item[0] for item in moved])
+        self.assertFalse(meta_backend.get_previous_shard(path).exists(path))
+
+    def test_rebalance_should_keep_objects_which_differ_in_source_and_target_shards(self):
+        meta_backend, moved_paths = self.get_rebalanced_meta_backend()
+        path = moved_paths[0]
+        target_shard = dict(self.shards)['four']
+        target_shard.create({'path': path, 'original_storage_path': 'other.txt'})
+        moved = list(meta_backend.rebalance())
+        self.assertNotIn(path, [item[0] for item in moved])
+        self.assertEqual(meta_backend.get_previous_shard(path).get(path)['original_storage_path'], path.lstrip('/'))
+        self.assertEqual(target_shard.get(path)['original_storage_path'], 'other.txt')
+
+
+class ShardedProxyStorage(ProxyStorageBase):
+    meta_backend = None
+
+
+class RebalanceProxyStorageShardsCommandTest(TestCase):
+    def test_should_rebalance_sharded_meta_backends(self):
+        shards = [('one', MemoryMetaBackend()), ('two', MemoryMetaBackend())]
+        ShardedMetaBackend(shards=shards[:1]).create_many([{'path': path} for path in PATHS])
+        ShardedProxyStorage.meta_backend = ShardedMetaBackend(shards=shards, previous_shard_names=['one'])
+        stdout = StringIO()
+        with override_proxy_storage_settings(PROXY_STORAGE_CLASSES={'sharded': ShardedProxyStorage}):
+            call_command('rebalance_proxy_storage_shards', 'sharded', stdout=stdout)
+        moved_count = len(list(shards[1][1].iterate_paths()))
+        self.assertTrue(moved_count)
+        self.assertIn('Moved {0} objects of "sharded" from "one" to "two"'.format(moved_count), stdout.getvalue())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+
+from django.test import TestCase
+from django.utils import timezone
+
+from proxy_storage.meta_backends.base import (
+    MetaBackendObject,
+    MetaBackendObjectAlreadyExists,
+    MetaBackendObjectDoesNotExist,
+)
+from proxy_storage.meta_backends.sqlite import SQLiteMetaBackend
+
+
+class SQLiteMetaBackendTest(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.temp_dir, 'meta.sqlite3')
+        self.meta_backend = SQLiteMetaBackend(database_path=self.database_path)
+
+    def tearDown(self):
+        self.meta_backend.close()
+        shutil.rmtree(self.temp_dir)
+
+    def create(self, path, **data):
+        data.setdefault('original_storage_path', path.lstrip('/'))
+        return self.meta_backend.create(dict(data, path=path))
+
+    def test_should_use_wal_mode(self):
+        connection = self.meta_backend.get_connection()
+        self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_create_and_get_should_keep_value_types(self):
+        created_time = timezone.now()
+        meta_backend_obj = self.create(u'/привет.txt', size=5, created_time=created_time, url=None)
+        self.assertIsInstance(meta_backend_obj, MetaBackendObject)
+        self.assertEqual(self.meta_backend.get(u'/привет.txt'), {
+            'path': u'/привет.txt',
+            'original_storage_path': u'привет.txt',
+            'size': 5,
+            'created_time': created_time,
+            'url': None,
+        })
+
+    def test_create__should_raise_error_if_path_is_not_unique(self):
+        self.create('/hello.txt')
+        self.assertRaises(MetaBackendObjectAlreadyExists, self.create, '/hello.txt')
+
+    def test_get__should_raise_special_exception_if_object_does_not_exist(self):
+        self.assertRaises(MetaBackendObjectDoesNotExist, self.meta_backend.get, '/missing.txt')
+
+    def test_get_and_get_many__with_fields(self):
+        self.create('/a', size=1)
+        self.create('/b', size=2)
+        self.assertEqual(self.meta_backend.get('/a', fields=['size']), {'path': '/a', 'size': 1})
+        self.assertEqual(
+            self.meta_backend.get_many(['/a', '/b', '/missing'], fields=['size']),
+            {'/a': {'path': '/a', 'size': 1}, '/b': {'path': '/b', 'size': 2}}
+        )
+
+    def test_many_operations_should_split_paths_by_query_params_limit(self):
+        self.meta_backend.max_query_params = 2
+        paths = ['/{0}'.format(i) for i in range(5)]
+        self.meta_backend.create_many([{'path': path} for path in paths])
+        self.assertEqual(len(self.meta_backend.get_many(paths)), 5)
+        self.assertEqual(self.meta_backend.exists_many(paths + ['/missing']), set(paths))
+        self.meta_backend.delete_many(paths[:3])
+        self.assertEqual(list(self.meta_backend.iterate_paths()), paths[3:])
+
+    def test_update__with_new_path(self):
+        self.create('/hello.txt', size=5)
+        self.create('/taken.txt')
+        self.meta_backend.update('/hello.txt', {'path': '/world.txt', 'size': 6})
+        self.assertFalse(self.meta_backend.exists('/hello.txt'))
+        self.assertEqual(self.meta_backend.get('/world.txt')['size'], 6)
+        self.assertRaises(
+            MetaBackendObjectAlreadyExists,
+            self.meta_backend.update,
+            '/world.txt',
+            {'path': '/taken.txt'}
+        )
+
+    def test_transaction_should_commit_writes_at_once(self):
+        with self.meta_backend.transaction():
+            self.create('/a')
+            self.create('/b')
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/a', '/b'])
+        try:
+            with self.meta_backend.transaction():
+                self.create('/c')
+                self.create('/a')
+        except MetaBackendObjectAlreadyExists:
+            pass
+        self.assertEqual(list(self.meta_backend.iterate_paths()), ['/a', '/b'])
+
+    def test_every_thread_should_use_own_connection(self):
+        self.create('/hello.txt')
+        results = []
+
+        def read():
+            results.append(self.meta_backend.exists('/hello.txt'))
+            self.meta_backend.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [True])
+
+    def test_iterate__with_prefix(self):
+        for path in [u'/a/1', u'/a/2', u'/a/я', u'/ab/1', u'/b/1']:
+            self.create(path)
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate(prefix='/a/', batch_size=2)],
+            [u'/a/1', u'/a/2', u'/a/я']
+        )
+        self.assertEqual(list(self.meta_backend.iterate(prefix='/ab/', fields=['path'])), [{'path': '/ab/1'}])
+        self.assertEqual(len(list(self.meta_backend.iterate_paths(batch_size=1))), 5)
+        self.assertEqual(self.meta_backend.count(), 5)
+
+    def test_iterate__with_start_after(self):
+        for path in [u'/a/1', u'/a/2', u'/a/я', u'/ab/1', u'/b/1']:
+            self.create(path)
+        self.assertEqual(list(self.meta_backend.iterate_paths(start_after=u'/a/2')), [u'/a/я', u'/ab/1', u'/b/1'])
+        self.assertEqual(
+            list(self.meta_backend.iterate_paths(prefix='/a/', start_after='/')),
+            [u'/a/1', u'/a/2', u'/a/я']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate(prefix='/a/', start_after=u'/a/1', batch_size=1)],
+            [u'/a/2', u'/a/я']
+        )
+
+    def test_iterate_by_original_storage_path(self):
+        self.create('/1', original_storage_path='b.txt', proxy_storage_name='one')
+        self.create('/2', original_storage_path='a.txt', proxy_storage_name='one')
+        self.create('/3', original_storage_path='a', proxy_storage_name='two')
+        self.create('/4', original_storage_path='a.txt', proxy_storage_name='two')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(batch_size=1)],
+            ['/3', '/2', '/4', '/1']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(
+                filters={'proxy_storage_name': 'one'}
+            )],
+            ['/2', '/1']
+        )
+
+    def test_iterate_by_original_storage_path__with_original_storage_path_filter(self):
+        self.create('/1', original_storage_path='b.txt', proxy_storage_name='one')
+        self.create('/2', original_storage_path='a.txt', proxy_storage_name='one')
+        self.create('/3', original_storage_path='a.txt', proxy_storage_name='two')
+        self.create('/4', original_storage_path='a.txt', proxy_storage_name='one')
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.iterate_by_original_storage_path(
+                filters={'original_storage_path': 'a.txt', 'proxy_storage_name': 'one'},
+                batch_size=1
+            )],
+            ['/2', '/4']
+        )
+        self.assertEqual(
+            [obj['path'] for obj in self.meta_backend.filter_by_original_storage_path('a.txt')],
+            ['/2', '/3', '/4']
+        )
+
+    def test_filter_by_original_storage_path__should_search_by_index(self):
+        self.create('/1', original_storage_path='a.txt')
+        connection = self.meta_backend.get_connection()
+        queries = []
+        connection.set_trace_callback(queries.append)
+        try:
+            objs = self.meta_backend.filter_by_original_storage_path('a.txt')
+        finally:
+            connection.set_trace_callback(None)
+        self.assertEqual([obj['path'] for obj in objs], ['/1'])
+        select_query = [query for query in queries if query.startswith('SELECT')][0]
+        plan = connection.execute('EXPLAIN QUERY PLAN ' + select_query).fetchall()
+        self.assertIn(
+            'INDEX proxy_storage_objects_original_storage_path (original_storage_path=?)',
+            ' '.join(row[-1] for row in plan)
+        )
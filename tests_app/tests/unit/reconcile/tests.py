@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from django.test import TestCase, TransactionTestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.reconcile import (
+    Reconciler,
+    ReconcileOrderError,
+    iterate_original_storage_paths,
+    ORPHANED_FILE,
+    DANGLING_RECORD,
+    FOUND,
+    DELETED,
+    SKIPPED,
+)
+from proxy_storage.storages.base import ProxyStorageBase, MultipleOriginalStoragesMixin
+from proxy_storage.testutils import override_proxy_storage_settings
+
+from tests_app.models import ProxyStorageModel, ProxyStorageModelWithOriginalStorageName
+
+
+class SimpleProxyStorage(ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+
+
+class MultipleOriginalStoragesProxyStorage(MultipleOriginalStoragesMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModelWithOriginalStorageName)
+
+
+class SharedOriginalStorageProxyStorage(ProxyStorageBase):
+    meta_backend = MemoryMetaBackend()
+
+
+def get_summary(results):
+    return sorted(
+        (result.difference.kind, result.difference.original_storage_name,
+         result.difference.original_storage_path, result.action)
+        for result in results
+    )
+
+
+class PrepareMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir_2 = tempfile.mkdtemp()
+        self.original_storage = FileSystemStorage(location=self.temp_dir)
+        self.original_storage_2 = FileSystemStorage(location=self.temp_dir_2)
+        SimpleProxyStorage.original_storage = self.original_storage
+        # another instance which saves files to the same directory
+        SharedOriginalStorageProxyStorage.original_storage = FileSystemStorage(location=self.temp_dir)
+        SharedOriginalStorageProxyStorage.meta_backend.clear()
+        MultipleOriginalStoragesProxyStorage.original_storages = [
+            ('original_storage_1', self.original_storage),
+            ('original_storage_2', self.original_storage_2),
+        ]
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={
+                'simple': SimpleProxyStorage,
+                'multiple': MultipleOriginalStoragesProxyStorage,
+                'shared': SharedOriginalStorageProxyStorage,
+            },
+            PROXY_STORAGE_CLASSES_INVERTED={
+                SimpleProxyStorage: 'simple',
+                MultipleOriginalStoragesProxyStorage: 'multiple',
+                SharedOriginalStorageProxyStorage: 'shared',
+            }
+        )
+        self.overrider.start()
+
+    def tearDown(self):
+        self.overrider.stop()
+        SimpleProxyStorage.original_storage = None
+        SharedOriginalStorageProxyStorage.original_storage = None
+        MultipleOriginalStoragesProxyStorage.original_storages = []
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.temp_dir_2)
+
+
+class IterateOriginalStoragePathsTest(PrepareMixin, TestCase):
+    def test_should_return_all_files_in_lexicographic_order(self):
+        for name in ['b.txt', 'a/c.txt', 'a/b/d.txt', 'a.txt', 'a-b/e.txt']:
+            self.original_storage.save(name, ContentFile('content'))
+        self.assertEqual(
+            list(iterate_original_storage_paths(self.original_storage)),
+            ['a-b/e.txt', 'a.txt', 'a/b/d.txt', 'a/c.txt', 'b.txt']
+        )
+
+
+class ReconcilerTest(PrepareMixin, TestCase):
+    def setUp(self):
+        super(ReconcilerTest, self).setUp()
+        self.proxy_storage = SimpleProxyStorage()
+        self.referenced_path = self.proxy_storage.save('referenced.txt', ContentFile('content'))
+        self.dangling_path = self.proxy_storage.save('dir/dangling.txt', ContentFile('content'))
+        os.remove(os.path.join(self.temp_dir, 'dir', 'dangling.txt'))
+        self.original_storage.save('dir/orphaned.txt', ContentFile('content'))
+
+    def test_should_only_report_differences_by_default(self):
+        self.assertEqual(get_summary(Reconciler(self.proxy_storage).reconcile()), [
+            (DANGLING_RECORD, None, 'dir/dangling.txt', FOUND),
+            (ORPHANED_FILE, None, 'dir/orphaned.txt', FOUND),
+        ])
+        self.assertTrue(self.original_storage.exists('dir/orphaned.txt'))
+        self.assertTrue(self.proxy_storage.exists(self.dangling_path))
+
+    def test_should_delete_differences(self):
+        reconciler = Reconciler(
+            self.proxy_storage,
+            delete_orphaned_files=True,
+            delete_dangling_records=True,
+            grace_period=0
+        )
+        self.assertEqual(get_summary(reconciler.reconcile()), [
+            (DANGLING_RECORD, None, 'dir/dangling.txt', DELETED),
+            (ORPHANED_FILE, None, 'dir/orphaned.txt', DELETED),
+        ])
+        self.assertFalse(self.original_storage.exists('dir/orphaned.txt'))
+        self.assertFalse(self.proxy_storage.exists(self.dangling_path))
+        self.assertTrue(self.proxy_storage.exists(self.referenced_path))
+        self.assertTrue(self.original_storage.exists('referenced.txt'))
+
+    def test_should_not_treat_files_of_proxy_storages_sharing_original_storage_as_orphaned(self):
+        shared_path = SharedOriginalStorageProxyStorage().save('shared.txt', ContentFile('content'))
+        self.assertEqual(shared_path, os.path.join(self.temp_dir, 'shared.txt'))
+        stdout = StringIO()
+        call_command('reconcile_proxy_storages', delete_orphaned_files=True, grace_period=0, stdout=stdout)
+        # "multiple" proxy-storage shares the directory too and deletes the only orphaned file
+        self.assertEqual(sorted(stdout.getvalue().splitlines()), [
+            'multiple original_storage_1 orphaned_file dir/orphaned.txt deleted',
+            'simple - dangling_record dir/dangling.txt found',
+        ])
+        self.assertTrue(self.original_storage.exists('shared.txt'))
+        self.assertTrue(self.original_storage.exists('referenced.txt'))
+        self.assertFalse(self.original_storage.exists('dir/orphaned.txt'))
+
+    def test_should_not_delete_orphaned_files_modified_during_grace_period(self):
+        reconciler = Reconciler(self.proxy_storage, delete_orphaned_files=True, grace_period=60)
+        self.assertIn((ORPHANED_FILE, None, 'dir/orphaned.txt', SKIPPED), get_summary(reconciler.reconcile()))
+        self.assertTrue(self.original_storage.exists('dir/orphaned.txt'))
+
+    def test_should_not_delete_record_if_file_appeared_after_walk(self):
+        reconciler = Reconciler(self.proxy_storage, delete_dangling_records=True)
+        with patch.object(self.original_storage, 'exists', return_value=True):
+            results = get_summary(reconciler.reconcile())
+        self.assertIn((DANGLING_RECORD, None, 'dir/dangling.txt', SKIPPED), results)
+        self.assertTrue(self.proxy_storage.exists(self.dangling_path))
+
+    def test_should_stop_if_meta_backend_is_not_ordered_by_original_storage_path(self):
+        with patch.object(self.proxy_storage.meta_backend, 'iterate_by_original_storage_path', return_value=iter([
+            {'path': '/b', 'original_storage_path': 'b'},
+            {'path': '/a', 'original_storage_path': 'a'},
+        ])):
+            self.assertRaises(ReconcileOrderError, list, Reconciler(self.proxy_storage).reconcile())
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('reconcile_proxy_storages', 'simple', workers='1', stdout=stdout)
+        self.assertEqual(sorted(stdout.getvalue().splitlines()), [
+            'simple - dangling_record dir/dangling.txt found',
+            'simple - orphaned_file dir/orphaned.txt found',
+        ])
+
+
+class ReconcilerWithMultipleOriginalStoragesTest(PrepareMixin, TransactionTestCase):
+    # workers query meta-backend from their own database connections
+    def test_should_reconcile_every_original_storage_with_its_workers(self):
+        proxy_storage = MultipleOriginalStoragesProxyStorage()
+        proxy_storage.save('file.txt', ContentFile('content'), using='original_storage_1')
+        proxy_storage.save('file_2.txt', ContentFile('content'), using='original_storage_2')
+        self.original_storage.save('file_2.txt', ContentFile('content'))
+        self.original_storage_2.save('file.txt', ContentFile('content'))
+
+        reconciler = Reconciler(proxy_storage, workers={'original_storage_1': 1, 'original_storage_2': 2})
+        self.assertEqual(get_summary(reconciler.reconcile()), [
+            (ORPHANED_FILE, 'original_storage_1', 'file_2.txt', FOUND),
+            (ORPHANED_FILE, 'original_storage_2', 'file.txt', FOUND),
+        ])
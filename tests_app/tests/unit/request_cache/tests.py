@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from mock import Mock
+
+from django.test import TestCase
+from django.http import HttpResponse
+
+from proxy_storage import request_cache
+from proxy_storage.meta_backends.base import MetaBackendBase, MetaBackendObjectDoesNotExist
+from proxy_storage.middleware import MetaBackendRequestCacheMiddleware
+
+
+class DictMetaBackend(MetaBackendBase):
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def _convert_obj_to_dict(self, obj):
+        return obj
+
+    def _create(self, data):
+        self.calls.append('create')
+        self.objects[data['path']] = dict(data)
+        return dict(data)
+
+    def _get(self, path):
+        self.calls.append('get')
+        try:
+            return dict(self.objects[path])
+        except KeyError:
+            raise MetaBackendObjectDoesNotExist(path)
+
+    def _update(self, path, update_data):
+        self.calls.append('update')
+        obj = self.objects.pop(path)
+        obj.update(update_data)
+        self.objects[obj['path']] = obj
+
+    def _delete(self, path):
+        self.calls.append('delete')
+        self.objects.pop(path, None)
+
+    def _exists(self, path):
+        self.calls.append('exists')
+        return path in self.objects
+
+
+class RequestCacheTest(TestCase):
+    def setUp(self):
+        self.meta_backend = DictMetaBackend()
+        self.meta_backend.create({'path': '/hello.txt', 'original_storage_path': 'hello.txt'})
+        self.meta_backend.calls = []
+
+    def test_should_not_memoize_without_active_cache(self):
+        self.meta_backend.get('/hello.txt')
+        self.meta_backend.get('/hello.txt')
+        self.meta_backend.exists('/hello.txt')
+        self.meta_backend.exists('/hello.txt')
+        self.assertEqual(self.meta_backend.calls, ['get', 'get', 'exists', 'exists'])
+
+    def test_should_memoize_get_and_exists_inside_scope(self):
+        with request_cache.scope():
+            self.assertEqual(self.meta_backend.get('/hello.txt')['original_storage_path'], 'hello.txt')
+            self.assertEqual(self.meta_backend.get('/hello.txt')['original_storage_path'], 'hello.txt')
+            self.assertTrue(self.meta_backend.exists('/hello.txt'))
+            self.assertTrue(self.meta_backend.exists('/hello.txt'))
+        self.assertEqual(self.meta_backend.calls, ['get', 'exists'])
+
+    def test_memoized_object_should_not_be_shared_between_callers(self):
+        with request_cache.scope():
+            self.meta_backend.get('/hello.txt')['original_storage_path'] = 'changed.txt'
+            self.assertEqual(self.meta_backend.get('/hello.txt')['original_storage_path'], 'hello.txt')
+
+    def test_writes_should_invalidate_memoized_path(self):
+        with request_cache.scope():
+            self.assertFalse(self.meta_backend.exists('/world.txt'))
+            self.meta_backend.create({'path': '/world.txt', 'original_storage_path': 'world.txt'})
+            self.assertTrue(self.meta_backend.exists('/world.txt'))
+
+            self.meta_backend.get('/hello.txt')
+            self.meta_backend.update('/hello.txt', {'original_storage_path': 'updated.txt'})
+            self.assertEqual(self.meta_backend.get('/hello.txt')['original_storage_path'], 'updated.txt')
+
+            self.meta_backend.delete('/hello.txt')
+            self.assertFalse(self.meta_backend.exists('/hello.txt'))
+
+    def test_update_with_new_path_should_invalidate_both_paths(self):
+        with request_cache.scope():
+            self.assertFalse(self.meta_backend.exists('/new.txt'))
+            self.meta_backend.update('/hello.txt', {'path': '/new.txt'})
+            self.assertTrue(self.meta_backend.exists('/new.txt'))
+
+    def test_get_with_fields_should_return_whole_object_if_projections_are_not_supported(self):
+        self.assertEqual(
+            self.meta_backend.get('/hello.txt', fields=['path']),
+            {'path': '/hello.txt', 'original_storage_path': 'hello.txt'}
+        )
+
+    def test_scope_should_restore_previous_state(self):
+        self.assertFalse(request_cache.is_active())
+        with request_cache.scope():
+            self.assertTrue(request_cache.is_active())
+        self.assertFalse(request_cache.is_active())
+
+
+class MetaBackendRequestCacheMiddlewareTest(TestCase):
+    def setUp(self):
+        self.middleware = MetaBackendRequestCacheMiddleware()
+        self.request = Mock()
+
+    def tearDown(self):
+        request_cache.deactivate()
+
+    def test_should_activate_cache_for_request_lifetime(self):
+        self.middleware.process_request(self.request)
+        self.assertTrue(request_cache.is_active())
+        response = HttpResponse()
+        self.assertEqual(self.middleware.process_response(self.request, response), response)
+        self.assertFalse(request_cache.is_active())
+
+    def test_should_deactivate_cache_on_exception(self):
+        self.middleware.process_request(self.request)
+        self.middleware.process_exception(self.request, Exception())
+        self.assertFalse(request_cache.is_active())
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import time
+
 from mock import patch, Mock
 
+from django.core.files.base import ContentFile
 from django.test import TestCase
+from django.utils.http import http_date
 
-from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.files import RangeFile
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.storages.base import ContentHashProxyStorageMixin, ProxyStorageBase
+from proxy_storage.storages.memory import MemoryStorage
+from proxy_storage.testutils import override_proxy_storage_settings
 
 
 class ProxyStorage(ProxyStorageBase):
@@ -25,4 +34,77 @@ class ProxyStorageBaseTest___get_original_storage_full_path(TestCase):
     def test_with_original_storage_with_not_implemented_path(self):
         with patch.object(self.proxy_storage.original_storage, 'path', Mock(side_effect=NotImplementedError)):
             response = self.proxy_storage.get_original_storage_full_path('some/path/')
-            self.assertEqual(response, 'some/path/')
\ No newline at end of file
+            self.assertEqual(response, 'some/path/')
+
+class ContentHashProxyStorage(ContentHashProxyStorageMixin, ProxyStorageBase):
+    original_storage = MemoryStorage()
+    meta_backend = MemoryMetaBackend()
+
+
+class ContentHashProxyStorageMixinTest(TestCase):
+    def setUp(self):
+        self.proxy_storage = ContentHashProxyStorage()
+        self.proxy_storage.meta_backend.clear()
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'content_hash': ContentHashProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={ContentHashProxyStorage: 'content_hash'}
+        )
+        self.overrider.start()
+        self.path = self.proxy_storage.save('hello.txt', ContentFile('world'))
+        self.meta_backend_obj = self.proxy_storage.meta_backend.get(self.path)
+
+    def tearDown(self):
+        self.overrider.stop()
+
+    def test_should_record_content_hash_and_modified_time(self):
+        self.assertEqual(self.meta_backend_obj['content_hash'], hashlib.sha1(b'world').hexdigest())
+        self.assertIsNotNone(self.meta_backend_obj['modified_time'])
+        self.assertEqual(self.proxy_storage.etag(self.path), '"{0}"'.format(hashlib.sha1(b'world').hexdigest()))
+
+    def test_is_not_modified(self):
+        etag = self.proxy_storage.etag(self.path)
+        last_modified = self.proxy_storage.last_modified_for_meta_backend_obj(self.meta_backend_obj)
+        with patch.object(self.proxy_storage.original_storage, 'open', side_effect=AssertionError):
+            self.assertTrue(self.proxy_storage.is_not_modified(self.path, if_none_match=etag))
+            self.assertTrue(self.proxy_storage.is_not_modified(self.path, if_none_match='"other", W/' + etag))
+            self.assertTrue(self.proxy_storage.is_not_modified(self.path, if_none_match='*'))
+            self.assertFalse(self.proxy_storage.is_not_modified(self.path, if_none_match='"other"'))
+            self.assertTrue(self.proxy_storage.is_not_modified(self.path, if_modified_since=last_modified))
+            self.assertFalse(self.proxy_storage.is_not_modified(
+                self.path,
+                if_modified_since=http_date(time.time() - 3600)
+            ))
+            self.assertFalse(self.proxy_storage.is_not_modified(
+                self.path,
+                if_none_match='"other"',
+                if_modified_since=last_modified
+            ))
+            self.assertFalse(self.proxy_storage.is_not_modified(self.path))
+        self.assertRaises(IOError, self.proxy_storage.is_not_modified, '/missing.txt', if_none_match=etag)
+
+
+class ProxyStorageBaseTest___open_range(TestCase):
+    def setUp(self):
+        self.proxy_storage = ContentHashProxyStorage()
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'content_hash': ContentHashProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={ContentHashProxyStorage: 'content_hash'}
+        )
+        self.overrider.start()
+        self.path = self.proxy_storage.save('digits.txt', ContentFile(b'0123456789'))
+
+    def tearDown(self):
+        self.overrider.stop()
+
+    def test_should_push_range_down_to_original_storage(self):
+        with patch.object(self.proxy_storage.original_storage, 'open', side_effect=AssertionError):
+            self.assertEqual(self.proxy_storage.open_range(self.path, offset=3, length=4).read(), b'3456')
+            self.assertEqual(self.proxy_storage.open_range(self.path, offset=8).read(), b'89')
+
+    def test_should_seek_file_of_original_storage_without_open_range(self):
+        original_storage = Mock(spec=['open'], open=self.proxy_storage.original_storage.open)
+        with patch.object(self.proxy_storage, 'get_original_storage', return_value=original_storage):
+            range_file = self.proxy_storage.open_range(self.path, offset=3, length=4)
+        self.assertIsInstance(range_file, RangeFile)
+        self.assertEqual(range_file.read(), b'3456')
+        self.assertRaises(IOError, self.proxy_storage.open_range, '/missing.txt', offset=0)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from proxy_storage.files import MmapFile
+from proxy_storage.storages.filesystem import MmapFileSystemStorage
+
+
+class MmapFileSystemStorageTest(TestCase):
+    def setUp(self):
+        self.storage = MmapFileSystemStorage(location=tempfile.mkdtemp())
+        self.name = self.storage.save('hello.txt', ContentFile('hello world'))
+
+    def tearDown(self):
+        shutil.rmtree(self.storage.location)
+
+    def test_should_open_files_for_reading_as_mmap_file(self):
+        with self.storage.open(self.name) as f:
+            self.assertIsInstance(f, MmapFile)
+            self.assertEqual(f.read(), b'hello world')
+        for mode in ['r', 'r+b']:
+            with self.storage.open(self.name, mode) as f:
+                self.assertNotIsInstance(f, MmapFile)
+        with self.storage.open(self.name, 'r') as f:
+            self.assertEqual(f.read(), 'hello world')
+
+    def test_open_range(self):
+        with self.storage.open_range(self.name, offset=6, length=3) as f:
+            self.assertIsInstance(f, MmapFile)
+            self.assertEqual(f.read(), b'wor')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+from django.core.files.base import ContentFile
+
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.memory import MemoryStorage
+from proxy_storage.testutils import override_proxy_storage_settings
+
+
+class MemoryProxyStorage(ProxyStorageBase):
+    original_storage = MemoryStorage()
+    meta_backend = MemoryMetaBackend()
+
+
+class MemoryStorageTest(TestCase):
+    def setUp(self):
+        self.storage = MemoryStorage(base_url='/files/')
+
+    def test_save_open_and_delete(self):
+        name = self.storage.save('dir/hello.txt', ContentFile('world'))
+        self.assertEqual(name, 'dir/hello.txt')
+        self.assertNotEqual(self.storage.save('dir/hello.txt', ContentFile('other')), name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.open(name).read(), b'world')
+        self.assertEqual(self.storage.size(name), 5)
+        self.assertEqual(self.storage.url(name), '/files/dir/hello.txt')
+        self.assertTrue(self.storage.modified_time(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertRaises(IOError, self.storage.open, name)
+
+    def test_listdir(self):
+        for name in ['a.txt', 'dir/b.txt', 'dir/sub/c.txt']:
+            self.storage.save(name, ContentFile('content'))
+        self.assertEqual(self.storage.listdir(''), (['dir'], ['a.txt']))
+        self.assertEqual(self.storage.listdir('dir'), (['sub'], ['b.txt']))
+
+    def test_should_be_drop_in_original_storage_of_proxy_storage(self):
+        MemoryProxyStorage.original_storage.clear()
+        MemoryProxyStorage.meta_backend.clear()
+        with override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'memory': MemoryProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={MemoryProxyStorage: 'memory'}
+        ):
+            proxy_storage = MemoryProxyStorage()
+            name = proxy_storage.save('hello.txt', ContentFile('world'))
+            self.assertEqual(name, '/hello.txt')
+            self.assertEqual(proxy_storage.open(name).read(), b'world')
+            self.assertEqual(proxy_storage.listdir('/'), ([], ['hello.txt']))
+            proxy_storage.delete(name)
+            self.assertFalse(proxy_storage.original_storage.exists('hello.txt'))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+
+from mock import patch
+from pymongo import MongoClient
+
+from django.conf import settings
+from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from proxy_storage.meta_backends.mongo import MongoMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.name_allocation import OptimisticNameAllocationProxyStorageMixin
+from proxy_storage.testutils import override_proxy_storage_settings
+
+from tests_app.models import ProxyStorageModel
+
+
+class OptimisticNameAllocationProxyStorage(OptimisticNameAllocationProxyStorageMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+
+
+class OptimisticNameAllocationMongoProxyStorage(OptimisticNameAllocationProxyStorageMixin, ProxyStorageBase):
+    meta_backend = MongoMetaBackend(
+        database=MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME],
+        collection=settings.MONGO_META_BACKEND_COLLECTION_NAME
+    )
+
+
+class TestOptimisticNameAllocationMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_storage = FileSystemStorage(location=self.temp_dir)
+        self.original_storage.save('dir/hello.txt', ContentFile('world'))
+        self.proxy_storage = self.proxy_storage_class()
+        self.proxy_storage.original_storage = self.original_storage
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'some_proxy_storage_name': self.proxy_storage_class},
+            PROXY_STORAGE_CLASSES_INVERTED={self.proxy_storage_class: 'some_proxy_storage_name'}
+        )
+        self.overrider.start()
+
+    def tearDown(self):
+        self.overrider.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_should_save_without_exists_checks(self):
+        with patch.object(self.proxy_storage, 'exists') as mock:
+            name = self.proxy_storage.save('hello.txt', ContentFile('world'))
+            self.assertFalse(mock.called)
+        self.assertEqual(name, '{0}/hello.txt'.format(self.temp_dir))
+        self.assertTrue(self.proxy_storage.exists(name))
+
+    def test_should_allocate_name_with_random_suffix_on_conflict(self):
+        names = [
+            self.proxy_storage.save('dir/hello.txt', None, original_storage_path='dir/hello.txt')
+            for i in range(3)
+        ]
+        self.assertEqual(names[0], '{0}/dir/hello.txt'.format(self.temp_dir))
+        self.assertEqual(len(set(names)), 3)
+        for name in names[1:]:
+            self.assertRegexpMatches(name, r'^{0}/dir/hello_\w{{7}}\.txt$'.format(self.temp_dir))
+            self.assertEqual(self.proxy_storage.meta_backend.get(name)['original_storage_path'], 'dir/hello.txt')
+
+    def test_should_raise_unique_violation_after_name_allocation_attempts(self):
+        self.proxy_storage.name_allocation_attempts = 3
+        self.proxy_storage.save('dir/hello.txt', None, original_storage_path='dir/hello.txt')
+        with patch.object(self.proxy_storage, 'get_alternative_meta_backend_name', side_effect=lambda name: name):
+            self.assertRaises(
+                self.proxy_storage.meta_backend.get_unique_violation_exceptions(),
+                self.proxy_storage.save,
+                'dir/hello.txt',
+                None,
+                original_storage_path='dir/hello.txt'
+            )
+
+
+class OptimisticNameAllocationProxyStorageMixinTest(TestOptimisticNameAllocationMixin, TestCase):
+    proxy_storage_class = OptimisticNameAllocationProxyStorage
+
+
+class OptimisticNameAllocationMongoProxyStorageMixinTest(TestOptimisticNameAllocationMixin, TestCase):
+    proxy_storage_class = OptimisticNameAllocationMongoProxyStorage
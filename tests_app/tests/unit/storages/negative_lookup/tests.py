@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from proxy_storage.bloom import BloomFilter
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.negative_lookup import NegativeLookupCacheMixin, BloomFilterLookupGuardMixin
+from proxy_storage.testutils import override_proxy_storage_settings
+
+from tests_app.models import ProxyStorageModel
+
+
+class NegativeLookupCacheProxyStorage(NegativeLookupCacheMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+
+
+class BloomFilterProxyStorage(BloomFilterLookupGuardMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+
+
+class PrepareMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.proxy_storage = self.proxy_storage_class()
+        self.proxy_storage.original_storage = FileSystemStorage(location=self.temp_dir)
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'some_proxy_storage_name': self.proxy_storage_class},
+            PROXY_STORAGE_CLASSES_INVERTED={self.proxy_storage_class: 'some_proxy_storage_name'}
+        )
+        self.overrider.start()
+        cache.clear()
+
+    def tearDown(self):
+        self.overrider.stop()
+        shutil.rmtree(self.temp_dir)
+
+
+class NegativeLookupCacheMixinTest(PrepareMixin, TestCase):
+    proxy_storage_class = NegativeLookupCacheProxyStorage
+
+    def test_should_not_query_meta_backend_for_known_missing_path(self):
+        with patch.object(self.proxy_storage.meta_backend, '_exists', return_value=False) as mock:
+            self.assertFalse(self.proxy_storage.exists('/missing.txt'))
+            self.assertFalse(self.proxy_storage.exists('/missing.txt'))
+            self.assertEqual(mock.call_count, 1)
+
+    def test_open_should_raise_io_error_for_known_missing_path(self):
+        self.assertFalse(self.proxy_storage.exists('/missing.txt'))
+        with patch.object(self.proxy_storage.meta_backend, '_get') as mock:
+            self.assertRaises(IOError, self.proxy_storage.open, '/missing.txt')
+            self.assertFalse(mock.called)
+
+    def test_save_should_forget_missing_path(self):
+        path = os.path.join(self.temp_dir, 'hello.txt')
+        self.assertFalse(self.proxy_storage.exists(path))
+        saved_path = self.proxy_storage.save('hello.txt', ContentFile('world'))
+        self.assertEqual(saved_path, path)
+        self.assertTrue(self.proxy_storage.exists(path))
+
+    def test_moving_meta_backend_obj_should_forget_missing_path(self):
+        saved_path = self.proxy_storage.save('hello.txt', ContentFile('world'))
+        self.assertFalse(self.proxy_storage.exists('/renamed.txt'))
+        self.proxy_storage.update_meta_backend_obj(saved_path, {'path': '/renamed.txt'})
+        self.assertTrue(self.proxy_storage.exists('/renamed.txt'))
+
+
+class BloomFilterLookupGuardMixinTest(PrepareMixin, TestCase):
+    proxy_storage_class = BloomFilterProxyStorage
+
+    def setUp(self):
+        super(BloomFilterLookupGuardMixinTest, self).setUp()
+        self.proxy_storage.bloom_filter_file_path = os.path.join(self.temp_dir, 'paths.bloom')
+        self.saved_path = self.proxy_storage.save('hello.txt', ContentFile('world'))
+        self.proxy_storage.rebuild_bloom_filter()
+        cache.clear()
+
+    def test_should_not_query_meta_backend_for_definitely_missing_path(self):
+        with patch.object(self.proxy_storage.meta_backend, '_exists') as exists_mock:
+            self.assertFalse(self.proxy_storage.exists('/missing.txt'))
+            self.assertFalse(exists_mock.called)
+        with patch.object(self.proxy_storage.meta_backend, '_get') as get_mock:
+            self.assertRaises(IOError, self.proxy_storage.open, '/missing.txt')
+            self.assertFalse(get_mock.called)
+
+    def test_should_query_meta_backend_for_path_from_filter(self):
+        self.assertTrue(self.proxy_storage.exists(self.saved_path))
+        self.assertEqual(self.proxy_storage.open(self.saved_path).read(), b'world')
+
+    def test_should_see_paths_created_after_rebuild(self):
+        saved_path = self.proxy_storage.save('new.txt', ContentFile('world'))
+        self.assertTrue(self.proxy_storage.exists(saved_path))
+
+    def test_should_see_paths_moved_to_after_rebuild(self):
+        self.proxy_storage.update_meta_backend_obj(self.saved_path, {'path': '/renamed.txt'})
+        self.assertTrue(self.proxy_storage.exists('/renamed.txt'))
+
+    def test_rebuild_should_size_filter_from_meta_backend_count(self):
+        for i in range(20):
+            self.proxy_storage.save('file_{0}.txt'.format(i), ContentFile('world'))
+        self.proxy_storage.rebuild_bloom_filter()
+        bloom_filter = self.proxy_storage.get_bloom_filter()
+        self.assertEqual(bloom_filter.capacity, int(21 * self.proxy_storage.bloom_filter_capacity_headroom))
+        self.assertEqual(bloom_filter.count, 21)
+
+    def test_rebuild_should_not_size_filter_below_bloom_filter_capacity(self):
+        self.proxy_storage.bloom_filter_capacity = 1000
+        self.proxy_storage.rebuild_bloom_filter()
+        self.assertEqual(self.proxy_storage.get_bloom_filter().capacity, 1000)
+
+    def test_should_log_warning_for_filter_over_capacity(self):
+        bloom_filter = BloomFilter.for_capacity(capacity=1)
+        bloom_filter.add('/one.txt')
+        bloom_filter.add('/two.txt')
+        bloom_filter.save(self.proxy_storage.bloom_filter_file_path)
+        with patch('proxy_storage.storages.negative_lookup.logger') as logger_mock:
+            self.assertTrue(self.proxy_storage.get_bloom_filter().is_over_capacity)
+            self.assertTrue(logger_mock.warning.called)
+
+    def test_should_close_replaced_filter(self):
+        bloom_filter = self.proxy_storage.get_bloom_filter()
+        self.proxy_storage.save('new.txt', ContentFile('world'))
+        self.proxy_storage.rebuild_bloom_filter()
+        self.assertRaises(ValueError, lambda: self.saved_path in bloom_filter)
+        self.assertIsNot(self.proxy_storage.get_bloom_filter(), bloom_filter)
+
+    def test_should_close_filter_replaced_by_other_process(self):
+        bloom_filter = self.proxy_storage.get_bloom_filter()
+        rebuilt = BloomFilter.for_capacity(capacity=10)
+        rebuilt.add(self.saved_path)
+        # other process replaces file, it is noticed by signature after check interval
+        rebuilt.save(self.proxy_storage.bloom_filter_file_path)
+        with patch.object(self.proxy_storage, 'bloom_filter_check_interval', 0):
+            self.assertIsNot(self.proxy_storage.get_bloom_filter(), bloom_filter)
+        self.assertRaises(ValueError, lambda: self.saved_path in bloom_filter)
+
+    def test_should_not_treat_path_as_missing_when_filter_was_closed(self):
+        self.proxy_storage.get_bloom_filter().close()
+        self.assertFalse(self.proxy_storage.is_definitely_missing('/missing.txt'))
+
+    def test_should_not_guard_without_built_filter(self):
+        self.proxy_storage.bloom_filter_file_path = os.path.join(self.temp_dir, 'not_built.bloom')
+        with patch.object(self.proxy_storage.meta_backend, '_exists', return_value=False) as exists_mock:
+            self.assertFalse(self.proxy_storage.exists('/missing.txt'))
+            self.assertTrue(exists_mock.called)
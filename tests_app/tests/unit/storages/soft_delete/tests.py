@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import time
+
+from mock import patch
+
+from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.soft_delete import SoftDeleteProxyStorageMixin
+from proxy_storage.testutils import override_proxy_storage_settings
+
+from tests_app.models import ProxyStorageModel
+
+
+class SoftDeleteProxyStorage(SoftDeleteProxyStorageMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+    soft_delete_purge_delay = 60
+
+
+class SoftDeleteProxyStorageMixinTest(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.proxy_storage = SoftDeleteProxyStorage()
+        self.original_storage = SoftDeleteProxyStorage.original_storage = FileSystemStorage(location=self.temp_dir)
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'some_proxy_storage_name': SoftDeleteProxyStorage},
+            PROXY_STORAGE_CLASSES_INVERTED={SoftDeleteProxyStorage: 'some_proxy_storage_name'}
+        )
+        self.overrider.start()
+        self.name = self.proxy_storage.save('hello.txt', ContentFile('world'))
+
+    def tearDown(self):
+        self.overrider.stop()
+        SoftDeleteProxyStorage.original_storage = None
+        shutil.rmtree(self.temp_dir)
+
+    def test_delete_should_hide_file_without_deleting_it_from_original_storage(self):
+        with patch.object(self.original_storage, 'delete') as mock:
+            self.proxy_storage.delete(self.name)
+            self.assertFalse(mock.called)
+        self.assertFalse(self.proxy_storage.exists(self.name))
+        self.assertRaises(IOError, self.proxy_storage.open, self.name)
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+        self.assertEqual(self.proxy_storage.listdir('/'), ([], []))
+
+    def test_tombstone_path_length_should_not_depend_on_path(self):
+        long_name = self.proxy_storage.save('a' * 200 + '.txt', ContentFile('long'))
+        self.proxy_storage.delete(long_name)
+        self.proxy_storage.delete(self.name)
+        tombstone_paths = list(self.proxy_storage.meta_backend.iterate_paths(prefix='/.trash/'))
+        self.assertEqual(len(tombstone_paths), 2)
+        self.assertEqual(len(set(len(path) for path in tombstone_paths)), 1)
+        self.assertEqual(self.proxy_storage.undelete(long_name), long_name)
+        self.assertEqual(self.proxy_storage.open(long_name).read(), b'long')
+
+    def test_filter_by_content_object_should_not_return_deleted_files(self):
+        proxy_storage = SoftDeleteProxyStorage()
+        proxy_storage.meta_backend = MemoryMetaBackend()
+        for path in ['/1.txt', '/2.txt']:
+            proxy_storage.meta_backend.create({'path': path, 'content_type_id': 1, 'object_id': 2, 'field': 'file'})
+        proxy_storage.delete('/1.txt')
+        self.assertEqual(
+            [obj['path'] for obj in proxy_storage.filter_by_content_object(content_type_id=1, object_id=2)],
+            ['/2.txt']
+        )
+        self.assertEqual(len(proxy_storage.meta_backend.filter_by_content_object(content_type_id=1, object_id=2)), 2)
+
+    def test_delete_not_existing_file(self):
+        self.assertRaises(IOError, self.proxy_storage.delete, '/not_existing.txt')
+
+    def test_undelete_should_restore_the_most_recently_deleted_file(self):
+        with patch('time.time', return_value=1000):
+            self.proxy_storage.delete(self.name)
+        self.original_storage.save('another.txt', ContentFile('another world'))
+        self.proxy_storage.meta_backend.create(data={
+            'path': self.name,
+            'original_storage_path': 'another.txt',
+            'proxy_storage_name': 'some_proxy_storage_name'
+        })
+        with patch('time.time', return_value=2000):
+            self.proxy_storage.delete(self.name)
+
+        self.assertEqual(self.proxy_storage.undelete(self.name), self.name)
+        self.assertEqual(self.proxy_storage.open(self.name).read(), b'another world')
+        self.assertRaises(IOError, self.proxy_storage.undelete, '/not_existing.txt')
+
+    def test_purge_deleted_should_delete_files_after_purge_delay(self):
+        names = [self.name, self.proxy_storage.save('another.txt', ContentFile('another world'))]
+        with patch('time.time', return_value=time.time() - 120):
+            self.proxy_storage.delete(names[0])
+        self.proxy_storage.delete(names[1])
+
+        self.assertEqual(self.proxy_storage.purge_deleted(), {})
+
+        self.assertFalse(self.original_storage.exists('hello.txt'))
+        self.assertTrue(self.original_storage.exists('another.txt'))
+        self.assertRaises(IOError, self.proxy_storage.undelete, names[0])
+        self.assertEqual(self.proxy_storage.undelete(names[1]), names[1])
+
+    def test_purge_command_should_pause_between_batches(self):
+        for i in range(4):
+            self.proxy_storage.delete(self.proxy_storage.save('file_{0}.txt'.format(i), ContentFile('content')))
+        with patch('proxy_storage.storages.soft_delete.time.sleep') as mock:
+            call_command(
+                'purge_proxy_storage_deleted_files',
+                batch_size=2,
+                pause=0.5,
+                older_than=0,
+                stdout=StringIO()
+            )
+        self.assertEqual(mock.call_count, 1)
+        for i in range(4):
+            self.assertFalse(self.original_storage.exists('file_{0}.txt'.format(i)))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
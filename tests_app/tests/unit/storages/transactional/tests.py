@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+
+from mock import patch
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError
+from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from proxy_storage.cleanup import ORMCleanupQueue
+from proxy_storage.meta_backends.mongo import MongoMetaBackend
+from proxy_storage.meta_backends.orm import ORMMetaBackend
+from proxy_storage.storages.base import ProxyStorageBase
+from proxy_storage.storages.transactional import TransactionalSaveProxyStorageMixin
+from proxy_storage.testutils import override_proxy_storage_settings
+
+from tests_app.models import ProxyStorageModel, CleanupTask
+
+
+class SimpleProxyStorage(ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+
+
+class TransactionalProxyStorage(TransactionalSaveProxyStorageMixin, ProxyStorageBase):
+    meta_backend = ORMMetaBackend(model=ProxyStorageModel)
+    cleanup_queue = ORMCleanupQueue(model=CleanupTask)
+
+
+class TransactionalMongoProxyStorage(TransactionalSaveProxyStorageMixin, ProxyStorageBase):
+    meta_backend = MongoMetaBackend(
+        database=MongoClient('localhost', settings.MONGO_DATABASE_PORT)[settings.MONGO_DATABASE_NAME],
+        collection=settings.MONGO_META_BACKEND_COLLECTION_NAME
+    )
+
+
+class PrepareMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_storage = FileSystemStorage(location=self.temp_dir)
+        self.proxy_storage_class.original_storage = self.original_storage
+        self.proxy_storage = self.proxy_storage_class()
+        self.overrider = override_proxy_storage_settings(
+            PROXY_STORAGE_CLASSES={'some_proxy_storage_name': self.proxy_storage_class},
+            PROXY_STORAGE_CLASSES_INVERTED={self.proxy_storage_class: 'some_proxy_storage_name'}
+        )
+        self.overrider.start()
+
+    def tearDown(self):
+        self.overrider.stop()
+        self.proxy_storage_class.original_storage = None
+        shutil.rmtree(self.temp_dir)
+
+
+class SimpleProxyStorageSaveTest(PrepareMixin, TestCase):
+    proxy_storage_class = SimpleProxyStorage
+
+    def test_should_keep_original_storage_file_if_meta_backend_object_could_not_be_created(self):
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=ValueError):
+            self.assertRaises(ValueError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+
+
+class TransactionalSaveProxyStorageMixinTest(PrepareMixin, TestCase):
+    proxy_storage_class = TransactionalProxyStorage
+
+    def test_should_delete_original_storage_file_if_meta_backend_object_could_not_be_created(self):
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=ValueError):
+            self.assertRaises(ValueError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertFalse(self.original_storage.exists('hello.txt'))
+        self.assertEqual(CleanupTask.objects.count(), 0)
+
+    def test_should_not_delete_file_which_was_not_saved_by_proxy_storage(self):
+        self.original_storage.save('hello.txt', ContentFile('world'))
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=ValueError):
+            self.assertRaises(
+                ValueError,
+                self.proxy_storage.save,
+                'hello.txt',
+                None,
+                original_storage_path='hello.txt'
+            )
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+
+    def test_should_put_file_to_cleanup_queue_if_it_could_not_be_deleted(self):
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=ValueError):
+            with patch.object(self.original_storage, 'delete', side_effect=OSError):
+                self.assertRaises(ValueError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+        self.assertEqual(
+            list(CleanupTask.objects.values_list('proxy_storage_name', 'original_storage_path', 'attempts')),
+            [('some_proxy_storage_name', 'hello.txt', 0)]
+        )
+
+        with patch.object(self.original_storage, 'delete', side_effect=OSError):
+            results = list(self.proxy_storage.cleanup_queue.process())
+        self.assertIsInstance(results[0][1], OSError)
+        self.assertEqual(CleanupTask.objects.get().attempts, 1)
+
+        results = list(self.proxy_storage.cleanup_queue.process())
+        self.assertEqual(results[0][1], None)
+        self.assertFalse(self.original_storage.exists('hello.txt'))
+        self.assertEqual(CleanupTask.objects.count(), 0)
+
+    def test_should_put_file_to_cleanup_queue_if_meta_backend_object_could_be_written(self):
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=OperationalError):
+            self.assertRaises(OperationalError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+        self.assertEqual(CleanupTask.objects.count(), 1)
+
+        results = list(self.proxy_storage.cleanup_queue.process())
+        self.assertEqual(results, [(results[0][0], None)])
+        self.assertFalse(self.original_storage.exists('hello.txt'))
+        self.assertEqual(CleanupTask.objects.count(), 0)
+
+    def test_cleanup_queue_should_not_delete_file_if_meta_backend_object_was_written(self):
+        def create_and_fail(data):
+            ORMMetaBackend._create(self.proxy_storage.meta_backend, data)
+            raise OperationalError
+
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=create_and_fail):
+            self.assertRaises(OperationalError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertEqual(CleanupTask.objects.count(), 1)
+
+        self.assertEqual(list(self.proxy_storage.cleanup_queue.process()), [])
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+        self.assertEqual(ProxyStorageModel.objects.get().original_storage_path, 'hello.txt')
+        self.assertEqual(CleanupTask.objects.count(), 0)
+
+    def test_should_keep_file_without_cleanup_queue_if_meta_backend_object_could_be_written(self):
+        self.proxy_storage.cleanup_queue = None
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=OperationalError):
+            self.assertRaises(OperationalError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+
+    def test_defer_save_cleanup(self):
+        self.proxy_storage.defer_save_cleanup = True
+        with patch.object(self.proxy_storage.meta_backend, '_create', side_effect=ValueError):
+            self.assertRaises(ValueError, self.proxy_storage.save, 'hello.txt', ContentFile('world'))
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+        self.assertEqual(CleanupTask.objects.count(), 1)
+
+    def test_should_allocate_next_name_if_path_was_taken_after_availability_check(self):
+        self.original_storage.save('hello.txt', ContentFile('world'))
+        taken_name = self.proxy_storage.save('hello.txt', None, original_storage_path='hello.txt')
+        exists = self.proxy_storage.exists
+        # the first check doesn't see object created by concurrent save
+        with patch.object(self.proxy_storage, 'exists', side_effect=self._get_exists_side_effect(exists, [False])):
+            name = self.proxy_storage.save('hello.txt', None, original_storage_path='hello.txt')
+        self.assertNotEqual(name, taken_name)
+        self.assertTrue(self.proxy_storage.exists(name))
+        self.assertTrue(self.proxy_storage.exists(taken_name))
+
+    def test_should_raise_unique_violation_after_save_attempts(self):
+        self.original_storage.save('hello.txt', ContentFile('world'))
+        self.proxy_storage.save('hello.txt', None, original_storage_path='hello.txt')
+        self.proxy_storage.save_attempts = 2
+        with patch.object(self.proxy_storage, 'exists', return_value=False) as mock:
+            self.assertRaises(
+                IntegrityError,
+                self.proxy_storage.save,
+                'hello.txt',
+                None,
+                original_storage_path='hello.txt'
+            )
+        self.assertEqual(mock.call_count, 2)
+        self.assertTrue(self.original_storage.exists('hello.txt'))
+
+    def _get_exists_side_effect(self, exists, first_results):
+        first_results = list(first_results)
+
+        def side_effect(name):
+            if first_results:
+                return first_results.pop(0)
+            return exists(name)
+        return side_effect
+
+
+class TransactionalMongoProxyStorageTest(PrepareMixin, TestCase):
+    proxy_storage_class = TransactionalMongoProxyStorage
+
+    def test_should_allocate_next_name_if_path_was_taken_after_availability_check(self):
+        self.original_storage.save('hello.txt', ContentFile('world'))
+        taken_name = self.proxy_storage.save('hello.txt', None, original_storage_path='hello.txt')
+        self.proxy_storage.save_attempts = 1
+        with patch.object(self.proxy_storage, 'exists', return_value=False):
+            self.assertRaises(
+                DuplicateKeyError,
+                self.proxy_storage.save,
+                'hello.txt',
+                None,
+                original_storage_path='hello.txt'
+            )
+        self.proxy_storage.save_attempts = 2
+        with patch.object(self.proxy_storage, 'exists', side_effect=[False, True, False]):
+            name = self.proxy_storage.save('hello.txt', None, original_storage_path='hello.txt')
+        self.assertNotEqual(name, taken_name)
+        self.assertTrue(self.proxy_storage.exists(name))
@@ -15,4 +15,15 @@ class TestUtils(TestCase):
         ]
 
         for exp in experiments:
-            self.assertEqual(utils.clean_path(exp), '/file/hello.txt')
\ No newline at end of file
+            self.assertEqual(utils.clean_path(exp), '/file/hello.txt')
+
+    def test_parse_byte_range(self):
+        self.assertEqual(utils.parse_byte_range('bytes=0-9', 100), (0, 10))
+        self.assertEqual(utils.parse_byte_range('bytes=90-', 100), (90, 10))
+        self.assertEqual(utils.parse_byte_range('bytes=90-200', 100), (90, 10))
+        self.assertEqual(utils.parse_byte_range('bytes=-10', 100), (90, 10))
+        self.assertEqual(utils.parse_byte_range('bytes=-200', 100), (0, 100))
+        for ignored in ['items=0-9', 'bytes=0-9,20-29', 'bytes=9-0', 'bytes=a-b', 'bytes=-']:
+            self.assertEqual(utils.parse_byte_range(ignored, 100), None)
+        for unsatisfiable in ['bytes=100-', 'bytes=-0']:
+            self.assertRaises(ValueError, utils.parse_byte_range, unsatisfiable, 100)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import gc
+import threading
+import time
+
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from mock import Mock, patch
+
+from proxy_storage.meta_backends.memory import MemoryMetaBackend
+from proxy_storage.write_behind import WriteBehindBuffer, close_buffers
+
+
+class WriteBehindBufferTestMixin(object):
+    def setUp(self):
+        self.meta_backend = MemoryMetaBackend()
+        self.meta_backend.create_many([{'path': '/{0}.txt'.format(i)} for i in range(3)])
+
+    def get_field(self, path, field):
+        return self.meta_backend.get(path).get(field)
+
+
+class WriteBehindBufferTest(WriteBehindBufferTestMixin, SimpleTestCase):
+    def test_should_flush_immediately_without_flush_interval(self):
+        update_buffer = WriteBehindBuffer()
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+        self.assertEqual(len(update_buffer), 0)
+
+    def test_should_coalesce_updates_of_path_and_flush_them_by_update_many(self):
+        update_buffer = WriteBehindBuffer(flush_interval=60)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1, 'field': 'resume'})
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 2})
+        update_buffer.put(self.meta_backend, '/1.txt', {'object_id': 3})
+        self.assertEqual(len(update_buffer), 2)
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), None)
+        with patch.object(self.meta_backend, 'update_many', wraps=self.meta_backend.update_many) as update_many:
+            update_buffer.close()
+        update_many.assert_called_once_with(
+            {'/0.txt': {'object_id': 2, 'field': 'resume'}, '/1.txt': {'object_id': 3}},
+            batch_size=1000
+        )
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 2)
+        self.assertEqual(self.get_field('/0.txt', 'field'), 'resume')
+
+    def test_should_flush_by_timer(self):
+        update_buffer = WriteBehindBuffer(flush_interval=0.01)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        self.wait_for_flush(update_buffer)
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+        update_buffer.close()
+
+    def wait_for_flush(self, update_buffer):
+        for i in range(100):
+            if not len(update_buffer):
+                break
+            time.sleep(0.01)
+
+    def test_should_flush_by_single_thread_and_close_its_database_connections(self):
+        update_buffer = WriteBehindBuffer(flush_interval=0.01)
+        threads = []
+
+        def update_many(*args, **kwargs):
+            threads.append(threading.current_thread())
+
+        connection = Mock()
+        with patch('proxy_storage.write_behind.connections') as connections_mock:
+            connections_mock.all.return_value = [connection]
+            with patch.object(self.meta_backend, 'update_many', side_effect=update_many):
+                for path in ['/0.txt', '/1.txt']:
+                    update_buffer.put(self.meta_backend, path, {'object_id': 1})
+                    self.wait_for_flush(update_buffer)
+            update_buffer.close()
+        self.assertEqual(len(threads), 2)
+        self.assertIs(threads[0], threads[1])
+        self.assertFalse(threads[0].is_alive())
+        self.assertTrue(connection.close.called)
+
+    def test_flusher_thread_should_not_keep_buffer_alive(self):
+        update_buffer = WriteBehindBuffer(flush_interval=0.01)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        self.wait_for_flush(update_buffer)
+        flusher = update_buffer._flusher
+        del update_buffer
+        gc.collect()
+        flusher.join(1)
+        self.assertFalse(flusher.is_alive())
+
+    def test_should_flush_on_interpreter_exit(self):
+        update_buffer = WriteBehindBuffer(flush_interval=60)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        close_buffers()
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+
+    def test_should_flush_when_max_size_is_reached(self):
+        update_buffer = WriteBehindBuffer(flush_interval=60, max_size=2)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        self.assertEqual(len(update_buffer), 1)
+        update_buffer.put(self.meta_backend, '/1.txt', {'object_id': 2})
+        self.assertEqual(len(update_buffer), 0)
+        self.assertEqual(self.get_field('/1.txt', 'object_id'), 2)
+        update_buffer.close()
+
+    def test_failed_updates_should_be_kept_for_next_flush(self):
+        update_buffer = WriteBehindBuffer(flush_interval=60)
+        update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+        with patch.object(self.meta_backend, 'update_many', side_effect=Exception):
+            update_buffer.flush()
+        self.assertEqual(len(update_buffer), 1)
+        update_buffer.close()
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+
+
+class WriteBehindBufferTransactionTest(WriteBehindBufferTestMixin, TransactionTestCase):
+    def test_should_flush_on_transaction_commit(self):
+        update_buffer = WriteBehindBuffer()
+        with transaction.atomic():
+            update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+            update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 2})
+            self.assertEqual(self.get_field('/0.txt', 'object_id'), None)
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 2)
+        self.assertEqual(len(update_buffer), 0)
+
+    def test_should_discard_updates_on_transaction_rollback(self):
+        update_buffer = WriteBehindBuffer()
+        try:
+            with transaction.atomic():
+                update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+                raise ValueError
+        except ValueError:
+            pass
+        update_buffer.flush()
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), None)
+
+        with transaction.atomic():
+            update_buffer.put(self.meta_backend, '/1.txt', {'object_id': 2})
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), None)
+        self.assertEqual(self.get_field('/1.txt', 'object_id'), 2)
+
+    def test_should_discard_updates_on_savepoint_rollback(self):
+        update_buffer = WriteBehindBuffer()
+        with transaction.atomic():
+            update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+            try:
+                with transaction.atomic():
+                    update_buffer.put(self.meta_backend, '/1.txt', {'object_id': 2})
+                    raise ValueError
+            except ValueError:
+                pass
+            update_buffer.put(self.meta_backend, '/2.txt', {'object_id': 3})
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+        self.assertEqual(self.get_field('/1.txt', 'object_id'), None)
+        self.assertEqual(self.get_field('/2.txt', 'object_id'), 3)
+
+    def test_should_not_flush_updates_of_uncommitted_transaction(self):
+        update_buffer = WriteBehindBuffer(flush_interval=60)
+        with transaction.atomic():
+            update_buffer.put(self.meta_backend, '/0.txt', {'object_id': 1})
+            update_buffer.flush()
+            self.assertEqual(self.get_field('/0.txt', 'object_id'), None)
+        self.assertEqual(self.get_field('/0.txt', 'object_id'), 1)
+
+    def test_should_register_single_on_commit_callback_per_transaction(self):
+        update_buffer = WriteBehindBuffer()
+        with transaction.atomic():
+            with patch.object(transaction, 'on_commit', wraps=transaction.on_commit) as on_commit:
+                for i in range(3):
+                    update_buffer.put(self.meta_backend, '/{0}.txt'.format(i), {'object_id': i})
+            self.assertEqual(on_commit.call_count, 1)
+        self.assertEqual([self.get_field('/{0}.txt'.format(i), 'object_id') for i in range(3)], [0, 1, 2])